@@ -0,0 +1,285 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import psutil
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+SCALES = (0.1, 0.5, 1.0)
+STAGES = ('products', 'customers', 'promotions', 'sales', 'upload', 'fetch_table', 'clean')
+# Stages whose inputs are produced by earlier stages
+PREREQUISITES = {'fetch_table': ('upload',), 'clean': ('upload', 'fetch_table')}
+SEED = 42
+REFERENCE_DATE = '2025-01-01'
+
+# The joined table pipeline/ingest.py extracts, recreated in the benchmark database
+VIEW_SQL = """CREATE VIEW demand_forecasting_base AS
+SELECT s.*, p.category, p.brand, p.sku, p.price, pr.promotion_type, pr.discount_percentage, pr.channel
+FROM sales s JOIN products p ON p.product_id = s.product_id
+LEFT JOIN promotions pr ON pr.promotion_id = s.promotion_id"""
+
+
+class PeakRSS:
+    """Samples this process's resident set size in a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start = self.peak = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+def measure(func, repeat=1):
+    """Run ``func`` ``repeat`` times; best wall time, peak RSS and rows."""
+    best, peak, delta, rows = float('inf'), 0, 0, 0
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            started = time.perf_counter()
+            rows = func()
+            seconds = time.perf_counter() - started
+        best = min(best, seconds)
+        peak, delta = max(peak, rss.peak), max(delta, rss.peak - rss.start)
+    return {'rows': int(rows), 'seconds': best, 'rows_per_s': rows / best if best else None,
+            'peak_rss_mb': peak / 2 ** 20, 'rss_delta_mb': delta / 2 ** 20}
+
+
+# Stages: each does its untimed setup and returns timed(), which returns the
+# rows processed. Inputs of later stages (database, extract) live in the work
+# directory and are produced by the earlier stages of the same scale.
+
+def _config(scale):
+    from data_generate.catalog import ScaleConfig
+    return ScaleConfig(scale, reference_date=REFERENCE_DATE)
+
+
+def _generation(table):
+    def stage(scale, workdir, db_url):
+        from data_generate.parallel import seeded
+        from data_generate.promotions import PromotionIndex
+        from data_generate import tables
+        config = _config(scale)
+        products_df = tables.generate_products(config, seeded(SEED, 'products'))
+        promotions_df = tables.generate_promotions(config, products_df, seeded(SEED, 'promotions'))
+
+        def timed():
+            if table == 'products':
+                return len(tables.generate_products(config, seeded(SEED, 'products')))
+            if table == 'customers':
+                return len(tables.generate_customers(config, 0, config.num_customers, seeded(SEED, 'customers')))
+            if table == 'promotions':
+                return len(tables.generate_promotions(config, products_df, seeded(SEED, 'promotions')))
+            index = PromotionIndex(promotions_df)
+            return sum(len(tables.generate_period_sales(config, start, end, seeded(SEED, 'sales', i),
+                                                        products_df, index))
+                       for i, (start, end) in enumerate(tables.month_ranges(config.start_date, config.end_date)))
+        return timed
+    return stage
+
+
+def _partition_key(path):
+    # year=2024/month=10 sorts after month=9
+    return [int(part.split('=')[1]) if '=' in part else part for part in path.split(os.sep)]
+
+
+def _dataset_chunks(root, tables):
+    """(table, chunk) pairs read back from a ParquetSink directory, one row
+    group at a time, in ``tables`` order."""
+    import pyarrow.parquet as pq
+    from config.schema import apply_dtypes
+    for table in tables:
+        table_dir = os.path.join(root, table)
+        paths = [os.path.relpath(os.path.join(d, f), table_dir)
+                 for d, _, files in os.walk(table_dir) for f in files if f.endswith('.parquet')]
+        for path in sorted(paths, key=_partition_key):
+            parquet = pq.ParquetFile(os.path.join(table_dir, path))
+            for group in range(parquet.num_row_groups):
+                yield table, apply_dtypes(parquet.read_row_group(group).to_pandas(), table)
+
+
+def _upload(scale, workdir, db_url):
+    from sqlalchemy import create_engine, text
+    from config.schema import build_metadata
+    from data_generate.loader import load_dataset
+    from data_generate.sinks import ParquetSink
+    from data_generate.tables import generate_dataset
+    engine = create_engine(db_url)
+    metadata = build_metadata()
+    # Generated once to Parquet and streamed back, so the stage's peak RSS
+    # is the load's rather than the whole dataset's
+    root = os.path.join(workdir, 'dataset')
+    tables = list(ParquetSink(root, overwrite=True).write(generate_dataset(_config(scale), seed=SEED)))
+
+    def timed():
+        with engine.begin() as conn:
+            conn.execute(text("DROP VIEW IF EXISTS demand_forecasting_base"))
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        stats = load_dataset(engine, _dataset_chunks(root, tables))
+        with engine.begin() as conn:
+            conn.execute(text(VIEW_SQL))
+        return sum(table_stats.rows for table_stats in stats.values())
+    return timed
+
+
+def _fetch_table(scale, workdir, db_url):
+    from sqlalchemy import create_engine
+    from pipeline.ingest import fetch_table
+    engine = create_engine(db_url)
+    output = os.path.join(workdir, 'demand_forecasting_base.parquet')
+    return lambda: fetch_table(output, chunksize=50_000, query="SELECT * FROM demand_forecasting_base ORDER BY sale_id",
+                               engine=engine)
+
+
+def _clean(scale, workdir, db_url):
+    import pandas as pd
+    from data_cleaning.clean import clean
+    df = pd.read_parquet(os.path.join(workdir, 'demand_forecasting_base.parquet'))
+    return lambda: len(clean(df.copy()))
+
+
+STAGE_FUNCS = {
+    'products': _generation('products'),
+    'customers': _generation('customers'),
+    'promotions': _generation('promotions'),
+    'sales': _generation('sales'),
+    'upload': _upload,
+    'fetch_table': _fetch_table,
+    'clean': _clean,
+}
+
+
+def run_stage(stage, scale, workdir, db_url, repeat):
+    import contextlib
+    import io
+    import logging
+    logging.disable(logging.INFO)
+    # Keep the stages' own progress output out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        timed = STAGE_FUNCS[stage](scale, workdir, db_url)
+        return dict(stage=stage, scale=scale, **measure(timed, repeat))
+
+
+def run(stages=STAGES, scales=SCALES, db_url=None, repeat=3, workdir=None, destructive=False):
+    """Run every stage at every scale, each in a fresh process so peak RSS
+    is not inherited from earlier stages. Prerequisites of the requested
+    stages run first but are not recorded. Returns the result document.
+
+    The upload stage drops and recreates every table of config.schema, so
+    it runs against a SQLite file in the work directory unless ``db_url``
+    is given together with ``destructive``.
+    """
+    plan = [s for s in STAGES if s in stages or any(s in PREREQUISITES.get(t, ()) for t in stages)]
+    if db_url and 'upload' in plan and not destructive:
+        raise ValueError(f"the upload stage drops every table in {db_url}; pass destructive=True "
+                         f"(--destructive) to benchmark against it")
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            scale_dir = os.path.join(workdir or tmp, f"sf{scale}")
+            os.makedirs(scale_dir, exist_ok=True)
+            url = db_url or f"sqlite:///{os.path.join(scale_dir, 'bench.db')}"
+            for stage in plan:
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    result = pool.submit(run_stage, stage, scale, scale_dir, url,
+                                         repeat if stage in stages else 1).result()
+                if stage not in stages:
+                    continue
+                results.append(result)
+                print(f"{stage:>12} sf={scale:<5} {result['seconds']:8.3f}s {result['rows_per_s'] or 0:>12,.0f} rows/s "
+                      f"peak {result['peak_rss_mb']:7.1f} MB")
+    return {'meta': _meta(db_url, repeat), 'results': results}
+
+
+def _meta(db_url, repeat):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'database': db_url or 'sqlite', 'repeat': repeat}
+
+
+def regressions(current, baseline, time_tolerance=0.2, memory_tolerance=0.2):
+    """Results more than ``time_tolerance`` slower, or using more than
+    ``memory_tolerance`` more peak RSS, than the same stage and scale in
+    ``baseline``."""
+    saved = {(r['stage'], r['scale']): r for r in baseline['results']}
+    flagged = []
+    for result in current['results']:
+        base = saved.get((result['stage'], result['scale']))
+        if base is None:
+            continue
+        for metric, tolerance in (('seconds', time_tolerance), ('peak_rss_mb', memory_tolerance)):
+            if result[metric] > base[metric] * (1 + tolerance):
+                flagged.append({'stage': result['stage'], 'scale': result['scale'], 'metric': metric,
+                                'baseline': base[metric], 'current': result[metric],
+                                'change %': (result[metric] / base[metric] - 1) * 100})
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and profile the pipeline stages at several scale factors")
+    parser.add_argument('--scales', type=float, nargs='+', default=list(SCALES))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--db-url', default=None,
+                        help="database for upload/fetch_table (default: a SQLite file per scale); "
+                             "its tables are dropped, so it needs --destructive")
+    parser.add_argument('--destructive', action='store_true',
+                        help="allow the upload stage to drop and recreate the tables of --db-url")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage; the best time is kept")
+    parser.add_argument('--output', default=None, help="results JSON (default: results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline JSON to check for regressions")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown / memory growth (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.db_url and not args.destructive and ({'upload', 'fetch_table', 'clean'} & set(args.stages)):
+        parser.error("--db-url is wiped by the upload stage; pass --destructive to use it")
+    report = run(args.stages, args.scales, args.db_url, args.repeat, destructive=args.destructive)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved as baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            flagged = regressions(report, json.load(f), args.tolerance, args.tolerance)
+        for r in flagged:
+            print(f"REGRESSION {r['stage']} sf={r['scale']} {r['metric']}: "
+                  f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['change %']:+.0f}%)")
+        if flagged:
+            sys.exit(1)
+        print("No regressions against the baseline")
@@ -0,0 +1,265 @@
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey
+
+# One column of a table: its SQL type, the compact pandas dtype frames are
+# held in, and extra sqlalchemy.Column arguments (keys, constraints).
+#
+# Dtype rules: ids and enums are categoricals, counts the smallest int that
+# holds them, unit prices / rates / scores float32 (a few significant digits
+# at most), money that gets summed (revenue, budgets, lifetime value) stays
+# float64, dates are datetime64. Free text and unique codes stay object.
+ColumnSchema = namedtuple('ColumnSchema', ['name', 'sql_type', 'dtype', 'kwargs'])
+
+
+def column(name, sql_type, dtype, **kwargs):
+    return ColumnSchema(name, sql_type, dtype, kwargs)
+
+
+TABLES = {
+    'products': [
+        column('product_id', String(50), 'category', primary_key=True),
+        column('category', String(50), 'category'),
+        column('brand', String(50), 'category'),
+        column('sku', String(50), 'category', unique=True),
+        column('price', Float, 'float32'),
+        column('cost', Float, 'float32'),
+        column('supplier_id', String(50), 'category'),
+        column('product_dimensions', String(50), 'object'),
+        column('manufacture_date', Date, 'datetime64[ns]'),
+        column('warranty_period_years', Integer, 'int8'),
+        column('lifecycle_stage', String(20), 'category'),
+    ],
+    'suppliers': [
+        column('supplier_id', String(50), 'category', primary_key=True),
+        column('supplier_name', String(100), 'object'),
+        column('contact_info', String(100), 'object'),
+        column('supplier_rating', Float, 'float32'),
+        column('lead_time_days', Integer, 'int16'),
+        column('contract_start_date', Date, 'datetime64[ns]'),
+        column('supplier_city', String(50), 'category'),
+        column('supplier_region', String(50), 'category'),
+    ],
+    'customers': [
+        column('customer_id', String(50), 'category', primary_key=True),
+        column('customer_age', Integer, 'int8'),
+        column('customer_gender', String(1), 'category'),
+        column('customer_location', String(50), 'category'),
+        column('customer_city', String(50), 'category'),
+        column('customer_region', String(50), 'category'),
+        column('first_purchase_date', Date, 'datetime64[ns]'),
+        column('last_purchase_date', Date, 'datetime64[ns]'),
+        column('lifetime_value', Float, 'float64'),
+    ],
+    'inventory': [
+        column('id', Integer, 'int32', primary_key=True, autoincrement=True),
+        column('product_id', String(50), 'category', foreign_key='products.product_id'),
+        column('warehouse', String(50), 'category'),
+        column('stock_level', Integer, 'int32'),
+        column('restock_frequency_days', Integer, 'int16'),
+        column('stock_location', String(50), 'category'),
+        column('order_quantity', Integer, 'int32'),
+        column('restock_date', Date, 'datetime64[ns]'),
+        column('warehouse_city', String(50), 'category'),
+        column('warehouse_region', String(50), 'category'),
+    ],
+    'promotions': [
+        column('promotion_id', Integer, 'int32', primary_key=True, autoincrement=True),
+        column('product_id', String(50), 'category', foreign_key='products.product_id'),
+        column('promotion_type', String(50), 'category'),
+        column('discount_percentage', Float, 'float32'),
+        column('campaign_duration_days', Integer, 'int16'),
+        column('campaign_budget', Float, 'float64'),
+        column('campaign_start_date', Date, 'datetime64[ns]'),
+        column('campaign_end_date', Date, 'datetime64[ns]'),
+        column('target_audience', String(50), 'category'),
+        column('channel', String(50), 'category'),
+        column('competitor_response', String(50), 'category'),
+    ],
+    'sales': [
+        column('sale_id', Integer, 'int32', primary_key=True, autoincrement=True),
+        column('date', Date, 'datetime64[ns]'),
+        column('product_id', String(50), 'category', foreign_key='products.product_id'),
+        column('customer_id', String(50), 'category', foreign_key='customers.customer_id'),
+        column('store_id', String(50), 'category'),
+        column('sales_quantity', Integer, 'int16'),
+        column('sales_revenue', Float, 'float64'),
+        column('promo_flag', Boolean, 'bool'),
+        column('promotion_id', Integer, 'Int32', foreign_key='promotions.promotion_id'),
+        column('promo_discount', Float, 'float32'),
+        column('holiday_flag', String(50), 'category'),
+    ],
+    'shipments': [
+        column('shipment_id', String(50), 'object', primary_key=True),
+        column('product_id', String(50), 'category', foreign_key='products.product_id'),
+        column('transport_mode', String(50), 'category'),
+        column('shipment_tracking_number', String(50), 'object'),
+        column('shipment_departure_time', DateTime, 'datetime64[ns]'),
+        column('shipment_arrival_time', DateTime, 'datetime64[ns]'),
+        column('status', String(50), 'category'),
+        column('destination_city', String(50), 'category'),
+        column('destination_region', String(50), 'category'),
+    ],
+    'market_trends': [
+        column('trend_id', Integer, 'int32', primary_key=True, autoincrement=True),
+        column('date', Date, 'datetime64[ns]'),
+        column('product_id', String(50), 'category', foreign_key='products.product_id'),
+        column('temperature', Float, 'float32'),
+        column('weather_condition', String(50), 'category'),
+        column('social_media_mentions', Integer, 'int32'),
+        column('competitor_analysis_score', Float, 'float32'),
+        column('cpi_change', Float, 'float32'),
+        column('region', String(50), 'category'),
+        column('city', String(50), 'category'),
+    ],
+    # Daily sales per product and store, maintained by pipeline/cube.py
+    'demand_cube': [
+        column('date', Date, 'datetime64[ns]', primary_key=True),
+        column('product_id', String(50), 'category', primary_key=True),
+        column('store_id', String(50), 'category', primary_key=True),
+        column('sales_quantity', Integer, 'int32'),
+        column('sales_revenue', Float, 'float64'),
+        column('transactions', Integer, 'int32'),
+        column('promo_transactions', Integer, 'int32'),
+        column('promo_quantity', Integer, 'int32'),
+        column('promo_flag', Boolean, 'bool'),
+        column('holiday_flag', String(50), 'category'),
+    ],
+    # Demand forecasts per product (and store, when forecast per store), written by forecasting/
+    'demand_forecasts': [
+        column('id', Integer, 'int32', primary_key=True, autoincrement=True),
+        column('date', Date, 'datetime64[ns]'),
+        column('product_id', String(50), 'category'),
+        column('store_id', String(50), 'category'),
+        column('forecast', Float, 'float32'),
+        column('forecast_lower', Float, 'float32'),
+        column('forecast_upper', Float, 'float32'),
+        column('model', String(20), 'category'),
+        column('series_hash', String(40), 'object'),
+    ],
+}
+
+# demand_forecasting_base joins sales to products and promotions; a column
+# takes its dtype from the first of these tables that has it
+VIEWS = {
+    'demand_forecasting_base': ['sales', 'products', 'promotions'],
+}
+
+
+def build_metadata(metadata=None):
+    """SQLAlchemy MetaData with every table, keys and foreign keys."""
+    metadata = metadata if metadata is not None else MetaData()
+    for table, columns in TABLES.items():
+        sql_columns = []
+        for col in columns:
+            kwargs = dict(col.kwargs)
+            foreign_key = kwargs.pop('foreign_key', None)
+            args = [ForeignKey(foreign_key)] if foreign_key else []
+            sql_columns.append(Column(col.name, col.sql_type, *args, **kwargs))
+        Table(table, metadata, *sql_columns)
+    return metadata
+
+
+def dtypes(table):
+    """{column: dtype} for a table or view; unknown tables have no rules."""
+    table = table.split('.')[-1]
+    if table in VIEWS:
+        merged = {}
+        for base in VIEWS[table]:
+            for name, dtype in dtypes(base).items():
+                merged.setdefault(name, dtype)
+        return merged
+    return {col.name: col.dtype for col in TABLES.get(table, [])}
+
+
+def _convert(values, dtype):
+    if dtype == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(values, errors='coerce')
+    if dtype == 'bool':
+        return values.fillna(False).astype(bool) if values.dtype != bool else values
+    if dtype == 'object':
+        return values.astype(object) if values.dtype != object else values
+    values = pd.to_numeric(values, errors='coerce') if values.dtype == object else values
+    if np.dtype(dtype.lower()).kind == 'i' and len(values):
+        info, low, high = np.iinfo(dtype.lower()), values.min(), values.max()
+        if (pd.notna(low) and low < info.min) or (pd.notna(high) and high > info.max):
+            # astype would wrap out-of-range values around; keep them in 64 bits
+            warnings.warn(f"{values.name} has values in [{low}, {high}], outside {dtype}; keeping int64")
+            dtype = 'int64'
+    if np.dtype(dtype.lower()).kind == 'i' and values.isna().any():
+        # Missing values need the nullable integer of the same width
+        dtype = dtype.capitalize()
+    return values.astype(dtype)
+
+
+def apply_dtypes(df, table):
+    """Convert the columns of ``df`` that ``table`` has rules for to their
+    compact dtypes, in place, and return ``df``. Other columns are left alone."""
+    for name, dtype in dtypes(table).items():
+        if name in df.columns and df[name].dtype != dtype:
+            df[name] = _convert(df[name], dtype)
+    return df
+
+
+def concat_frames(frames):
+    """``pd.concat(frames, ignore_index=True)`` that keeps categoricals.
+
+    Plain concat turns categoricals with different categories into object
+    columns; here every categorical column is first recoded onto the union
+    of the frames' categories.
+    """
+    frames = list(frames)
+    categorical = [name for name in frames[0].columns
+                   if all(name in f.columns and isinstance(f[name].dtype, pd.CategoricalDtype) for f in frames)]
+    if categorical and len(frames) > 1:
+        frames = [f.copy(deep=False) for f in frames]
+        for name in categorical:
+            found = [f[name].cat.categories for f in frames if len(f[name].cat.categories)]
+            categories = found[0].append(found[1:]).unique() if found else pd.Index([], dtype=object)
+            dtype = pd.CategoricalDtype(categories)
+            for f in frames:
+                f[name] = f[name].astype(dtype)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fill_missing(df, values):
+    """``df.fillna(values)`` that also works on categoricals, whose fill
+    value has to be a category first. Returns a new frame."""
+    df = df.copy()
+    for name, value in values.items():
+        if name not in df.columns:
+            continue
+        if isinstance(df[name].dtype, pd.CategoricalDtype) and value not in df[name].cat.categories:
+            df[name] = df[name].cat.add_categories([value])
+        if df[name].dtype == object:
+            # fillna on object columns would also re-infer (and downcast) the dtype
+            df.loc[df[name].isna(), name] = value
+        else:
+            df[name] = df[name].fillna(value)
+    return df
+
+
+def memory_report(pairs):
+    """Memory of (table, chunk) pairs before and after ``apply_dtypes``.
+
+    Chunks are measured one at a time, so the report can run over a whole
+    generated dataset without holding it. Returns a DataFrame in MB per
+    table plus a total row.
+    """
+    totals = {}
+    for table, df in pairs:
+        before = df.memory_usage(deep=True, index=False).sum()
+        after = apply_dtypes(df.copy(), table).memory_usage(deep=True, index=False).sum()
+        row = totals.setdefault(table, {'rows': 0, 'before_mb': 0.0, 'after_mb': 0.0})
+        row['rows'] += len(df)
+        row['before_mb'] += before / 1e6
+        row['after_mb'] += after / 1e6
+    report = pd.DataFrame.from_dict(totals, orient='index')
+    report.loc['total'] = report.sum()
+    report['saving %'] = (1 - report['after_mb'] / report['before_mb']) * 100
+    return report
@@ -0,0 +1,269 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import glob
+import logging
+import math
+import sqlite3
+import time
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from config.schema import apply_dtypes
+from data_cleaning.clean import SPEC, clean_columns, to_categories
+from pipeline.date_dimension import add_calendar
+from pipeline.metrics import export, stage
+from pipeline.snapshot import SNAPSHOT_PATH, TABLE as SNAPSHOT_TABLE, SnapshotWriter
+from pipeline.writers import ChunkWriter
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100_000
+
+# Fixed widths for downcast columns, so every chunk written has the same schema
+STREAM_DTYPES = {'integer': 'int32', 'float': 'float32'}
+
+
+def fingerprints(df):
+    """64-bit hash of every row's raw values.
+
+    Numerics are widened first so that the same row hashes the same whether
+    its chunk read a column as int or (because of a null) as float.
+    Categoricals hash by value, not code, so fingerprints agree across chunks.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype('float64')
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class MemorySeenSet:
+    """Exact seen-set held as sorted uint64 runs, 8 bytes per unique row.
+
+    New fingerprints are added as a sorted run and runs of similar size are
+    merged, so insertion is amortized O(log n) per key and lookups are a
+    binary search per run.
+    """
+
+    def __init__(self):
+        self._runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self._runs)
+
+    def add(self, hashes):
+        """Add unique ``hashes``; return a mask of the ones not seen before."""
+        new = np.ones(len(hashes), dtype=bool)
+        for run in self._runs:
+            pos = np.searchsorted(run, hashes)
+            found = pos < len(run)
+            found[found] = run[pos[found]] == hashes[found]
+            new &= ~found
+        if new.any():
+            self._runs.append(np.sort(hashes[new]))
+            while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+                last = self._runs.pop()
+                self._runs[-1] = np.sort(np.concatenate([self._runs[-1], last]), kind='mergesort')
+        return new
+
+    def close(self):
+        self._runs = []
+
+
+class SqliteSeenSet:
+    """Exact seen-set in an on-disk SQLite table, for more unique rows than fit in RAM."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (h INTEGER PRIMARY KEY) WITHOUT ROWID")
+        self._conn.execute("CREATE TEMP TABLE batch (h INTEGER PRIMARY KEY) WITHOUT ROWID")
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    @property
+    def nbytes(self):
+        return os.path.getsize(self.path)
+
+    def add(self, hashes):
+        keys = hashes.view(np.int64)  # SQLite integers are signed 64-bit
+        with self._conn:
+            self._conn.execute("DELETE FROM batch")
+            self._conn.executemany("INSERT INTO batch VALUES (?)", ((int(k),) for k in keys))
+            found = [h for h, in self._conn.execute("SELECT h FROM batch WHERE h IN (SELECT h FROM seen)")]
+            self._conn.execute("INSERT OR IGNORE INTO seen SELECT h FROM batch")
+        return ~np.isin(keys, np.asarray(found, dtype=np.int64))
+
+    def close(self):
+        self._conn.close()
+
+
+class BloomSeenSet:
+    """Probabilistic seen-set: fixed memory, no false negatives.
+
+    A false positive drops a unique row as a duplicate, with probability
+    about ``error_rate`` once ``capacity`` rows have been added.
+    """
+
+    def __init__(self, capacity, error_rate=1e-6):
+        self.bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._array.nbytes
+
+    def _positions(self, hashes):
+        # Double hashing: the k probes are h1 + i*h2 over the two halves of the fingerprint
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.bits)
+
+    def add(self, hashes):
+        pos = self._positions(hashes)
+        byte, bit = pos // np.uint64(8), (pos % np.uint64(8)).astype(np.uint8)
+        present = (self._array[byte] >> bit) & 1
+        new = ~present.all(axis=1)
+        np.bitwise_or.at(self._array, byte[new].ravel(), (np.uint8(1) << bit[new]).ravel())
+        self._count += int(new.sum())
+        return new
+
+    def close(self):
+        self._array = None
+
+
+def make_seen_set(kind='memory', path=None, capacity=None, error_rate=1e-6):
+    if kind == 'memory':
+        return MemorySeenSet()
+    if kind == 'sqlite':
+        if not path:
+            raise ValueError("a path is required for the sqlite seen-set")
+        return SqliteSeenSet(path)
+    if kind == 'bloom':
+        if not capacity:
+            raise ValueError("an expected row capacity is required for the bloom seen-set")
+        return BloomSeenSet(capacity, error_rate)
+    raise ValueError(f"unknown seen-set {kind!r}, expected memory, sqlite or bloom")
+
+
+def first_seen(seen, hashes):
+    """Mask of rows whose fingerprint occurs for the first time, within the
+    chunk and across every chunk already added to ``seen``."""
+    keep = ~pd.Index(hashes).duplicated()
+    keep[keep] = seen.add(hashes[keep])
+    return keep
+
+
+def iter_chunks(source, chunksize=CHUNK_SIZE):
+    """Read a CSV, a Parquet file or a directory of Parquet files (the
+    incremental extract) in chunks of at most ``chunksize`` rows."""
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, '*.parquet')))
+    elif source.endswith('.csv'):
+        yield from pd.read_csv(source, chunksize=chunksize)
+        return
+    else:
+        files = [source]
+    import pyarrow.parquet as pq
+    for path in files:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+def clean_stream(chunks, seen=None, spec=SPEC, calendar=()):
+    """Clean chunks one at a time, dropping rows already seen in any earlier chunk.
+
+    Duplicates are detected on the raw row values, as ``clean`` does, so the
+    concatenated output equals ``clean`` of the whole table. Memory is
+    bounded by one chunk plus the seen-set. ``calendar`` columns are joined
+    as in ``clean``.
+    """
+    seen = seen if seen is not None else MemorySeenSet()
+    for chunk in chunks:
+        to_categories(chunk, spec)
+        keep = first_seen(seen, fingerprints(chunk))
+        if not keep.all():
+            chunk = chunk[keep].copy()
+        clean_columns(chunk, spec)
+        for col, rule in spec.items():
+            if rule.downcast and col in chunk.columns:
+                chunk[col] = chunk[col].astype(STREAM_DTYPES[rule.downcast])
+        if calendar:
+            add_calendar(chunk, calendar)
+        yield chunk
+
+
+def clean_file(source, output, chunksize=CHUNK_SIZE, seen='memory', seen_path=None, capacity=None,
+               error_rate=1e-6, fmt=None, spec=SPEC, calendar=(), snapshot=None):
+    """Clean ``source`` into ``output`` out of core and return run statistics.
+
+    With ``snapshot`` the cleaned rows are also published as a memory-mapped
+    Arrow snapshot at that path (pipeline/snapshot.py).
+    """
+    started = time.perf_counter()
+    seen_set = make_seen_set(seen, seen_path, capacity, error_rate)
+    rows_in = 0
+
+    def counted(chunks):
+        nonlocal rows_in
+        for chunk in chunks:
+            rows_in += len(chunk)
+            yield chunk
+
+    try:
+        with stage('clean_stream') as metrics:
+            with ChunkWriter(output, fmt) as writer, \
+                    SnapshotWriter(snapshot, os.path.abspath(source)) if snapshot else nullcontext() as published:
+                for chunk in clean_stream(counted(iter_chunks(source, chunksize)), seen_set, spec, calendar):
+                    writer.write(chunk)
+                    if published is not None:
+                        published.write(apply_dtypes(chunk, SNAPSHOT_TABLE))
+                    metrics.add(rows=len(chunk))
+                    logger.info("%d rows read, %d written", rows_in, writer.rows)
+            metrics.add(nbytes=writer.bytes_written)
+        stats = {'rows_in': rows_in, 'rows_out': writer.rows, 'duplicates': rows_in - writer.rows,
+                 'seen_set': seen, 'seen_set_mb': seen_set.nbytes / 1e6,
+                 'seconds': time.perf_counter() - started}
+    finally:
+        seen_set.close()
+    logger.info("Cleaned %d rows into %s: %d duplicates dropped in %.1fs", rows_in, output,
+                stats['duplicates'], stats['seconds'])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean an extract chunk by chunk with cross-chunk deduplication")
+    parser.add_argument('source', help="csv/parquet file or incremental extract directory")
+    parser.add_argument('output', help="cleaned csv/parquet/feather file")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--seen', choices=['memory', 'sqlite', 'bloom'], default='memory',
+                        help="where row fingerprints are kept")
+    parser.add_argument('--seen-path', default=None, help="database file for --seen sqlite")
+    parser.add_argument('--capacity', type=int, default=None, help="expected unique rows for --seen bloom")
+    parser.add_argument('--error-rate', type=float, default=1e-6, help="false-positive rate for --seen bloom")
+    parser.add_argument('--snapshot', nargs='?', const=SNAPSHOT_PATH, default=None,
+                        help="also publish an Arrow snapshot for memory-mapped reads (optionally at this path)")
+    parser.add_argument('--calendar', nargs='+', default=(), metavar='COLUMN',
+                        help="date dimension columns to add, e.g. fiscal_period is_public_holiday")
+    parser.add_argument('--metrics-port', type=int, default=None, help="serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-textfile', default=None, help="write Prometheus metrics to this .prom file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    export(args.metrics_port, args.metrics_textfile)
+    print(clean_file(args.source, args.output, args.chunksize, args.seen, args.seen_path, args.capacity,
+                     args.error_rate, calendar=args.calendar, snapshot=args.snapshot))
@@ -0,0 +1,77 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from data_generate.catalog import REGIONS
+
+# Faker is only used to build the vocabularies below, once per process and
+# from a fixed seed; rows are then drawn from them with the partition's numpy
+# Generator, so output stays independent of the worker count
+VOCABULARY_SIZE = 2000
+VOCABULARY_SEED = 0
+
+STATES = np.array([state for states in REGIONS.values() for state in states], dtype=object)
+STATE_REGIONS = np.array([region for region, states in REGIONS.items() for _ in states], dtype=object)
+
+_HEX = np.array(list('0123456789ABCDEF'))
+
+
+@lru_cache(maxsize=None)
+def vocabulary(size=VOCABULARY_SIZE, seed=VOCABULARY_SEED):
+    """Company names, e-mail user names and e-mail domains sampled from Faker."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    # Sorted so the arrays do not depend on set iteration order
+    return {
+        'company': np.array(sorted({fake.company() for _ in range(size)}), dtype=object),
+        'user_name': np.array(sorted({fake.user_name() for _ in range(size)}), dtype=object),
+        'domain': np.array(sorted({fake.free_email_domain() for _ in range(size // 10)}
+                                  | {fake.domain_name() for _ in range(size // 10)}), dtype=object),
+    }
+
+
+def companies(rng, n):
+    names = vocabulary()['company']
+    return names[rng.integers(0, len(names), size=n)]
+
+
+def emails(rng, n):
+    words = vocabulary()
+    users = words['user_name'][rng.integers(0, len(words['user_name']), size=n)]
+    domains = words['domain'][rng.integers(0, len(words['domain']), size=n)]
+    return users + '@' + domains
+
+
+def states(rng, n):
+    """(state, region) arrays; states are uniform, regions follow REGIONS."""
+    idx = rng.integers(0, len(STATES), size=n)
+    return STATES[idx], STATE_REGIONS[idx]
+
+
+def dates_between(rng, start, end, n=None):
+    """Uniform dates from ``start`` to ``end`` inclusive, as datetime64[D].
+
+    ``start`` may be an array (one lower bound per row), which is how later
+    dates are drawn after earlier ones.
+    """
+    start = np.asarray(start, dtype='datetime64[D]')
+    end = np.datetime64(end, 'D')
+    span = (end - start).astype(np.int64) + 1
+    n = n if n is not None else len(start)
+    return start + np.floor(rng.random(n) * span).astype(np.int64)
+
+
+def datetimes_between(rng, start, end, n):
+    """Uniform timestamps in [start, end), as datetime64[us]."""
+    start, end = np.datetime64(start, 'us'), np.datetime64(end, 'us')
+    span = (end - start).astype(np.int64)
+    return start + (rng.random(n) * span).astype(np.int64)
+
+
+def tracking_numbers(rng, n):
+    """Eight upper-case hex digits per row."""
+    nibbles = (rng.integers(0, 2 ** 32, size=n, dtype=np.uint64)[:, None]
+               >> np.arange(28, -1, -4, dtype=np.uint64)) & np.uint64(0xF)
+    return pd.Series(_HEX[nibbles].view('<U8').ravel()).to_numpy(dtype=object)
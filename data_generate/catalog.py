@@ -0,0 +1,124 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Configuration (scale factor 1)
+START_DATE = '2021-01-01'
+END_DATE = '2023-12-31'
+NUM_CUSTOMERS = 5000
+NUM_STORES = 10
+NUM_WAREHOUSES = 5
+NUM_SUPPLIERS = 20
+NUM_PROMOTED_PRODUCTS = 100
+NUM_SHIPMENTS = 1000
+SKUS_PER_BRAND = (5, 8)
+DAILY_PRODUCTS = (50, 100)
+WAREHOUSES_PER_PRODUCT = 5
+TRENDS_PER_WEEK = 1
+
+# Categories and seasonal patterns
+CATEGORIES = {
+    'Electronics': {'brands': ['Sony', 'Samsung', 'Apple', 'Bose'],
+                   'seasonality': [11,12], 'multiplier': 2.5},
+    'Apparel': {'brands': ['Nike', 'Zara', 'Levi\'s', 'Patagonia'],
+               'seasonality': [12,1,2], 'multiplier': 3.0},
+    'Ice Cream': {'brands': ['Ben & Jerry\'s', 'Haagen-Dazs', 'Magnum', 'Talenti'],
+                 'seasonality': [6,7,8], 'multiplier': 4.0},
+    'Outdoor': {'brands': ['The North Face', 'Columbia', 'Patagonia', 'Arc\'teryx'],
+               'seasonality': [5,6,7,8], 'multiplier': 2.8},
+    'Grocery': {'brands': ['Kellogg\'s', 'Heinz', 'Nestle', 'General Mills'],
+               'seasonality': None, 'multiplier': 1.0},
+    'Home': {'brands': ['IKEA', 'Williams-Sonoma', 'Crate & Barrel', 'Bed Bath & Beyond'],
+             'seasonality': [11,12], 'multiplier': 2.0},
+    'Toys': {'brands': ['LEGO', 'Hasbro', 'Mattel', 'Fisher-Price'],
+             'seasonality': [11,12], 'multiplier': 3.5},
+    'Beauty': {'brands': ['L\'Oreal', 'Estee Lauder', 'Clinique', 'MAC'],
+               'seasonality': [11,12], 'multiplier': 2.0},
+    'Sports': {'brands': ['Nike', 'Adidas', 'Under Armour', 'Puma'],
+               'seasonality': [1,5,6], 'multiplier': 1.8},
+    'Books': {'brands': ['Penguin', 'HarperCollins', 'Simon & Schuster', 'Macmillan'],
+              'seasonality': [11,12], 'multiplier': 1.5}
+}
+
+# Demand multiplier on the retail holidays of pipeline.date_dimension
+HOLIDAY_BOOST = 2.0
+
+PROMO_TYPES = ['Discount','BOGO','Bundle','Flash Sale','Seasonal Offer']
+CHANNELS = ['Online','In-Store','Social Media','Email','Mobile App']
+RESPONSES = ['None','Price Match','Bundled Offer','Loyalty Program','Discount War']
+
+# US states by region
+REGIONS = {
+    'Northeast': ['Connecticut', 'Maine', 'Massachusetts', 'New Hampshire', 'Rhode Island', 'Vermont', 
+                  'New Jersey', 'New York', 'Pennsylvania'],
+    'Midwest': ['Illinois', 'Indiana', 'Michigan', 'Ohio', 'Wisconsin', 'Iowa', 'Kansas', 
+                'Minnesota', 'Missouri', 'Nebraska', 'North Dakota', 'South Dakota'],
+    'South': ['Delaware', 'Florida', 'Georgia', 'Maryland', 'North Carolina', 'South Carolina', 
+              'Virginia', 'District of Columbia', 'West Virginia', 'Alabama', 'Kentucky', 
+              'Mississippi', 'Tennessee', 'Arkansas', 'Louisiana', 'Oklahoma', 'Texas'],
+    'West': ['Arizona', 'Colorado', 'Idaho', 'Montana', 'Nevada', 'New Mexico', 'Utah', 
+             'Wyoming', 'Alaska', 'California', 'Hawaii', 'Oregon', 'Washington']
+}
+
+
+def _scaled(value, scale_factor):
+    return max(1, int(round(value * scale_factor)))
+
+
+class ScaleConfig:
+    """Entity counts for a TPC-style scale factor.
+
+    Every entity grows linearly with ``scale_factor``; scale factor 1 matches
+    the original hard-coded globals. Sales grow through the number of
+    products sold per day, and inventory keeps a fixed warehouse fan-out per
+    product so it stays linear as well.
+
+    Attributes that used to be relative to "today" (purchase, restock and
+    shipment dates) are relative to ``reference_date`` instead, so a run can
+    be reproduced later by pinning it.
+    """
+
+    def __init__(self, scale_factor=1.0, start_date=START_DATE, end_date=END_DATE, reference_date=None):
+        if scale_factor <= 0:
+            raise ValueError("scale_factor must be positive")
+        self.scale_factor = scale_factor
+        self.start_date = start_date
+        self.end_date = end_date
+        self.reference_date = pd.Timestamp(reference_date or date.today()).normalize()
+        self.days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days
+        self.num_customers = _scaled(NUM_CUSTOMERS, scale_factor)
+        self.num_stores = _scaled(NUM_STORES, scale_factor)
+        self.num_warehouses = _scaled(NUM_WAREHOUSES, scale_factor)
+        self.num_suppliers = _scaled(NUM_SUPPLIERS, scale_factor)
+        self.num_shipments = _scaled(NUM_SHIPMENTS, scale_factor)
+        self.skus_per_brand = tuple(_scaled(n, scale_factor) for n in SKUS_PER_BRAND)
+        self.daily_products = tuple(_scaled(n, scale_factor) for n in DAILY_PRODUCTS)
+        self.num_promoted_products = _scaled(NUM_PROMOTED_PRODUCTS, scale_factor)
+        self.warehouses_per_product = min(WAREHOUSES_PER_PRODUCT, self.num_warehouses)
+        self.trends_per_week = _scaled(TRENDS_PER_WEEK, scale_factor)
+
+    def ago(self, years=0, months=0):
+        """Point in time relative to the reference date, as a datetime."""
+        return (self.reference_date - pd.DateOffset(years=years, months=months)).to_pydatetime()
+
+    def __repr__(self):
+        return (f"ScaleConfig(scale_factor={self.scale_factor}, {self.start_date}..{self.end_date}, "
+                f"customers={self.num_customers}, stores={self.num_stores}, "
+                f"warehouses={self.num_warehouses}, reference_date={self.reference_date.date()})")
+
+
+def supplier_ids(config):
+    return [f"SUP-{i:03d}" for i in range(1, config.num_suppliers + 1)]
+
+
+def store_ids(config):
+    return [f"STORE-{i:03d}" for i in range(1, config.num_stores + 1)]
+
+
+def warehouse_ids(config):
+    return [f"WH-{i:02d}" for i in range(1, config.num_warehouses + 1)]
+
+
+def customer_ids(numbers):
+    return np.array([f"CUST-{i:05d}" for i in numbers], dtype=object)
@@ -0,0 +1,511 @@
+import csv
+import os
+import tempfile
+import threading
+import time
+import warnings
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from itertools import chain, groupby
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Connection, exc, inspect
+
+from pipeline.metrics import stage
+
+# Rows per executemany call. MySQL drivers fold each call into multi-row
+# INSERTs capped by max_allowed_packet, so larger batches mostly save round trips.
+BATCH_SIZE = 10_000
+
+LoadStats = namedtuple('LoadStats', ['table', 'rows', 'seconds', 'method'])
+
+
+def rows_per_second(stats):
+    return stats.rows / stats.seconds if stats.seconds else float('inf')
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _prepare(df):
+    """Frame with values every DB-API driver accepts (bools as 0/1)."""
+    bool_cols = df.columns[df.dtypes == bool]
+    if len(bool_cols):
+        df = df.astype({col: np.int8 for col in bool_cols})
+    return df
+
+
+def _records(df):
+    columns = []
+    for col, dtype in df.dtypes.items():
+        if dtype.kind == 'M':
+            # Drivers bind datetime.date/datetime, not pandas Timestamps; date-only
+            # columns (all midnight) go in as dates so DATE columns match the source
+            values = df[col].to_numpy()
+            unit = 'D' if (values.astype('datetime64[D]') == values)[~np.isnat(values)].all() else 'us'
+            values = values.astype(f'datetime64[{unit}]').astype(object)
+        elif dtype == np.float32:
+            # Widen through the shortest repr so 3.9 is bound as 3.9, not 3.9000000953674316
+            values = df[col].to_numpy().astype(str).astype(np.float64).astype(object)
+        else:
+            values = df[col].to_numpy(dtype=object)
+        values[df[col].isna().to_numpy()] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _index_sql(conn, index):
+    lengths = index.get('dialect_options', {}).get('mysql_length') or {}
+    if not isinstance(lengths, dict):
+        lengths = dict.fromkeys(index['column_names'], lengths)
+    columns = ', '.join(_quote(conn, col) + (f"({lengths[col]})" if lengths.get(col) else '')
+                        for col in index['column_names'])
+    return f"ADD INDEX {_quote(conn, index['name'])} ({columns})"
+
+
+def _droppable_indexes(conn, table_name):
+    """Non-unique secondary indexes of a MySQL table that no foreign key
+    relies on; InnoDB ignores DISABLE KEYS, so these are dropped instead."""
+    inspector = inspect(conn)
+    fk_columns = [fk['constrained_columns'] for fk in inspector.get_foreign_keys(table_name)]
+    return [index for index in inspector.get_indexes(table_name)
+            if not index.get('unique')
+            and not any(index['column_names'][:len(cols)] == cols for cols in fk_columns)]
+
+
+def _drop_indexes(conn, table_name):
+    """Drop the secondary indexes a bulk load would otherwise maintain row by
+    row; returns (name, definition) pairs for _rebuild_indexes."""
+    dialect = conn.dialect.name
+    table = _quote(conn, table_name)
+    if dialect == 'mysql':
+        # InnoDB ignores DISABLE KEYS, so the indexes are dropped in one ALTER
+        indexes = [(index['name'], _index_sql(conn, index)) for index in _droppable_indexes(conn, table_name)]
+        if indexes:
+            conn.exec_driver_sql(f"ALTER TABLE {table} "
+                                 + ', '.join(f"DROP INDEX {_quote(conn, name)}" for name, _ in indexes))
+    elif dialect == 'sqlite':
+        indexes = conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table_name,)).fetchall()
+        for name, _ in indexes:
+            conn.exec_driver_sql(f"DROP INDEX {_quote(conn, name)}")
+    else:
+        indexes = []
+    conn.commit()
+    return indexes
+
+
+def _rebuild_indexes(conn, table_name, indexes):
+    if indexes and conn.dialect.name == 'mysql':
+        conn.exec_driver_sql(f"ALTER TABLE {_quote(conn, table_name)} " + ', '.join(sql for _, sql in indexes))
+    elif indexes:
+        # Reading the schema first: a pooled connection that has not touched
+        # the database since the drop may still list the index as existing
+        conn.exec_driver_sql("SELECT COUNT(*) FROM sqlite_master").fetchall()
+        for _, sql in indexes:
+            conn.exec_driver_sql(sql)
+    conn.commit()
+
+
+@contextmanager
+def _checks_disabled(conn):
+    """Turn off foreign key (and on MySQL unique) checks for the session."""
+    dialect = conn.dialect.name
+    if dialect == 'mysql':
+        conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 0")
+        conn.exec_driver_sql("SET UNIQUE_CHECKS = 0")
+        try:
+            yield
+        finally:
+            conn.exec_driver_sql("SET UNIQUE_CHECKS = 1")
+            conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 1")
+    elif dialect == 'sqlite':
+        # Only takes effect outside a transaction
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            yield
+        finally:
+            conn.commit()
+            conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+    else:
+        yield
+
+
+@contextmanager
+def _keys_disabled(conn, table_name):
+    """Turn off FK/unique checks and secondary indexes around a bulk load."""
+    with _checks_disabled(conn):
+        indexes = _drop_indexes(conn, table_name)
+        try:
+            yield
+        finally:
+            _rebuild_indexes(conn, table_name, indexes)
+
+
+def _escape_backslashes(df):
+    """Double the backslashes in string columns: LOAD DATA reads a backslash
+    as its escape character, and \\N as NULL."""
+    df = df.copy(deep=False)
+    for col, dtype in df.dtypes.items():
+        values = df[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            if categories.inferred_type == 'string' and categories.str.contains('\\', regex=False).any():
+                df[col] = values.cat.rename_categories(categories.str.replace('\\', '\\\\', regex=False))
+        elif dtype == object and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            if values.str.contains('\\', regex=False).any():
+                df[col] = values.str.replace('\\', '\\\\', regex=False)
+    return df
+
+
+def _load_data_infile(conn, table_name, df):
+    """Stream one chunk through a temporary CSV file and LOAD DATA LOCAL INFILE;
+    returns the bytes sent."""
+    fd, path = tempfile.mkstemp(suffix='.csv', prefix=f'{table_name}-')
+    os.close(fd)
+    try:
+        _escape_backslashes(df).to_csv(path, index=False, header=False, na_rep='\\N', quoting=csv.QUOTE_MINIMAL,
+                                       lineterminator='\n', date_format='%Y-%m-%d %H:%M:%S')
+        columns = ', '.join(_quote(conn, col) for col in df.columns)
+        conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {_quote(conn, table_name)} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '\\n' ({columns})",
+            (path.replace('\\', '/'),))
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def _executemany(conn, table_name, df, batch_size):
+    marker = '?' if conn.dialect.paramstyle == 'qmark' else '%s'
+    columns = ', '.join(_quote(conn, col) for col in df.columns)
+    sql = (f"INSERT INTO {_quote(conn, table_name)} ({columns}) "
+           f"VALUES ({', '.join([marker] * len(df.columns))})")
+    for start in range(0, len(df), batch_size):
+        conn.exec_driver_sql(sql, _records(df.iloc[start:start + batch_size]))
+    # The driver's wire size is not exposed; the chunk's in-memory size stands in for it
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def load_table(engine, table_name, chunks, method='auto', batch_size=BATCH_SIZE, disable_keys=True):
+    """Bulk-append DataFrame chunks to one table and return its LoadStats.
+
+    ``method`` is 'infile' (MySQL LOAD DATA LOCAL INFILE), 'executemany'
+    (batched DB-API executemany, any dialect) or 'auto', which tries
+    LOAD DATA on MySQL and falls back to executemany if the server or driver
+    has local_infile disabled. A missing table is created from the first
+    chunk's columns. Time, rows and bytes are recorded as the 'upload' stage
+    of pipeline.metrics.
+
+    ``engine`` may also be a Connection, in which case the load runs inside
+    the caller's transaction and is committed with it; keys stay enabled.
+    """
+    if method == 'auto':
+        method = 'infile' if engine.dialect.name == 'mysql' else 'executemany'
+    external = isinstance(engine, Connection)
+    disable_keys = disable_keys and not external
+    rows = 0
+    started = time.perf_counter()
+    with stage('upload', table_name) as metrics, nullcontext(engine) if external else engine.connect() as conn:
+        commit = (lambda: None) if external else conn.commit
+        # Time spent producing chunks belongs to the producer's stage, not the upload
+        chunks = metrics.exclude(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return LoadStats(table_name, 0, 0.0, method)
+        if not inspect(conn).has_table(table_name):
+            first.head(0).to_sql(table_name, conn, index=False)
+            commit()
+
+        with _keys_disabled(conn, table_name) if disable_keys else nullcontext():
+            for df in chain([first], chunks):
+                df = _prepare(df)
+                if method == 'infile':
+                    try:
+                        metrics.add(nbytes=_load_data_infile(conn, table_name, df))
+                    except exc.DBAPIError as err:
+                        if rows:
+                            raise
+                        if not external:
+                            conn.rollback()
+                        warnings.warn(f"LOAD DATA LOCAL INFILE unavailable ({err.orig}); "
+                                      f"falling back to executemany for {table_name}")
+                        method = 'executemany'
+                if method == 'executemany':
+                    metrics.add(nbytes=_executemany(conn, table_name, df, batch_size))
+                commit()
+                metrics.add(rows=len(df))
+                rows += len(df)
+    return LoadStats(table_name, rows, time.perf_counter() - started, method)
+
+
+def load_dataset(engine, chunks, **kwargs):
+    """Load a stream of (table_name, chunk) pairs, one table after another.
+
+    Prints rows/sec per table and returns {table_name: LoadStats}.
+    """
+    results = {}
+    for table_name, group in groupby(chunks, key=lambda item: item[0]):
+        stats = load_table(engine, table_name, (df for _, df in group), **kwargs)
+        results[table_name] = stats
+        print(f"Uploaded {stats.rows} rows to {table_name} in {stats.seconds:.2f}s "
+              f"({rows_per_second(stats):,.0f} rows/s, {stats.method})")
+    return results
+
+
+def dependency_levels(metadata=None, tables=None):
+    """Tables grouped into levels by foreign key: every table's parents are
+    in earlier levels, so the tables of one level can load concurrently.
+
+    ``metadata`` defaults to config.schema.build_metadata(); ``tables``
+    limits the result to those names (tables unknown to the metadata have
+    no parents).
+    """
+    from config.schema import build_metadata
+    metadata = metadata if metadata is not None else build_metadata()
+    names = list(tables) if tables is not None else list(metadata.tables)
+    parents = table_parents(metadata, names)
+    levels, placed = [], set()
+    while len(placed) < len(names):
+        level = [name for name in names if name not in placed and parents[name] <= placed]
+        if not level:
+            raise ValueError(f"foreign key cycle between {sorted(set(names) - placed)}")
+        levels.append(level)
+        placed.update(level)
+    return levels
+
+
+def table_parents(metadata, tables):
+    """{table: set of the tables among ``tables`` it references}."""
+    parents = {}
+    for name in tables:
+        table = metadata.tables.get(name)
+        referenced = {fk.column.table.name for fk in table.foreign_keys} if table is not None else set()
+        parents[name] = (referenced & set(tables)) - {name}
+    return parents
+
+
+def _split(df, rows):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+class _TableLoad:
+    """Progress of one table in load_concurrent. ``submitted`` is set once
+    every chunk of the table is queued, ``done`` once they are all loaded
+    and the table's indexes are rebuilt."""
+
+    def __init__(self, name, method, disable_keys=True):
+        self.name = name
+        self.method = method
+        self.disable_keys = disable_keys
+        self.parents = []
+        self.pending = 0
+        self.submitted = False
+        self.rows = 0
+        self.loaded_once = False
+        self.error = None
+        self.rebuild = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.metrics = None
+        self.started = None
+        self.finished = None
+
+    def begin(self):
+        with self.lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+                # The 'upload' stage spans threads: entered by the first insert, left by the last
+                self.metrics = stage('upload', self.name).__enter__()
+
+    def finish_chunk(self, rows=0, nbytes=0, error=None):
+        with self.lock:
+            self.pending -= 1
+            self.rows += rows
+            if self.metrics is not None:
+                self.metrics.add(rows=rows, nbytes=nbytes)
+            self.error = self.error or error
+            self._check_done()
+
+    def close(self, error=None):
+        with self.lock:
+            self.submitted = True
+            self.error = self.error or error
+            self._check_done()
+
+    def _check_done(self):
+        if self.submitted and self.pending == 0 and not self.done.is_set():
+            if self.rebuild is not None:
+                try:
+                    self.rebuild()
+                except BaseException as err:
+                    self.error = self.error or err
+            self.finished = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.__exit__(type(self.error) if self.error else None, self.error, None)
+            self.done.set()
+
+    def stats(self):
+        seconds = self.finished - self.started if self.started is not None else 0.0
+        return LoadStats(self.name, self.rows, seconds, self.method)
+
+
+def _load_chunk(engine, load, df, batch_size):
+    """Insert one chunk on its own pooled connection once the parent tables
+    are loaded; runs on the loader's worker threads."""
+    rows = nbytes = 0
+    error = None
+    try:
+        for parent in load.parents:
+            parent.done.wait()
+            if parent.error is not None:
+                raise RuntimeError(f"{load.name} not loaded: {parent.name} failed") from parent.error
+        load.begin()
+        df = _prepare(df)
+        with engine.connect() as conn, _checks_disabled(conn) if load.disable_keys else nullcontext():
+            with load.lock:
+                method = load.method
+            if method == 'infile':
+                try:
+                    nbytes = _load_data_infile(conn, load.name, df)
+                except exc.DBAPIError as err:
+                    conn.rollback()
+                    # One decision per table: fall back only if no chunk got in through LOAD DATA
+                    with load.lock:
+                        if load.loaded_once and load.method == 'infile':
+                            raise
+                        if load.method == 'infile':
+                            warnings.warn(f"LOAD DATA LOCAL INFILE unavailable ({err.orig}); "
+                                          f"falling back to executemany for {load.name}")
+                            load.method = 'executemany'
+                    method = 'executemany'
+            if method == 'executemany':
+                nbytes = _executemany(conn, load.name, df, batch_size)
+            conn.commit()
+        with load.lock:
+            load.loaded_once = True
+        rows = len(df)
+    except BaseException as err:
+        error = err
+        raise
+    finally:
+        load.finish_chunk(rows, nbytes, error)
+
+
+def _create_table(engine, table_name, df):
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(table_name):
+            df.head(0).to_sql(table_name, conn, index=False)
+            conn.commit()
+
+
+def _indexes_dropped(engine, table_name):
+    """Drop the table's secondary indexes now; returns the callable that
+    rebuilds them."""
+    with engine.connect() as conn:
+        indexes = _drop_indexes(conn, table_name)
+
+    def rebuild():
+        with engine.connect() as conn:
+            _rebuild_indexes(conn, table_name, indexes)
+    return rebuild
+
+
+def load_concurrent(engine, chunks, workers=None, split_rows=5 * BATCH_SIZE, method='auto', batch_size=BATCH_SIZE,
+                    metadata=None, disable_keys=True):
+    """Load a stream of (table_name, chunk) pairs over ``workers`` pooled
+    connections, respecting foreign keys.
+
+    A table's chunks start loading once every table it references (from
+    the SQLAlchemy metadata, config.schema by default) is fully loaded, so
+    independent tables load side by side. The stream has to come in
+    foreign key order: a parent missing from the stream is taken to be
+    loaded already, and one arriving after a table that references it is
+    an error. Chunks of a table must be contiguous. Chunks are split into
+    ``split_rows`` pieces that insert in parallel, with at most two pieces
+    per worker queued, so memory stays bounded by the chunk size.
+
+    With ``disable_keys`` each table's secondary indexes are dropped before
+    its first chunk and rebuilt once after its last, and every insert runs
+    with foreign key and unique checks off, as in load_table. SQLite takes
+    one writer at a time, so it defaults to one worker.
+
+    Prints rows/sec per table and returns {table_name: LoadStats}, where
+    seconds run from the table's first insert to its last.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from config.schema import build_metadata
+    metadata = metadata if metadata is not None else build_metadata()
+    if workers is None:
+        # NullPool and StaticPool have no size
+        workers = 1 if engine.dialect.name == 'sqlite' else getattr(engine.pool, 'size', lambda: 1)()
+    if method == 'auto':
+        method = 'infile' if engine.dialect.name == 'mysql' else 'executemany'
+    loads, futures, errors = {}, [], []
+    slots = threading.BoundedSemaphore(2 * workers)
+
+    def finished(future, load):
+        # Record the error before freeing the slot, so the next submit sees it
+        if future.cancelled():
+            load.finish_chunk()
+        elif future.exception() is not None:
+            errors.append(future.exception())
+        slots.release()
+
+    def submit(load, frames):
+        for df in frames:
+            for piece in _split(df, split_rows):
+                if errors:
+                    raise errors[0]
+                slots.acquire()
+                with load.lock:
+                    load.pending += 1
+                futures.append(pool.submit(_load_chunk, engine, load, piece, batch_size))
+                futures[-1].add_done_callback(lambda future, load=load: finished(future, load))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loader') as pool:
+        try:
+            for table_name, group in groupby(chunks, key=lambda item: item[0]):
+                if table_name in loads:
+                    raise ValueError(f"chunks of {table_name} are not contiguous in the stream")
+                late = [name for name in loads if table_name in table_parents(metadata, [name, table_name])[name]]
+                if late:
+                    raise ValueError(f"{table_name} arrives after {', '.join(late)}, which reference it; "
+                                     f"the stream must be in foreign key order")
+                load = loads[table_name] = _TableLoad(table_name, method, disable_keys)
+                parents = table_parents(metadata, set(metadata.tables) | {table_name})[table_name]
+                load.parents = [loads[p] for p in parents if p in loads]
+                frames = (df for _, df in group)
+                first = next(frames)
+                _create_table(engine, table_name, first)
+                if disable_keys:
+                    load.rebuild = _indexes_dropped(engine, table_name)
+                try:
+                    submit(load, chain([first], frames))
+                finally:
+                    load.close()
+            for future in futures:
+                future.result()
+            for load in loads.values():
+                load.done.wait()
+                if load.error is not None:
+                    raise load.error
+        except BaseException as err:
+            for future in futures:
+                future.cancel()
+            for load in loads.values():
+                load.close(err)
+            raise
+
+    results = {}
+    for name, load in loads.items():
+        stats = results[name] = load.stats()
+        print(f"Uploaded {stats.rows} rows to {name} in {stats.seconds:.2f}s "
+              f"({rows_per_second(stats):,.0f} rows/s, {stats.method})")
+    return results
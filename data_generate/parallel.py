@@ -0,0 +1,86 @@
+import os
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# One unit of generation work. `func` is called as
+# func(*args, rng=..., **{name: shared[name] for name in shared})
+Partition = namedtuple('Partition', ['table', 'index', 'func', 'args', 'shared'])
+
+# Per-process state: large read-only inputs shipped once per worker
+_shared = {}
+
+
+def partition_seed(seed, table, index=0):
+    """Independent SeedSequence for one partition of one table.
+
+    The sequence depends only on (seed, table, index), never on which worker
+    runs the partition or in what order, so output is identical for any
+    worker count.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(table.encode()), index))
+
+
+def seeded(seed, table, index=0):
+    """numpy Generator seeded for one partition."""
+    return np.random.default_rng(partition_seed(seed, table, index))
+
+
+def run_partition(seed, partition):
+    shared = {name: _shared[name] for name in partition.shared}
+    return partition.func(*partition.args, rng=seeded(seed, partition.table, partition.index), **shared)
+
+
+def _init_worker(shared):
+    _shared.update(shared)
+
+
+def resolve_workers(workers):
+    """0 or None means one worker per core."""
+    return workers if workers else os.cpu_count() or 1
+
+
+class PartitionRunner:
+    """Runs partitions inline or across a process pool, yielding results in order.
+
+    At most ``prefetch`` partitions per worker are in flight, so a slow sink
+    applies back-pressure instead of letting finished chunks pile up.
+    """
+
+    def __init__(self, seed, shared, workers=1, prefetch=2):
+        self.seed = seed
+        self.shared = shared
+        self.workers = resolve_workers(workers)
+        self.prefetch = prefetch
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.shared,))
+        else:
+            _shared.update(self.shared)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        else:
+            for name in self.shared:
+                _shared.pop(name, None)
+
+    def map(self, partitions):
+        if self._pool is None:
+            for partition in partitions:
+                yield run_partition(self.seed, partition)
+            return
+
+        pending = deque()
+        for partition in partitions:
+            pending.append(self._pool.submit(run_partition, self.seed, partition))
+            if len(pending) >= self.workers * self.prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# Product codes live in the high bits of a lookup key, day numbers in the low bits
+_DAY_BITS = 32
+
+
+def _day_numbers(values):
+    """Days since the epoch for dates, datetimes, strings or datetime64 arrays."""
+    return np.asarray(pd.to_datetime(values), dtype='datetime64[D]').astype(np.int64)
+
+
+class PromotionIndex:
+    """Per-product interval index over campaign_start_date / campaign_end_date.
+
+    Each product's campaigns are cut into non-overlapping segments, and every
+    segment remembers which promotion is active on it. When campaigns overlap
+    the earliest one in the promotions table wins, which is what the old
+    linear scan did. All segments share one sorted key array, so a lookup is
+    a single binary search, and whole arrays of (product, date) pairs are
+    resolved with one ``np.searchsorted`` call.
+    """
+
+    def __init__(self, promotions_df):
+        self.promotions = promotions_df.reset_index(drop=True)
+        if 'promotion_id' in self.promotions:
+            self.promotion_ids = self.promotions['promotion_id'].to_numpy(dtype=np.int64)
+        else:
+            self.promotion_ids = np.arange(1, len(self.promotions) + 1, dtype=np.int64)
+        self.discounts = pd.to_numeric(self.promotions['discount_percentage'],
+                                       errors='coerce').to_numpy(dtype=float)
+
+        codes, self.products = pd.factorize(self.promotions['product_id'])
+        starts = _day_numbers(self.promotions['campaign_start_date'])
+        ends = _day_numbers(self.promotions['campaign_end_date'])
+
+        keys, rows = [], []
+        for code in range(len(self.products)):
+            members = np.flatnonzero(codes == code)
+            bounds = np.unique(np.concatenate([starts[members], ends[members] + 1]))
+            covers = (starts[members, None] <= bounds) & (bounds <= ends[members, None])
+            first = members[covers.argmax(axis=0)]
+            keys.append((code << _DAY_BITS) + bounds)
+            rows.append(np.where(covers.any(axis=0), first, -1))
+
+        self._keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        self._rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.promotions)
+
+    def lookup(self, product_ids, dates):
+        """Row position in the promotions table of the active campaign, -1 if none."""
+        codes = self.products.get_indexer(np.asarray(product_ids, dtype=object))
+        days = np.broadcast_to(_day_numbers(dates), codes.shape)
+        result = np.full(codes.shape, -1, dtype=np.int64)
+        known = codes >= 0
+        if not known.any() or not len(self._keys):
+            return result
+
+        query = (codes[known].astype(np.int64) << _DAY_BITS) + days[known]
+        pos = np.searchsorted(self._keys, query, side='right') - 1
+        # A query before a product's first campaign lands on the previous product's last segment
+        same_product = (pos >= 0) & ((self._keys[np.maximum(pos, 0)] >> _DAY_BITS) == codes[known])
+        result[known] = np.where(same_product, self._rows[np.maximum(pos, 0)], -1)
+        return result
+
+    def match(self, product_ids, dates):
+        """Bulk lookup returning (promo_flag, promotion_id, discount_percentage) arrays."""
+        rows = self.lookup(product_ids, dates)
+        found = rows >= 0
+        # np.where evaluates both branches, so misses index row 0 instead of -1
+        # (there is no row -1 when the promotions table is empty)
+        rows = np.where(found, rows, 0)
+        promotion_id = pd.array(np.zeros(rows.shape, dtype=np.int64), dtype='Int64')
+        discount = np.full(rows.shape, np.nan)
+        if found.any():
+            promotion_id[found] = self.promotion_ids[rows[found]]
+            discount[found] = self.discounts[rows[found]]
+        promotion_id[~found] = pd.NA
+        return found, promotion_id, discount
+
+    def active(self, product_id, date):
+        """Active promotion for one (product_id, date) as a dict, or None."""
+        row = self.lookup([product_id], [date])[0]
+        if row < 0:
+            return None
+        return dict(self.promotions.iloc[row], promotion_id=int(self.promotion_ids[row]))
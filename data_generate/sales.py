@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from data_generate.catalog import DAILY_PRODUCTS, customer_ids
+from data_generate.promotions import PromotionIndex
+from pipeline.date_dimension import build_date_dimension, seasonality
+
+NOISE_RANGE = (0.7, 1.3)
+BASE_SALES_RANGE = (1, 50)
+# Cap on the days x products random keys drawn at once (32 MB of float64)
+MAX_SAMPLE_KEYS = 4_000_000
+
+
+def sample_daily_products(rng, n_days, n_products, daily_products=DAILY_PRODUCTS, max_keys=MAX_SAMPLE_KEYS):
+    """Draw a without-replacement product sample for every day at once.
+
+    Returns (day_index, product_index) arrays, one entry per sales row. The
+    random keys are drawn in blocks of days of at most ``max_keys`` values;
+    the draws, and so the sample, are the same for any block size.
+    """
+    low, high = daily_products
+    high = min(high, n_products)
+    low = min(low, high)
+    counts = rng.integers(low, high + 1, size=n_days)
+
+    # The `high` smallest random keys per row form a uniform sample; ordering
+    # them by key makes any prefix of it a uniform sample as well.
+    block = max(1, max_keys // max(n_products, 1))
+    picked = np.empty((n_days, high), dtype=np.int64)
+    for start in range(0, n_days, block):
+        keys = rng.random((min(block, n_days - start), n_products))
+        part = np.argpartition(keys, high - 1, axis=1)[:, :high]
+        order = np.argsort(np.take_along_axis(keys, part, axis=1), axis=1)
+        picked[start:start + len(keys)] = np.take_along_axis(part, order, axis=1)
+
+    mask = np.arange(high) < counts[:, None]
+    day_idx = np.repeat(np.arange(n_days), counts)
+    return day_idx, picked[mask]
+
+
+def generate_sales(products_df, customers, stores, start_date, end_date, categories,
+                   promotions=None, rng=None, daily_products=DAILY_PRODUCTS, calendar=None):
+    """Vectorized replacement for the per-day / per-product sales loop.
+
+    Every random draw is made for the whole date range in one call, and the
+    resulting frame is assembled directly from column arrays. ``customers`` is
+    either the customer ids or the customer count (ids CUST-00001...), and
+    ``promotions`` a promotions DataFrame or a prebuilt ``PromotionIndex``.
+    Holiday flags and seasonality come from the date dimension ``calendar``
+    (pipeline.date_dimension), built for the range when not given.
+    """
+    rng = rng if rng is not None else np.random.default_rng(42)
+    dates = pd.date_range(start_date, end_date)
+    if calendar is None:
+        calendar = build_date_dimension(dates[0], dates[-1], categories=categories)
+    calendar = calendar.loc[dates[0]:dates[-1]]
+
+    day_idx, prod_idx = sample_daily_products(rng, len(dates), len(products_df), daily_products)
+    n = len(day_idx)
+
+    category_codes = pd.Categorical(products_df['category'], categories=list(categories)).codes
+    prices = products_df['price'].to_numpy(dtype=float)
+    product_ids = products_df['product_id'].to_numpy(dtype=object)
+    holidays = calendar['holiday_flag'].to_numpy(dtype=object)
+    holidays[pd.isna(holidays)] = None
+    on_holiday = (calendar['holiday_boost'].to_numpy() != 1)[day_idx]
+
+    # Base sales, seasonality, holiday boost and noise
+    qty = rng.integers(BASE_SALES_RANGE[0], BASE_SALES_RANGE[1] + 1, size=n)
+    qty = (qty * seasonality(calendar, categories)[category_codes[prod_idx], day_idx]).astype(np.int64)
+    qty = np.where(on_holiday, (qty * calendar['holiday_boost'].to_numpy()[day_idx]).astype(np.int64), qty)
+    qty = np.maximum(1, (qty * rng.uniform(*NOISE_RANGE, size=n)).astype(np.int64))
+
+    if np.isscalar(customers):
+        row_customers = customer_ids(rng.integers(1, customers + 1, size=n))
+    else:
+        customers = np.asarray(customers, dtype=object)
+        row_customers = customers[rng.integers(0, len(customers), size=n)]
+    stores = np.asarray(stores, dtype=object)
+    row_products = product_ids[prod_idx]
+    row_dates = dates.to_numpy()[day_idx]
+
+    if promotions is None:
+        promo_flag = np.zeros(n, dtype=bool)
+        promotion_id = pd.array([pd.NA] * n, dtype='Int64')
+        promo_discount = np.full(n, np.nan)
+    else:
+        if not isinstance(promotions, PromotionIndex):
+            promotions = PromotionIndex(promotions)
+        promo_flag, promotion_id, promo_discount = promotions.match(row_products, row_dates)
+
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d").to_numpy(dtype=object)[day_idx],
+        "product_id": row_products,
+        "customer_id": row_customers,
+        "store_id": stores[rng.integers(0, len(stores), size=n)],
+        "sales_quantity": qty,
+        "sales_revenue": qty * prices[prod_idx],
+        "promo_flag": promo_flag,
+        "promotion_id": promotion_id,
+        "promo_discount": promo_discount,
+        "holiday_flag": holidays[day_idx]
+    })
@@ -0,0 +1,104 @@
+import os
+import shutil
+from itertools import groupby
+
+import pandas as pd
+
+from data_generate.loader import load_concurrent, load_dataset
+from pipeline.writers import arrow_schema
+
+# Low-cardinality string columns stored as dictionary<int32, string> in Parquet
+DICTIONARY_COLUMNS = {
+    'product_id', 'category', 'brand', 'supplier_id', 'lifecycle_stage', 'warehouse',
+    'stock_location', 'customer_gender', 'customer_location', 'promotion_type',
+    'target_audience', 'channel', 'competitor_response', 'store_id', 'holiday_flag',
+    'transport_mode', 'status', 'weather_condition',
+}
+
+# Tables written as year=/month= partitions, keyed by the date column to split on
+PARTITION_BY = {'sales': 'date'}
+
+
+class SqlSink:
+    """Bulk-loads each table into a database through data_generate.loader.
+
+    Tables load concurrently in foreign key order over ``workers`` pooled
+    connections (None: the pool size, one on SQLite); ``workers=1`` loads
+    them one after another. Either way each table's secondary indexes are
+    dropped for its load and rebuilt once after it.
+    """
+
+    def __init__(self, engine, workers=None, **load_kwargs):
+        self.engine = engine
+        self.workers = workers
+        self.load_kwargs = load_kwargs
+
+    def write(self, chunks):
+        if self.workers == 1:
+            stats = load_dataset(self.engine, chunks, **self.load_kwargs)
+        else:
+            stats = load_concurrent(self.engine, chunks, self.workers, **self.load_kwargs)
+        return {table: table_stats.rows for table, table_stats in stats.items()}
+
+
+class ParquetSink:
+    """Streams each table into a directory of zstd-compressed Parquet files.
+
+    Layout is ``root/<table>/part-00000.parquet``, and for tables listed in
+    ``partition_by`` ``root/<table>/year=YYYY/month=M/part-00000.parquet`` so
+    readers can prune partitions and push predicates down. Every incoming
+    chunk becomes one row group, so a table is never held in memory as a
+    whole.
+    """
+
+    def __init__(self, root, partition_by=None, compression='zstd', dictionary_columns=None,
+                 overwrite=False):
+        import pyarrow  # noqa: F401 - fail early if the optional dependency is missing
+        self.root = root
+        self.partition_by = PARTITION_BY if partition_by is None else partition_by
+        self.compression = compression
+        self.dictionary_columns = DICTIONARY_COLUMNS if dictionary_columns is None else set(dictionary_columns)
+        self.overwrite = overwrite
+
+    def _partitions(self, table, df):
+        date_col = self.partition_by.get(table)
+        if date_col is None:
+            yield (), df
+            return
+        dates = pd.to_datetime(df[date_col])
+        for (year, month), part in df.groupby([dates.dt.year, dates.dt.month], sort=True):
+            yield (f"year={year}", f"month={month}"), part
+
+    def write_table(self, table, chunks):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table_dir = os.path.join(self.root, table)
+        if os.path.exists(table_dir) and os.listdir(table_dir):
+            if not self.overwrite:
+                raise FileExistsError(f"{table_dir} is not empty (pass overwrite=True to replace it)")
+            shutil.rmtree(table_dir)
+
+        writers, schema, rows = {}, None, 0
+        try:
+            for df in chunks:
+                if schema is None:
+                    schema = arrow_schema(df, self.dictionary_columns)
+                for parts, part in self._partitions(table, df):
+                    path = os.path.join(table_dir, *parts, 'part-00000.parquet')
+                    if path not in writers:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        writers[path] = pq.ParquetWriter(path, schema, compression=self.compression)
+                    writers[path].write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                rows += len(df)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return rows
+
+    def write(self, chunks):
+        totals = {}
+        for table, group in groupby(chunks, key=lambda item: item[0]):
+            totals[table] = self.write_table(table, (df for _, df in group))
+            print(f"Wrote {totals[table]} rows to {os.path.join(self.root, table)}")
+        return totals
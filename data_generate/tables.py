@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+
+from config.schema import apply_dtypes
+from data_generate.catalog import (CATEGORIES, PROMO_TYPES, CHANNELS, RESPONSES, ScaleConfig,
+                                   customer_ids, store_ids, supplier_ids, warehouse_ids)
+from data_generate.attributes import companies, dates_between, datetimes_between, emails, states, tracking_numbers
+from data_generate.parallel import Partition, PartitionRunner, seeded
+from data_generate.promotions import PromotionIndex
+from data_generate.sales import generate_sales
+from pipeline.date_dimension import date_dimension
+from pipeline.metrics import observe_chunks
+
+# Rows per partition for tables generated by id range
+CHUNK_SIZE = 100_000
+
+
+def _pick(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size=size)]
+
+
+def _chunks(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield start, min(start + chunk_size, total)
+
+
+# Generate Products
+def generate_products(config, rng):
+    brands = [(category, brand) for category, details in CATEGORIES.items() for brand in details['brands']]
+    low, high = config.skus_per_brand
+    per_brand = rng.integers(low, high + 1, size=len(brands))
+    n = int(per_brand.sum())
+
+    owner = np.repeat(np.arange(len(brands)), per_brand)
+    sku_ids = np.arange(1001, 1001 + n)
+    cost = np.round(rng.uniform(5, 200, size=n), 2)
+    price = np.round(cost * rng.uniform(1.3, 3.0, size=n), 2)  # 30-200% markup
+    dims = rng.integers(5, 51, size=(n, 3))
+    made_from, made_to = config.ago(years=5).date(), config.ago(months=6).date()
+
+    return pd.DataFrame({
+        "product_id": [f"{brands[b][0][:3]}-{brands[b][1][:3]}-{s}" for b, s in zip(owner, sku_ids)],
+        "category": [brands[b][0] for b in owner],
+        "brand": [brands[b][1] for b in owner],
+        "sku": [f"SKU-{s}" for s in sku_ids],
+        "price": price,
+        "cost": cost,
+        "supplier_id": _pick(rng, supplier_ids(config), n),
+        "product_dimensions": [f"{a}x{b}x{c} cm" for a, b, c in dims],
+        "manufacture_date": dates_between(rng, made_from, made_to, n),
+        "warranty_period_years": _pick(rng, [1,2,3], n).astype(int),
+        "lifecycle_stage": _pick(rng, ['New','Growth','Maturity','Decline'], n)
+    })
+
+
+# Generate Suppliers
+def generate_suppliers(config, rng):
+    ids = supplier_ids(config)
+    n = len(ids)
+    contract_from, contract_to = config.ago(years=5).date(), config.ago(years=1).date()
+    return pd.DataFrame({
+        "supplier_id": ids,
+        "supplier_name": companies(rng, n),
+        "contact_info": emails(rng, n),
+        "supplier_rating": np.round(rng.uniform(3.0, 5.0, size=n), 1),
+        "lead_time_days": _pick(rng, [7,14,21,30], n).astype(int),
+        "contract_start_date": dates_between(rng, contract_from, contract_to, n)
+    })
+
+
+# Generate Inventory, for products [start, stop)
+def generate_inventory(config, start, stop, rng, products_df):
+    warehouses = np.asarray(warehouse_ids(config), dtype=object)
+    fan_out = config.warehouses_per_product
+    # Each product is stocked in `fan_out` consecutive warehouses
+    product_idx = np.repeat(np.arange(start, stop), fan_out)
+    slot = np.tile(np.arange(fan_out), stop - start)
+    n = len(product_idx)
+    restock_from, today = config.ago(years=3).date(), config.ago().date()
+    return pd.DataFrame({
+        "product_id": products_df['product_id'].to_numpy()[product_idx],
+        "warehouse": warehouses[(product_idx * fan_out + slot) % len(warehouses)],
+        "stock_level": rng.integers(50, 1001, size=n),
+        "restock_frequency_days": _pick(rng, [7,14,30], n).astype(int),
+        "stock_location": _pick(rng, ['A1','B2','C3','D4'], n),
+        "order_quantity": rng.integers(50, 201, size=n),
+        "restock_date": dates_between(rng, restock_from, today, n)
+    })
+
+
+# Generate Customers, for customer numbers [start, stop)
+def generate_customers(config, start, stop, rng):
+    n = stop - start
+    first_from, today = config.ago(years=3).date(), config.ago().date()
+    first_purchase = dates_between(rng, first_from, today, n)
+    location, region = states(rng, n)
+    return pd.DataFrame({
+        "customer_id": customer_ids(range(start + 1, stop + 1)),
+        "customer_age": rng.integers(18, 81, size=n),
+        "customer_gender": _pick(rng, ['M','F'], n),
+        "customer_location": location,
+        "customer_region": region,
+        "first_purchase_date": first_purchase,
+        "last_purchase_date": dates_between(rng, first_purchase, today),  # never before the first purchase
+        "lifetime_value": np.round(rng.uniform(100, 5000, size=n), 2)
+    })
+
+
+# Generate Promotions
+def generate_promotions(config, products_df, rng):
+    n_products = min(config.num_promoted_products, len(products_df))
+    promoted = rng.choice(len(products_df), size=n_products, replace=False)
+    per_product = rng.integers(1, 4, size=n_products)  # 1-3 promos per product
+    product_idx = np.repeat(promoted, per_product)
+    n = len(product_idx)
+
+    promo_type = _pick(rng, PROMO_TYPES, n)
+    flash = promo_type == 'Flash Sale'
+    duration = np.where(flash, _pick(rng, [3,7,14,30], n).astype(int), rng.integers(7, 61, size=n))
+    discount = np.where(promo_type == 'Discount', rng.integers(10, 71, size=n).astype(object), None)
+    start_from, start_to = config.ago(years=4).date(), config.ago(years=2).date()
+    start_date = dates_between(rng, start_from, start_to, n)
+
+    return pd.DataFrame({
+        "promotion_id": np.arange(1, n + 1),
+        "product_id": products_df['product_id'].to_numpy()[product_idx],
+        "promotion_type": promo_type,
+        "discount_percentage": discount,
+        "campaign_duration_days": duration,
+        "campaign_budget": np.round(rng.uniform(1000, 10000, size=n), 2),
+        "campaign_start_date": start_date,
+        "campaign_end_date": start_date + duration.astype('timedelta64[D]'),
+        "target_audience": _pick(rng, ['Families','Teens','Adults','Seniors','All'], n),
+        "channel": _pick(rng, CHANNELS, n),
+        "competitor_response": _pick(rng, RESPONSES, n)
+    })
+
+
+# Generate Sales with Seasonality, for days [start, end]
+def month_ranges(start_date, end_date):
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    for month_start in pd.date_range(start.replace(day=1), end, freq='MS'):
+        month_end = month_start + pd.offsets.MonthEnd(0)
+        yield max(month_start, start), min(month_end, end)
+
+
+def sales_ranges(start_date, end_date, rows_per_day, chunk_size=CHUNK_SIZE):
+    """Calendar months, split into runs of days expected to produce at most
+    ``chunk_size`` sales rows (at least one day each)."""
+    days = max(1, int(chunk_size // max(rows_per_day, 1)))
+    for start, end in month_ranges(start_date, end_date):
+        for piece in pd.date_range(start, end, freq=f'{days}D'):
+            yield piece, min(piece + pd.Timedelta(days=days - 1), end)
+
+
+def generate_period_sales(config, start, end, rng, products_df, promotions, calendar=None):
+    return generate_sales(products_df, config.num_customers, store_ids(config), start, end, CATEGORIES,
+                          promotions, rng=rng, daily_products=config.daily_products, calendar=calendar)
+
+
+# Generate Shipments, for shipment numbers [start, stop)
+def generate_shipments(config, start, stop, rng, products_df):
+    n = stop - start
+    depart_from, now = config.ago(years=2), config.ago()
+    depart = datetimes_between(rng, depart_from, now, n)
+    transit = rng.integers(1, 15, size=n)
+    return pd.DataFrame({
+        "shipment_id": [f"SHIP-{i:05d}" for i in range(start + 1, stop + 1)],
+        "product_id": _pick(rng, products_df['product_id'], n),
+        "transport_mode": _pick(rng, ['Truck','Air','Sea','Rail'], n),
+        "shipment_tracking_number": tracking_numbers(rng, n),
+        "shipment_departure_time": depart,
+        "shipment_arrival_time": depart + transit.astype('timedelta64[D]'),  # 1-14 days after departure
+        "status": _pick(rng, ['Delivered','In Transit','Delayed'], n)
+    })
+
+
+# Generate Market Trends (weekly)
+def generate_market_trends(config, products_df, rng):
+    weeks = pd.date_range(config.start_date, config.end_date, freq='W')
+    dates = weeks.repeat(config.trends_per_week)
+    n = len(dates)
+    month = dates.month.to_numpy()
+    temp = np.where(np.isin(month, [6,7,8]), 30,
+                    np.where(np.isin(month, [12,1,2]), -5, rng.integers(10, 26, size=n)))
+    weather = np.where(temp > 30, "Heatwave",
+                       np.where(temp < 0, "Snowy", _pick(rng, ["Sunny","Rainy","Cloudy"], n)))
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "product_id": _pick(rng, products_df['product_id'], n),
+        "temperature": temp,
+        "weather_condition": weather,
+        "social_media_mentions": rng.integers(50, 501, size=n),
+        "competitor_analysis_score": np.round(rng.uniform(60, 90, size=n), 2),
+        "cpi_change": np.round(rng.uniform(-0.02, 0.05, size=n), 4)
+    })
+
+
+def _id_partitions(table, func, config, total, chunk_size, shared=()):
+    for index, (start, stop) in enumerate(_chunks(total, chunk_size)):
+        yield Partition(table, index, func, (config, start, stop), shared)
+
+
+def partitions(config, n_products, chunk_size=CHUNK_SIZE):
+    """Partition plan per table: id ranges for inventory, customers and
+    shipments, calendar months for sales, split where a month is expected to
+    exceed ``chunk_size`` rows."""
+    fan_out = config.warehouses_per_product
+    low, high = (min(n, n_products) for n in config.daily_products)
+    return {
+        'inventory': _id_partitions('inventory', generate_inventory, config, n_products,
+                                    max(1, chunk_size // fan_out), ('products_df',)),
+        'customers': _id_partitions('customers', generate_customers, config, config.num_customers, chunk_size),
+        'sales': (Partition('sales', index, generate_period_sales, (config, start, end),
+                             ('products_df', 'promotions', 'calendar'))
+                  for index, (start, end) in enumerate(sales_ranges(config.start_date, config.end_date,
+                                                                    (low + high) / 2, chunk_size))),
+        'shipments': _id_partitions('shipments', generate_shipments, config, config.num_shipments,
+                                    chunk_size, ('products_df',)),
+    }
+
+
+def generate_dataset(config=None, seed=42, chunk_size=CHUNK_SIZE, workers=1, compact=True):
+    """Yield (table_name, chunk) pairs for the whole dataset.
+
+    Dimension tables (products, suppliers, promotions, market_trends) come out
+    as one chunk each; inventory, customers and shipments are partitioned by
+    id range and sales by calendar month, with months split into runs of days
+    expected to stay within ``chunk_size`` rows. Peak memory is then set by
+    the chunk size rather than by the scale factor or date range, down to
+    one day of sales: a single day is never split.
+
+    Every table and partition draws from its own seed derived from ``seed``,
+    and partitions run on ``workers`` processes (0 = one per core). Results
+    are yielded in partition order, so the output is identical for any
+    worker count.
+
+    With ``compact`` every chunk is converted to the dtypes of config.schema
+    (categoricals, narrow ints, datetime64) on the way out.
+
+    Generation time and rows per table are recorded as the 'generate' stage
+    of pipeline.metrics; time the consumer spends between chunks is excluded.
+    """
+    config = config or ScaleConfig()
+    pairs = _generate_tables(config, seed, chunk_size, workers)
+    if compact:
+        # Shallow copy: products_df and promotions_df are still used for generation
+        pairs = ((table, apply_dtypes(df.copy(deep=False), table)) for table, df in pairs)
+    yield from observe_chunks(pairs, 'generate')
+
+
+def _generate_tables(config, seed, chunk_size, workers):
+
+    products_df = generate_products(config, seeded(seed, 'products'))
+    promotions_df = generate_promotions(config, products_df, seeded(seed, 'promotions'))
+    shared = {'products_df': products_df, 'promotions': PromotionIndex(promotions_df),
+              'calendar': date_dimension(config.start_date, config.end_date)}
+    plan = partitions(config, len(products_df), chunk_size)
+
+    yield 'products', products_df
+    yield 'suppliers', generate_suppliers(config, seeded(seed, 'suppliers'))
+    with PartitionRunner(seed, shared, workers) as runner:
+        for table in ('inventory', 'customers', 'promotions', 'sales', 'shipments'):
+            if table == 'promotions':
+                yield table, promotions_df
+                continue
+            for chunk in runner.map(plan[table]):
+                yield table, chunk
+    yield 'market_trends', generate_market_trends(config, products_df, seeded(seed, 'market_trends'))
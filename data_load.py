@@ -1,19 +1,17 @@
-import pandas as pd
-from sqlalchemy import create_engine
+import os
+from config.db_config import get_engine
+from pipeline.incremental import incremental_ingest, read_extract
 
-# Replace with your actual credentials
-username = 'root'
-password = '1234'
-host = 'localhost'
-port = '3306'
-database = 'retail_data'
+EXTRACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'raw', 'demand_forecasting_base')
 
-# Create connection
-engine = create_engine(f'mysql+pymysql://{username}:{password}@{host}:{port}/{database}')
+# Pooled connection to retail_data (credentials in config/database.ini or DB_RETAIL_DATA_URL)
+engine = get_engine('retail_data')
 
-# Fetch the joined table (change table name if needed)
-query = "SELECT * FROM demand_forecasting_base;"  # Or clean_sales_data if already cleaned in SQL
-df = pd.read_sql(query, engine)
+# Bring the local extract of the joined table up to date (only new rows are fetched
+# after the first run) and load it
+summary = incremental_ingest(engine, 'demand_forecasting_base', EXTRACT_DIR)
+print(f"{summary['mode'].capitalize()} ingest: {summary['fetched']} rows fetched")
+df = read_extract(EXTRACT_DIR)
 
 # Preview
 print(df.head())
@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from data_generate.catalog import CATEGORIES
+from forecasting.engine import HORIZON, TABLE, TABLE_COLUMNS, load_sales
+from config.schema import apply_dtypes
+from pipeline.date_dimension import date_dimension, seasonality
+from pipeline.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('seasonal_naive', 'moving_average', 'ewma')
+SEASON = 7
+WINDOW = 28
+ALPHA = 0.2
+# Half-width of an 80% normal interval
+INTERVAL_Z = 1.2816
+
+
+def series_matrix(df, by=('product_id',)):
+    """Daily sales_quantity as a (series x days) array.
+
+    Returns (keys, dates, values): ``keys`` is a DataFrame with the ``by``
+    columns (plus category when ``df`` has it) per row of ``values``, and
+    ``dates`` the DatetimeIndex of its columns, with every day from the first
+    to the last date in ``df``.
+    """
+    by = list(by)
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    days = pd.date_range(dates.min(), dates.max(), freq='D')
+    groups = df.groupby(by, observed=True, sort=True)
+    codes = groups.ngroup().to_numpy()
+    keys = groups.size().index.to_frame(index=False)
+    day_idx = ((dates - days[0]) // pd.Timedelta(days=1)).to_numpy()
+    flat = np.bincount(codes * len(days) + day_idx, weights=df['sales_quantity'].to_numpy(dtype=np.float64),
+                       minlength=len(keys) * len(days))
+    if 'category' in df.columns:
+        keys['category'] = df['category'].groupby(codes).first().to_numpy()
+    return keys, days, flat.reshape(len(keys), len(days))
+
+
+def multipliers(categories, dates, categories_info=CATEGORIES):
+    """(series x days) demand multipliers the generator applies: the
+    category's in-season multiplier and the holiday boost. Series without a
+    known category only get the holiday boost. Both come from the date
+    dimension (pipeline.date_dimension)."""
+    dim = date_dimension(dates[0], dates[-1], categories=categories_info).loc[dates]
+    factors = seasonality(dim, categories if categories is not None else [None])
+    return factors * dim['holiday_boost'].to_numpy()
+
+
+def forecast_matrix(values, history_factors, future_factors, method='ewma', season=SEASON, window=WINDOW,
+                    alpha=ALPHA):
+    """Forecast every row of ``values`` at once; returns (forecast, spread).
+
+    Values are first divided by their multipliers, forecast as a flat level
+    (moving average, exponential smoothing) or a repeating weekly profile
+    (seasonal naive), then multiplied by the multipliers of the horizon.
+    ``spread`` is the half-width of an 80% interval from the deseasonalized
+    variation over the last ``window`` days.
+    """
+    base = values / history_factors
+    horizon = future_factors.shape[1]
+    if method == 'seasonal_naive':
+        last = base[:, -season:]
+        level = last[:, np.arange(horizon) % season]
+    elif method == 'moving_average':
+        level = np.repeat(base[:, -window:].mean(axis=1, keepdims=True), horizon, axis=1)
+    elif method == 'ewma':
+        # Simple exponential smoothing in closed form: weights alpha*(1-alpha)^age,
+        # the first observation seeding the level with the remaining weight
+        ages = np.arange(base.shape[1] - 1, -1, -1)
+        weights = alpha * (1 - alpha) ** ages
+        weights[0] = (1 - alpha) ** (base.shape[1] - 1)
+        level = np.repeat((base @ weights)[:, None], horizon, axis=1)
+    else:
+        raise ValueError(f"unknown method {method!r}, expected one of {', '.join(METHODS)}")
+    spread = INTERVAL_Z * base[:, -window:].std(axis=1, keepdims=True) * future_factors
+    return level * future_factors, spread
+
+
+def forecast_baseline(df, by=('product_id',), horizon=HORIZON, method='ewma', **params):
+    """Baseline forecasts for every ``by`` group, in the demand_forecasts layout."""
+    with stage('forecast_baseline', TABLE) as metrics:
+        keys, days, values = series_matrix(df, by)
+        future = pd.date_range(days[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+        categories = keys['category'].to_numpy() if 'category' in keys.columns else None
+        history_factors = np.broadcast_to(multipliers(categories, days), values.shape)
+        future_factors = np.broadcast_to(multipliers(categories, future), (len(keys), horizon))
+        forecast, spread = forecast_matrix(values, history_factors, future_factors, method, **params)
+        metrics.add(rows=forecast.size)
+    return to_frame(keys, future, forecast, spread, method)
+
+
+def to_frame(keys, dates, forecast, spread, method):
+    """Long (series, date) frame of a forecast matrix."""
+    n, horizon = forecast.shape
+    frame = pd.DataFrame({'date': np.tile(dates.to_numpy(), n)})
+    for col in ('product_id', 'store_id'):
+        frame[col] = keys[col].to_numpy().repeat(horizon) if col in keys.columns else None
+    frame['forecast'] = np.clip(forecast, 0, None).ravel()
+    frame['forecast_lower'] = np.clip(forecast - spread, 0, None).ravel()
+    frame['forecast_upper'] = (forecast + spread).ravel()
+    frame['model'] = method
+    frame['series_hash'] = None
+    return apply_dtypes(frame[list(TABLE_COLUMNS)], TABLE)
+
+
+def backtest(df, by=('product_id',), holdout=28, methods=METHODS, **params):
+    """Weighted absolute percentage error of each method over the last
+    ``holdout`` days, forecast from the days before them."""
+    keys, days, values = series_matrix(df, by)
+    categories = keys['category'].to_numpy() if 'category' in keys.columns else None
+    factors = np.broadcast_to(multipliers(categories, days), values.shape)
+    train, test = values[:, :-holdout], values[:, -holdout:]
+    errors = {}
+    for method in methods:
+        forecast, _ = forecast_matrix(train, factors[:, :-holdout], factors[:, -holdout:], method, **params)
+        errors[method] = np.abs(forecast - test).sum() / max(test.sum(), 1e-9)
+    return pd.Series(errors, name='wape')
+
+
+if __name__ == "__main__":
+    from config.db_config import get_engine
+    from forecasting.engine import FORECAST_DIR, write_forecasts
+    from pipeline.cube import CUBE_DIR
+    parser = argparse.ArgumentParser(description="Vectorized baseline forecasts for every product at once")
+    parser.add_argument('source', nargs='?', default=CUBE_DIR,
+                        help="cube directory (categories from its source extract), or cleaned "
+                             "demand_forecasting_base csv/parquet/arrow snapshot")
+    parser.add_argument('--method', choices=METHODS, default='ewma')
+    parser.add_argument('--by-store', action='store_true', help="one series per product and store")
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--backtest', type=int, default=0, metavar='DAYS',
+                        help="print the WAPE of every method over the last DAYS days instead")
+    parser.add_argument('--output', default=os.path.join(FORECAST_DIR, 'baseline.parquet'))
+    parser.add_argument('--db-url', default=None, help="also replace the baseline forecasts in this database")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    by = ['product_id', 'store_id'] if args.by_store else ['product_id']
+    sales = load_sales(args.source)
+    if args.backtest:
+        print(backtest(sales, by, args.backtest).round(3).to_string())
+        sys.exit()
+    started = time.perf_counter()
+    forecasts = forecast_baseline(sales, by, args.horizon, args.method)
+    logger.info("%d series forecast with %s in %.3fs", forecasts['product_id'].nunique(), args.method,
+                time.perf_counter() - started)
+    write_forecasts(forecasts, args.output, get_engine(url=args.db_url) if args.db_url else None)
@@ -0,0 +1,279 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import hashlib
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from config.schema import apply_dtypes, build_metadata
+from pipeline.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'demand_forecasts'
+HORIZON = 90
+FORECAST_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'forecasts')
+CACHE_DIR = os.path.join(FORECAST_DIR, 'cache')
+
+# Bump to invalidate every cached model after a change to the fitting code
+MODEL_VERSION = 2
+
+# Daily retail demand: weekly and yearly seasonality plus the country's public
+# holidays and the retail events of the sales holiday_flag
+PROPHET_PARAMS = {
+    'weekly_seasonality': True,
+    'yearly_seasonality': 'auto',
+    'daily_seasonality': False,
+    'seasonality_mode': 'multiplicative',
+    'interval_width': 0.8,
+    'country_holidays': 'US',
+}
+
+TABLE_COLUMNS = ('date', 'product_id', 'store_id', 'forecast', 'forecast_lower', 'forecast_upper', 'model',
+                 'series_hash')
+
+# Series with fewer selling days are forecast as their mean daily demand
+MIN_SELLING_DAYS = 30
+
+
+def load_sales(source):
+    """Daily sales from a cube directory (pipeline/cube.py), a cleaned
+    demand_forecasting_base file or its Arrow snapshot (pipeline/snapshot.py).
+
+    Cube rows get the product's category from the extract the cube was
+    built from, so category seasonality applies to them too.
+    """
+    if os.path.isdir(source):
+        from pipeline.cube import product_categories, read_cube
+        df = read_cube(source, columns=['date', 'product_id', 'store_id', 'sales_quantity'])
+        categories = product_categories(source)
+        if categories is None:
+            logger.warning("No product categories for the cube in %s; category seasonality is not applied", source)
+        else:
+            df['category'] = pd.Categorical(df['product_id'].astype(object).map(categories),
+                                            categories=categories.cat.categories
+                                            if isinstance(categories.dtype, pd.CategoricalDtype) else None)
+        return df
+    if source.endswith('.arrow'):
+        from pipeline.snapshot import load_snapshot
+        return load_snapshot(source)
+    df = pd.read_csv(source) if source.endswith('.csv') else pd.read_parquet(source)
+    return apply_dtypes(df, 'demand_forecasting_base')
+
+
+def daily_series(df, by=('product_id',)):
+    """Yield (key, series) with total daily sales_quantity per ``by`` group.
+
+    Every series runs from its first sale to the last date in ``df``, days
+    without sales as 0, so all forecasts start from the same origin.
+    """
+    by = list(by)
+    end = pd.Timestamp(df['date'].max()).normalize()
+    totals = df.groupby(by + ['date'], observed=True, sort=True)['sales_quantity'].sum()
+    levels = list(range(len(by)))
+    for key, values in totals.groupby(level=levels if len(by) > 1 else 0, sort=True, observed=True):
+        values = values.droplevel(levels)
+        values.index = pd.DatetimeIndex(values.index).normalize()
+        days = pd.date_range(values.index.min(), end, freq='D')
+        yield key if isinstance(key, tuple) else (key,), values.reindex(days, fill_value=0).astype(np.float64)
+
+
+def series_hash(series, horizon, params):
+    """Cache key of one fit: the series values and dates, the horizon, the
+    model parameters and MODEL_VERSION."""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(series, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([horizon, params, MODEL_VERSION], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _mean_forecast(series, horizon):
+    days = pd.date_range(series.index[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    level = float(series.mean())
+    return pd.DataFrame({'date': days, 'forecast': level, 'forecast_lower': level, 'forecast_upper': level})
+
+
+def holiday_frame(start, end, country):
+    """Prophet holidays (holiday, ds) from the date dimension: the public
+    holidays of ``country`` and the retail events of holiday_flag. Retail
+    events are suffixed, as the generator's "Independence Day" is Aug 15."""
+    from pipeline.date_dimension import date_dimension
+    dim = date_dimension(start, end, country=country)
+    frames = []
+    for col, suffix in (('holiday_name', ''), ('holiday_flag', ' (retail)')):
+        names = dim[col].dropna()
+        frames.append(pd.DataFrame({'holiday': names.astype(str).to_numpy() + suffix, 'ds': names.index}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def fit_prophet(series, horizon=HORIZON, params=PROPHET_PARAMS, holidays=None):
+    """Fit Prophet to one daily series; returns (model, forecast frame).
+
+    ``holidays`` is a holiday_frame covering the series and the horizon;
+    without one the country's holidays come from Prophet itself.
+    """
+    from prophet import Prophet
+    params = dict(params)
+    country = params.pop('country_holidays', None)
+    model = Prophet(holidays=holidays if country else None, **params)
+    if country and holidays is None:
+        model.add_country_holidays(country_name=country)
+    model.fit(pd.DataFrame({'ds': series.index, 'y': series.to_numpy()}))
+    future = model.make_future_dataframe(periods=horizon, freq='D', include_history=False)
+    predicted = model.predict(future)
+    # Demand is never negative
+    forecast = pd.DataFrame({
+        'date': predicted['ds'].to_numpy(),
+        'forecast': predicted['yhat'].clip(lower=0).to_numpy(),
+        'forecast_lower': predicted['yhat_lower'].clip(lower=0).to_numpy(),
+        'forecast_upper': predicted['yhat_upper'].clip(lower=0).to_numpy(),
+    })
+    return model, forecast
+
+
+def _cache_path(cache_dir, digest, suffix='parquet'):
+    return os.path.join(cache_dir, f"{digest}.{suffix}")
+
+
+def _write_atomic(path, write):
+    # Identical series share a hash, so two workers may write the same entry
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def read_cached(cache_dir, digest):
+    """(forecast, model name) stored under ``digest``, or None."""
+    path = _cache_path(cache_dir, digest)
+    if not os.path.exists(path):
+        return None
+    forecast = pd.read_parquet(path)
+    return forecast.drop(columns='model'), forecast['model'].iloc[0]
+
+
+def forecast_series(key, series, digest, horizon=HORIZON, params=PROPHET_PARAMS, cache_dir=CACHE_DIR,
+                    holidays=None):
+    """Fit and forecast one series; runs in the worker processes.
+
+    The fitted model is cached as Prophet JSON and the forecast as Parquet
+    under the series hash. Returns (key, forecast, model name, hash).
+    """
+    if (series > 0).sum() < MIN_SELLING_DAYS:
+        name, forecast = 'mean', _mean_forecast(series, horizon)
+    else:
+        from prophet.serialize import model_to_json
+        logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+        logging.getLogger('prophet').setLevel(logging.WARNING)
+        model, forecast = fit_prophet(series, horizon, params, holidays)
+        name = 'prophet'
+        serialized = model_to_json(model)
+
+        def write_model(path):
+            with open(path, 'w') as f:
+                f.write(serialized)
+        _write_atomic(_cache_path(cache_dir, digest, 'json'), write_model)
+    _write_atomic(_cache_path(cache_dir, digest), lambda path: forecast.assign(model=name).to_parquet(path, index=False))
+    return key, forecast, name, digest
+
+
+def forecast_all(df, by=('product_id',), horizon=HORIZON, workers=-1, params=PROPHET_PARAMS,
+                 cache_dir=CACHE_DIR):
+    """Forecast every ``by`` group of ``df`` across ``workers`` processes.
+
+    Series whose hash is in ``cache_dir`` are read back in this process and
+    never dispatched. The others are handed to the pool lazily (at most two
+    per worker in flight) and each worker receives only its own series, so
+    worker memory is one series and one Prophet model regardless of the
+    number of SKUs. Returns (forecasts, stats).
+    """
+    from joblib import Parallel, delayed, parallel_config
+    started = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    by = list(by)
+    frames, hits, models = [], 0, {}
+
+    def collect(key, forecast, name, digest):
+        for col, value in zip(by, key):
+            forecast[col] = value
+        forecast['model'] = name
+        forecast['series_hash'] = digest
+        frames.append(forecast)
+        models[name] = models.get(name, 0) + 1
+        metrics.add(rows=len(forecast))
+
+    with stage('forecast', TABLE) as metrics, parallel_config(backend='loky', inner_max_num_threads=1):
+        pending = []
+        for key, series in daily_series(df, by):
+            digest = series_hash(series, horizon, params)
+            cached = read_cached(cache_dir, digest)
+            if cached is None:
+                pending.append((key, series, digest))
+            else:
+                collect(key, *cached, digest)
+                hits += 1
+        if pending:
+            # One holiday calendar for every fit, from the date dimension
+            country = params.get('country_holidays')
+            first = min(series.index[0] for _, series, _ in pending)
+            end = pending[0][1].index[-1] + pd.Timedelta(days=horizon)
+            holidays = holiday_frame(first, end, country) if country else None
+            tasks = (delayed(forecast_series)(key, series, digest, horizon, params, cache_dir, holidays)
+                     for key, series, digest in pending)
+            for result in Parallel(n_jobs=workers, pre_dispatch='2*n_jobs', return_as='generator')(tasks):
+                collect(*result)
+    if not frames:
+        return pd.DataFrame(columns=list(TABLE_COLUMNS)), {'series': 0, 'cached': 0, 'fitted': 0, 'models': {},
+                                                           'seconds': time.perf_counter() - started}
+    forecasts = pd.concat(frames, ignore_index=True)
+    if 'store_id' not in forecasts.columns:
+        forecasts['store_id'] = None
+    forecasts = apply_dtypes(forecasts[list(TABLE_COLUMNS)], TABLE)
+    stats = {'series': len(frames), 'cached': hits, 'fitted': len(frames) - hits, 'models': models,
+             'seconds': time.perf_counter() - started}
+    logger.info("Forecast %d series (%d from cache) in %.1fs", stats['series'], hits, stats['seconds'])
+    return forecasts, stats
+
+
+def write_forecasts(forecasts, output=None, engine=None):
+    """Write forecasts to a file and/or replace the forecasts of the same
+    products and models in the demand_forecasts table with one bulk load, in
+    one transaction."""
+    from pipeline.writers import ChunkWriter
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with ChunkWriter(output) as writer:
+            writer.write(forecasts)
+    if engine is not None:
+        from data_generate.loader import load_table
+        table = build_metadata().tables[TABLE]
+        table.create(engine, checkfirst=True)
+        products = forecasts['product_id'].astype(object).unique().tolist()
+        models = forecasts['model'].astype(object).unique().tolist()
+        with engine.begin() as conn:
+            for start in range(0, len(products), 500):
+                conn.execute(table.delete().where(table.c.product_id.in_(products[start:start + 500]),
+                                                  table.c.model.in_(models)))
+            return load_table(conn, TABLE, [forecasts])
+
+
+if __name__ == "__main__":
+    from config.db_config import get_engine
+    from pipeline.cube import CUBE_DIR
+    parser = argparse.ArgumentParser(description="Forecast daily demand per product (and store) in parallel")
+    parser.add_argument('source', nargs='?', default=CUBE_DIR,
+                        help="cube directory, or cleaned demand_forecasting_base csv/parquet/arrow snapshot")
+    parser.add_argument('--by-store', action='store_true', help="one series per product and store")
+    parser.add_argument('--horizon', type=int, default=HORIZON, help="days to forecast")
+    parser.add_argument('--workers', type=int, default=-1, help="processes (-1 = one per core)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--output', default=os.path.join(FORECAST_DIR, 'forecasts.parquet'))
+    parser.add_argument('--db-url', default=None, help="also replace the forecasts in this database")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    by = ['product_id', 'store_id'] if args.by_store else ['product_id']
+    forecasts, stats = forecast_all(load_sales(args.source), by, args.horizon, args.workers, cache_dir=args.cache_dir)
+    write_forecasts(forecasts, args.output, get_engine(url=args.db_url) if args.db_url else None)
+    print(stats)
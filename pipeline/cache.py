@@ -0,0 +1,277 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from contextlib import closing
+import pandas as pd
+import sqlalchemy
+from config.schema import TABLES, VIEWS, apply_dtypes
+from pipeline.metrics import CACHE_BYTES, CACHE_EVICTIONS, CACHE_REQUESTS
+from pipeline.writers import ChunkWriter
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'queries')
+# Size cap of the cached results; PIPELINE_CACHE_MAX_MB overrides it
+MAX_BYTES = int(float(os.environ.get('PIPELINE_CACHE_MAX_MB', 2048)) * 1e6)
+INDEX_FILE = '_index.sqlite'
+CHUNK_SIZE = 50_000
+
+_TABLE_NAME = re.compile(r'\b(?:from|join)\s+([\w.`"]+)', re.IGNORECASE)
+
+
+def normalize_query(query):
+    """The query with whitespace collapsed and no trailing semicolon."""
+    return re.sub(r'\s+', ' ', str(query)).strip().rstrip(';').strip()
+
+
+def query_tables(query):
+    """Relations a query reads, each followed by its base tables when it is
+    one of config.schema.VIEWS, with the schema prefix kept. The relation
+    itself stays in the list because a view may be materialised as a table."""
+    tables = []
+    for name in _TABLE_NAME.findall(normalize_query(query)):
+        name = name.replace('`', '').replace('"', '')
+        schema, _, table = name.rpartition('.')
+        for base in [table, *VIEWS.get(table, [])]:
+            qualified = f"{schema}.{base}" if schema else base
+            if qualified not in tables:
+                tables.append(qualified)
+    return tables
+
+
+def _primary_key(table):
+    keys = [col.name for col in TABLES.get(table, []) if col.kwargs.get('primary_key')]
+    return keys[0] if len(keys) == 1 else None
+
+
+def source_fingerprint(conn, tables):
+    """[table, row count, max primary key, update time] per table.
+
+    On MySQL a table with the config.schema primary key column is
+    fingerprinted by MAX over the key, which InnoDB answers from the index,
+    and the UPDATE_TIME that information_schema reports, which catches
+    updates and deletes that leave the maximum as is. COUNT(*) scans the
+    table on InnoDB, so it is only used for tables without that key column
+    (e.g. created by to_sql) and on databases that report no update time.
+    Views are recorded as such: their base tables carry the changes.
+    """
+    inspector = sqlalchemy.inspect(conn)
+    mysql = conn.dialect.name == 'mysql'
+    views = {}
+    fingerprint = []
+    for table in tables:
+        schema, _, name = table.rpartition('.')
+        if schema not in views:
+            views[schema] = set(inspector.get_view_names(schema=schema or None))
+        if name in views[schema]:
+            fingerprint.append([table, 'view', None, None])
+            continue
+        key = _primary_key(name)
+        if key and key not in {col['name'] for col in inspector.get_columns(name, schema=schema or None)}:
+            key = None
+        count = not (key and mysql)
+        columns = (['COUNT(*)'] if count else []) + ([f'MAX({key})'] if key else [])
+        row = conn.execute(sqlalchemy.text(f"SELECT {', '.join(columns)} FROM {table}")).one()
+        values = [row[0] if count else None, row[-1] if key else None]
+        updated = None
+        if mysql:
+            updated = conn.execute(sqlalchemy.text(
+                "SELECT UPDATE_TIME FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_NAME = :name"),
+                {'schema': schema or None, 'name': name}).scalar()
+        fingerprint.append([table, *(str(value) if value is not None else None for value in [*values, updated])])
+    return fingerprint
+
+
+def query_chunks(conn, query, chunksize=CHUNK_SIZE, params=None):
+    """Stream a query result in DataFrame chunks over a server-side cursor."""
+    conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+    yield from pd.read_sql(sqlalchemy.text(query), conn, params=params, chunksize=chunksize)
+
+
+class QueryCache:
+    """Local cache of query results as Parquet files.
+
+    An entry is keyed by the normalized query and its parameters, and is
+    only served while the source fingerprint of the tables it reads is
+    unchanged; a changed fingerprint replaces the entry on the next read.
+    Entries past ``max_bytes`` are evicted least recently used first. The
+    index is a SQLite file next to the results, so concurrent processes
+    share entries and hit/miss counts.
+    """
+
+    name = 'query'
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._index() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (query_key TEXT PRIMARY KEY, query TEXT, "
+                       "fingerprint TEXT, file TEXT, bytes INTEGER, rows INTEGER, created REAL, "
+                       "last_access REAL, hits INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _index(self):
+        db = sqlite3.connect(os.path.join(self.cache_dir, INDEX_FILE), timeout=60, isolation_level=None)
+        return closing(db)
+
+    def _count(self, db, name, n=1):
+        db.execute("INSERT INTO stats VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                   (name, n, n))
+
+    @staticmethod
+    def query_key(query, params=None):
+        blob = json.dumps([normalize_query(query), params or {}], sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def lookup(self, query_key, fingerprint):
+        """Path of the cached result for ``query_key`` at ``fingerprint``, or None."""
+        with self._index() as db:
+            row = db.execute("SELECT file FROM entries WHERE query_key = ? AND fingerprint = ?",
+                             (query_key, fingerprint)).fetchone()
+            path = os.path.join(self.cache_dir, row[0]) if row else None
+            if path and os.path.exists(path):
+                db.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE query_key = ?",
+                           (time.time(), query_key))
+                self._count(db, 'hits')
+                CACHE_REQUESTS.labels(self.name, 'hit').inc()
+                return path
+            self._count(db, 'misses')
+        CACHE_REQUESTS.labels(self.name, 'miss').inc()
+        return None
+
+    def store(self, query_key, query, fingerprint, tmp_path, rows):
+        """Add a written result file as the entry of ``query_key``, then evict."""
+        file = f"{hashlib.sha1((query_key + fingerprint).encode()).hexdigest()}.parquet"
+        os.replace(tmp_path, os.path.join(self.cache_dir, file))
+        now = time.time()
+        with self._index() as db:
+            old = db.execute("SELECT file FROM entries WHERE query_key = ?", (query_key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                       (query_key, normalize_query(query), fingerprint, file,
+                        os.path.getsize(os.path.join(self.cache_dir, file)), rows, now, now))
+        if old and old[0] != file:
+            self._remove_file(old[0])
+        self.evict()
+
+    def _remove_file(self, file):
+        path = os.path.join(self.cache_dir, file)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the cache fits in
+        ``max_bytes``; returns the number dropped."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        evicted = []
+        with self._index() as db:
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+            for query_key, file, size in db.execute(
+                    "SELECT query_key, file, bytes FROM entries ORDER BY last_access").fetchall():
+                if total <= max_bytes:
+                    break
+                db.execute("DELETE FROM entries WHERE query_key = ?", (query_key,))
+                evicted.append(file)
+                total -= size
+            if evicted:
+                self._count(db, 'evictions', len(evicted))
+        for file in evicted:
+            self._remove_file(file)
+        CACHE_EVICTIONS.labels(self.name).inc(len(evicted))
+        CACHE_BYTES.labels(self.name).set(total)
+        if evicted:
+            logger.info("Evicted %d cached results, %.1f MB left", len(evicted), total / 1e6)
+        return len(evicted)
+
+    def stats(self):
+        """Hits, misses, evictions and hit rate since the cache was created,
+        plus the current entries and their size."""
+        with self._index() as db:
+            stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+            stats.update(dict(db.execute("SELECT name, value FROM stats").fetchall()))
+            stats['entries'], stats['bytes'] = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Remove every entry and reset the statistics."""
+        with self._index() as db:
+            files = [row[0] for row in db.execute("SELECT file FROM entries").fetchall()]
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM stats")
+        for file in files:
+            self._remove_file(file)
+        CACHE_BYTES.labels(self.name).set(0)
+
+    def read_chunks(self, engine, query, chunksize=CHUNK_SIZE, params=None, tables=None, dtypes_table=''):
+        """Yield the result of ``query`` in chunks, from the cache when the
+        source is unchanged.
+
+        A miss streams from the database and writes the result to the cache
+        as it goes; the entry is only added once every chunk was read.
+        ``tables`` defaults to the tables named in the query, and chunks get
+        the config.schema dtypes of ``dtypes_table``.
+        """
+        query_key = self.query_key(query, params)
+        with engine.connect() as conn:
+            fingerprint = json.dumps(source_fingerprint(conn, tables or query_tables(query)))
+            path = self.lookup(query_key, fingerprint)
+            if path is not None:
+                import pyarrow.parquet as pq
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                    yield apply_dtypes(batch.to_pandas(), dtypes_table)
+                return
+            tmp = os.path.join(self.cache_dir, f"{query_key}.{os.getpid()}.tmp")
+            try:
+                with ChunkWriter(tmp, 'parquet') as writer:
+                    for chunk in query_chunks(conn, query, chunksize, params):
+                        chunk = apply_dtypes(chunk, dtypes_table)
+                        writer.write(chunk)
+                        yield chunk
+                if writer.rows == 0:
+                    pd.DataFrame(columns=[]).to_parquet(tmp)
+                self.store(query_key, query, fingerprint, tmp, writer.rows)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def read_sql(self, engine, query, params=None, tables=None, dtypes_table=''):
+        """``pd.read_sql`` of ``query``, served from the cache when the
+        source is unchanged."""
+        query_key = self.query_key(query, params)
+        with engine.connect() as conn:
+            fingerprint = json.dumps(source_fingerprint(conn, tables or query_tables(query)))
+            path = self.lookup(query_key, fingerprint)
+            if path is not None:
+                return apply_dtypes(pd.read_parquet(path), dtypes_table)
+            df = apply_dtypes(pd.read_sql(sqlalchemy.text(query), conn, params=params), dtypes_table)
+        tmp = os.path.join(self.cache_dir, f"{query_key}.{os.getpid()}.tmp")
+        with ChunkWriter(tmp, 'parquet') as writer:
+            writer.write(df)
+        self.store(query_key, query, fingerprint, tmp, len(df))
+        return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or trim the local query result cache")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--max-mb', type=float, default=None, help="evict down to this size")
+    parser.add_argument('--clear', action='store_true', help="remove every entry")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cache = QueryCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    elif args.max_mb is not None:
+        cache.evict(int(args.max_mb * 1e6))
+    print(cache.stats())
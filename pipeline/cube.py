@@ -0,0 +1,193 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import glob
+import json
+import logging
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from config.schema import apply_dtypes, build_metadata, concat_frames
+from pipeline.incremental import STATE_FILE, load_state
+from pipeline.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'demand_cube'
+KEYS = ['date', 'product_id', 'store_id']
+SOURCE_COLUMNS = KEYS + ['sales_quantity', 'sales_revenue', 'promo_flag', 'holiday_flag']
+CUBE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'cube', TABLE)
+
+
+def aggregate(df):
+    """Daily totals per product and store from row-level sales.
+
+    promo_flag is set when any sale of the day was on promotion;
+    holiday_flag is a property of the date and carried over as is.
+    """
+    promo = df['promo_flag'].fillna(False).astype(bool).to_numpy()
+    quantity = df['sales_quantity'].fillna(0).to_numpy(dtype=np.int64)
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    measures = pd.DataFrame({
+        'date': dates,
+        'product_id': df['product_id'],
+        'store_id': df['store_id'],
+        'sales_quantity': quantity,
+        'sales_revenue': df['sales_revenue'].fillna(0).to_numpy(dtype=np.float64),
+        'transactions': np.ones(len(df), dtype=np.int64),
+        'promo_transactions': promo.astype(np.int64),
+        'promo_quantity': np.where(promo, quantity, 0),
+    })
+    cube = measures.groupby(KEYS, observed=True, sort=True).sum().reset_index()
+    cube['promo_flag'] = cube['promo_transactions'] > 0
+    holidays = df['holiday_flag'].groupby(dates.to_numpy()).first()
+    cube['holiday_flag'] = cube['date'].map(holidays)
+    return apply_dtypes(cube, TABLE)
+
+
+def _signature(path):
+    info = os.stat(path)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def _month_path(cube_dir, month):
+    return os.path.join(cube_dir, f"{month}.parquet")
+
+
+def _load_cube_state(cube_dir):
+    path = os.path.join(cube_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'months': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_cube_state(cube_dir, state):
+    path = os.path.join(cube_dir, STATE_FILE)
+    state = dict(state, updated_at=datetime.now().isoformat(timespec='seconds'))
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def update_cube(extract_dir, cube_dir=CUBE_DIR, engine=None, force=False):
+    """Bring the cube in ``cube_dir`` up to date with an incremental extract.
+
+    The extract stores one Parquet file per month (pipeline/incremental.py);
+    only months whose file changed since the last update are re-aggregated,
+    and months gone from the extract are dropped. With ``engine`` the same
+    months are replaced in the demand_cube summary table. Returns a run
+    summary.
+    """
+    started = time.perf_counter()
+    os.makedirs(cube_dir, exist_ok=True)
+    state = {} if force else _load_cube_state(cube_dir)
+    known = state.get('months', {})
+    sources = {os.path.basename(path)[:-len('.parquet')]: path
+               for path in sorted(glob.glob(os.path.join(extract_dir, '*.parquet')))}
+    signatures = {month: _signature(path) for month, path in sources.items()}
+    changed = [month for month in sources if known.get(month) != signatures[month]]
+    removed = [month for month in known if month not in sources]
+    if force:
+        removed = [os.path.basename(path)[:-len('.parquet')]
+                   for path in glob.glob(os.path.join(cube_dir, '*.parquet'))
+                   if os.path.basename(path)[:-len('.parquet')] not in sources]
+    source_table = (load_state(extract_dir) or {}).get('table', '')
+
+    rows = {}
+    with stage('build_cube', TABLE) as metrics:
+        for month in changed:
+            sales = apply_dtypes(pd.read_parquet(sources[month], columns=SOURCE_COLUMNS), source_table)
+            cube = aggregate(sales)
+            cube.to_parquet(_month_path(cube_dir, month) + '.tmp', index=False, compression='zstd')
+            os.replace(_month_path(cube_dir, month) + '.tmp', _month_path(cube_dir, month))
+            rows[month] = len(cube)
+            metrics.add(rows=len(sales))
+            logger.info("cube %s: %d sales rows -> %d cube rows", month, len(sales), len(cube))
+        for month in removed:
+            if os.path.exists(_month_path(cube_dir, month)):
+                os.remove(_month_path(cube_dir, month))
+        if engine is not None:
+            # A new summary table is filled from every month already in the cube
+            months = changed + removed if sqlalchemy.inspect(engine).has_table(TABLE) else sorted(sources)
+            if months:
+                replace_months(engine, cube_dir, months)
+
+    state = {'source': os.path.abspath(extract_dir), 'months': signatures,
+             'rows': {**{m: n for m, n in state.get('rows', {}).items() if m in sources}, **rows}}
+    _save_cube_state(cube_dir, state)
+    logger.info("Cube %s: %d of %d months rebuilt, %d removed in %.1fs", cube_dir, len(changed),
+                len(sources), len(removed), time.perf_counter() - started)
+    return {'months': len(sources), 'rebuilt': changed, 'removed': removed,
+            'rows': sum(state['rows'].values())}
+
+
+def _month_bounds(month):
+    start = pd.Timestamp(f"{month}-01")
+    return start.date(), (start + pd.offsets.MonthBegin(1)).date()
+
+
+def replace_months(engine, cube_dir, months):
+    """Replace ``months`` of the demand_cube table with the cube files, in
+    one transaction: readers see either the old or the new months."""
+    from data_generate.loader import load_table
+    build_metadata().tables[TABLE].create(engine, checkfirst=True)
+    files = [_month_path(cube_dir, m) for m in sorted(months) if os.path.exists(_month_path(cube_dir, m))]
+    with engine.begin() as conn:
+        for month in months:
+            start, end = _month_bounds(month)
+            conn.execute(sqlalchemy.text(f"DELETE FROM {TABLE} WHERE date >= :start AND date < :end"),
+                         {'start': start, 'end': end})
+        return load_table(conn, TABLE, (pd.read_parquet(f) for f in files))
+
+
+def product_categories(cube_dir=CUBE_DIR):
+    """category per product_id, from the extract the cube was built from;
+    None when the cube has no recorded source or it has no category."""
+    from pipeline.incremental import read_extract
+    source = _load_cube_state(cube_dir).get('source')
+    if not source or not os.path.isdir(source):
+        return None
+    products = read_extract(source, columns=['product_id', 'category'])
+    if 'category' not in products.columns or products.empty:
+        return None
+    products = products.dropna(subset=['category']).drop_duplicates('product_id')
+    return products.set_index(products['product_id'].astype(object))['category']
+
+
+def read_cube(cube_dir=CUBE_DIR, start=None, end=None, columns=None):
+    """Read the cube, optionally only dates in [start, end], with the
+    demand_cube dtypes. Only the monthly files overlapping the range are opened."""
+    files = sorted(glob.glob(os.path.join(cube_dir, '*.parquet')))
+    first = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+    last = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+    files = [f for f in files
+             if (first is None or os.path.basename(f)[:7] >= first) and (last is None or os.path.basename(f)[:7] <= last)]
+    if not files:
+        return pd.DataFrame(columns=columns)
+    read = columns if columns is None or 'date' in columns else ['date'] + list(columns)
+    cube = concat_frames(apply_dtypes(pd.read_parquet(f, columns=read), TABLE) for f in files)
+    mask = np.ones(len(cube), dtype=bool)
+    if start is not None:
+        mask &= (cube['date'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (cube['date'] <= pd.Timestamp(end)).to_numpy()
+    cube = cube[mask].reset_index(drop=True) if not mask.all() else cube
+    return cube[columns] if columns is not None else cube
+
+
+if __name__ == "__main__":
+    from config.db_config import get_engine
+    from pipeline.ingest import EXTRACT_DIR
+    parser = argparse.ArgumentParser(description="Maintain the daily demand cube from the incremental extract")
+    parser.add_argument('--extract', default=EXTRACT_DIR, help="incremental extract directory")
+    parser.add_argument('--output', default=CUBE_DIR, help="cube directory (one Parquet file per month)")
+    parser.add_argument('--db-url', default=None, help="also maintain the demand_cube table in this database")
+    parser.add_argument('--full', action='store_true', help="rebuild every month")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = get_engine(url=args.db_url) if args.db_url else None
+    print(update_cube(args.extract, args.output, engine, args.full))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_generate.catalog import CATEGORIES, HOLIDAY_BOOST
+
+# Directory the built dimensions are also cached in as Parquet; off unless
+# PIPELINE_DATE_DIM_DIR is set, since the build takes well under a second
+DATE_DIM_DIR = os.environ.get('PIPELINE_DATE_DIM_DIR') or None
+COUNTRY = 'US'
+# Retail fiscal years start in February; a fiscal year is named after the
+# calendar year it starts in
+FISCAL_YEAR_START = 2
+# Bump when the columns or their rules change, so cached files are rebuilt
+DIMENSION_VERSION = 1
+
+_memory = {}
+_lock = threading.Lock()
+
+
+def retail_holiday_labels(dates):
+    """The generator's holiday_flag per date (None on regular days).
+
+    These are the retail events the sales data is labelled with, not the
+    public holidays: Black Friday week is Nov 20-30 and "Independence Day"
+    is Aug 15, as the original generator had them.
+    """
+    month = dates.month.to_numpy()
+    day = dates.day.to_numpy()
+    labels = np.full(len(dates), None, dtype=object)
+    labels[(month == 8) & (day == 15)] = "Independence Day"
+    labels[(month == 11) & (day >= 20) & (day <= 30)] = "Black Friday"
+    labels[(month == 12) & (day == 25)] = "Christmas"
+    return labels
+
+
+def season_column(category):
+    return f"season_{category}"
+
+
+def build_date_dimension(start, end, country=COUNTRY, categories=CATEGORIES, fiscal_year_start=FISCAL_YEAR_START):
+    """One row per day from ``start`` to ``end``, indexed by date.
+
+    Calendar parts, ISO week, fiscal year/quarter/period, the public holiday
+    name from the ``holidays`` package, the retail holiday_flag and its
+    demand boost, and one seasonality multiplier column per category
+    (season_<category>). Every column is computed once for the whole range.
+    """
+    import holidays
+    dates = pd.date_range(start, end, freq='D', name='date')
+    month = dates.month.to_numpy()
+    fiscal_period = (month - fiscal_year_start) % 12 + 1
+    public = holidays.country_holidays(country, years=range(dates[0].year, dates[-1].year + 1))
+    public_names = pd.Series(dict(public.items()), dtype=object)
+    public_names.index = pd.to_datetime(public_names.index)
+    holiday_name = public_names.reindex(dates).to_numpy(dtype=object)
+    retail = retail_holiday_labels(dates)
+
+    dim = pd.DataFrame({
+        'year': dates.year.astype(np.int16),
+        'quarter': dates.quarter.astype(np.int8),
+        'month': month.astype(np.int8),
+        'day': dates.day.astype(np.int8),
+        'day_of_week': dates.dayofweek.astype(np.int8),
+        'week_of_year': dates.isocalendar().week.to_numpy().astype(np.int8),
+        'is_weekend': dates.dayofweek >= 5,
+        'fiscal_year': (dates.year - (month < fiscal_year_start)).astype(np.int16),
+        'fiscal_quarter': ((fiscal_period - 1) // 3 + 1).astype(np.int8),
+        'fiscal_period': fiscal_period.astype(np.int8),
+        'holiday_name': pd.Categorical(holiday_name),
+        'is_public_holiday': pd.notna(holiday_name),
+        'holiday_flag': pd.Categorical(retail),
+        'holiday_boost': np.where(pd.notna(retail), HOLIDAY_BOOST, 1.0),
+    }, index=dates)
+    # Multipliers stay float64: generated quantities are truncated after
+    # multiplying, and 2.8 as float32 would turn 10 * 2.8 into 27
+    for category, info in categories.items():
+        in_season = np.isin(month, info['seasonality'] or [])
+        dim[season_column(category)] = np.where(in_season, info['multiplier'], 1.0)
+    return dim
+
+
+def _cache_key(start, end, country, categories, fiscal_year_start):
+    import holidays
+    # The holidays version is part of the key: an upgrade can change the calendars
+    rules = json.dumps([DIMENSION_VERSION, holidays.__version__, country, fiscal_year_start,
+                        {name: [info['seasonality'], info['multiplier']] for name, info in categories.items()}],
+                       sort_keys=True)
+    return (f"{pd.Timestamp(start):%Y%m%d}_{pd.Timestamp(end):%Y%m%d}_{country}_"
+            f"{hashlib.sha1(rules.encode()).hexdigest()[:10]}")
+
+
+def date_dimension(start, end, cache_dir=DATE_DIM_DIR, country=COUNTRY, categories=CATEGORIES,
+                   fiscal_year_start=FISCAL_YEAR_START):
+    """The date dimension for [start, end], built once and cached.
+
+    Cached per process and, when ``cache_dir`` is set (DATE_DIM_DIR by
+    default), as Parquet there. The key covers the date range, country,
+    fiscal year start, category seasonality rules and the version of the
+    holidays package.
+    """
+    key = _cache_key(start, end, country, categories, fiscal_year_start)
+    with _lock:
+        if key in _memory:
+            return _memory[key]
+    path = os.path.join(cache_dir, f"date_dim_{key}.parquet") if cache_dir else None
+    if path and os.path.exists(path):
+        dim = pd.read_parquet(path)
+    else:
+        dim = build_date_dimension(start, end, country, categories, fiscal_year_start)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            dim.to_parquet(tmp)
+            os.replace(tmp, path)
+    with _lock:
+        _memory[key] = dim
+    return dim
+
+
+def seasonality(dim, categories):
+    """(len(categories) x days) seasonality multipliers; unknown categories get 1."""
+    columns = [season_column(c) for c in categories]
+    values = dim.reindex(columns=columns, fill_value=1.0).to_numpy(dtype=np.float64)
+    return values.T
+
+
+def add_calendar(df, columns, dim=None, date_column='date'):
+    """Join the date dimension ``columns`` onto ``df`` on ``date_column``, in
+    place, and return it.
+
+    Without ``dim`` the dimension covers the whole calendar years of the
+    dates, so the chunks of a streamed table share one cached dimension.
+    """
+    dates = pd.to_datetime(df[date_column]).dt.normalize()
+    if dim is None:
+        if dates.isna().all():
+            dim = pd.DataFrame(columns=list(columns))
+        else:
+            dim = date_dimension(f"{dates.min().year}-01-01", f"{dates.max().year}-12-31")
+    joined = dim[list(columns)].reindex(dates.to_numpy())
+    for col in columns:
+        df[col] = joined[col].to_numpy()
+    return df
@@ -0,0 +1,265 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config.schema import apply_dtypes, concat_frames
+from pipeline.cube import CUBE_DIR, TABLE as CUBE_TABLE, read_cube
+from pipeline.date_dimension import add_calendar
+from pipeline.incremental import STATE_FILE
+from pipeline.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+FEATURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'features')
+# Bump when a feature definition changes, so every month is rebuilt
+FEATURES_VERSION = 1
+
+TREND_COLUMNS = ['temperature', 'weather_condition', 'social_media_mentions', 'competitor_analysis_score',
+                 'cpi_change']
+# A product's last market trend is carried forward at most this long
+TREND_TOLERANCE_DAYS = 28
+LAGS = (7, 28, 365)
+WINDOWS = (7, 28, 365)
+PROMO_WINDOW = 7
+CALENDAR_COLUMNS = ('day_of_week', 'week_of_year', 'is_public_holiday')
+# Months computed together from one read of the cube
+BATCH_MONTHS = 12
+
+
+def join_trends(df, trends, tolerance_days=TREND_TOLERANCE_DAYS):
+    """Add the latest market trend of the product on or before each date.
+
+    A sorted as-of join by product_id; trend_age_days is how old the trend
+    is, and rows without a trend in the last ``tolerance_days`` get missing
+    values. ``df`` keeps its row order.
+    """
+    products = df['product_id'].astype('category').cat.categories
+    order = np.argsort(df['date'].to_numpy(), kind='stable')
+    left = pd.DataFrame({'date': df['date'].to_numpy()[order],
+                         'key': pd.Categorical(df['product_id'], categories=products).codes[order]})
+    right = trends[['date'] + TREND_COLUMNS].assign(
+        key=pd.Categorical(trends['product_id'], categories=products).codes, trend_date=trends['date'])
+    right = right[right['key'] >= 0].sort_values('date', kind='stable')
+    merged = pd.merge_asof(left, right, on='date', by='key', direction='backward',
+                           tolerance=pd.Timedelta(days=tolerance_days))
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    merged = merged.take(inverse)
+    for col in TREND_COLUMNS:
+        df[col] = merged[col].array
+    df['trend_age_days'] = ((merged['date'] - merged['trend_date']) / pd.Timedelta(days=1)).to_numpy()
+    return df
+
+
+def lag_features(df, lags=LAGS, windows=WINDOWS, promo_window=PROMO_WINDOW, history_start=None):
+    """Add demand lags, trailing windows and promotion carry-over per
+    product and store.
+
+    For each row, on date d: demand_lag_<n> is the quantity on d - n,
+    demand_<n>d the total over the n days before d, promo_days_<n>d the
+    number of those days on promotion and days_since_promo the days since
+    the last promotion day, if within the longest window. Days without a
+    row count as no sales. Values whose window starts before
+    ``history_start`` are missing.
+
+    Rows are keyed as series * span + day, so each window is two
+    searchsorted calls against cumulative sums over the whole frame.
+    """
+    codes = df.groupby(['product_id', 'store_id'], observed=True, sort=True).ngroup().to_numpy(dtype=np.int64)
+    day = ((df['date'] - pd.Timestamp(0)) // pd.Timedelta(days=1)).to_numpy()
+    first = day.min() if len(day) else 0
+    if history_start is not None:
+        first = min(first, (pd.Timestamp(history_start) - pd.Timestamp(0)) // pd.Timedelta(days=1))
+    # The span leaves a gap after every series, so no offset reaches the next one
+    span = day.max() - first + 1 + max(lags + windows + (promo_window,)) if len(day) else 1
+    keys = codes * span + (day - first)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    quantity = df['sales_quantity'].to_numpy(dtype=np.float64)[order]
+    promo = df['promo_flag'].to_numpy(dtype=bool)[order]
+    sold = np.concatenate([[0], np.cumsum(quantity)])
+    promoted = np.concatenate([[0], np.cumsum(promo)])
+    position = np.arange(len(keys))
+    age = day[order] - first
+
+    features = {}
+    for n in lags:
+        found = np.searchsorted(keys, keys - n)
+        match = keys[np.minimum(found, len(keys) - 1)] == keys - n
+        features[f'demand_lag_{n}'] = np.where(age >= n, np.where(match, quantity[np.minimum(found, len(keys) - 1)], 0),
+                                               np.nan)
+    for n in windows:
+        start = np.searchsorted(keys, keys - n)
+        features[f'demand_{n}d'] = np.where(age >= n, sold[position] - sold[start], np.nan)
+    start = np.searchsorted(keys, keys - promo_window)
+    features[f'promo_days_{promo_window}d'] = np.where(age >= promo_window, promoted[position] - promoted[start],
+                                                       np.nan)
+    last_promo = np.maximum.accumulate(np.where(promo, keys, -1))
+    previous = np.concatenate([[-1], last_promo[:-1]])
+    since = keys - previous
+    features['days_since_promo'] = np.where((previous >= keys - age) & (since <= max(windows)), since, np.nan)
+
+    for name, values in features.items():
+        column = np.empty(len(values))
+        column[order] = values
+        df[name] = column
+    return df
+
+
+def build_features(df, trends, calendar=CALENDAR_COLUMNS, history_start=None, **params):
+    """Feature frame for daily demand rows (the demand_cube layout)."""
+    df = df.sort_values(['product_id', 'store_id', 'date'], kind='stable').reset_index(drop=True)
+    lag_features(df, history_start=history_start, **params)
+    join_trends(df, trends)
+    if calendar:
+        add_calendar(df, calendar)
+    return df
+
+
+def _months_back(month, days):
+    start = pd.Timestamp(f"{month}-01")
+    return (start - pd.Timedelta(days=days)).strftime('%Y-%m')
+
+
+def _trend_digest(trends, month, tolerance_days):
+    start = pd.Timestamp(f"{month}-01")
+    window = trends[(trends['date'] >= start - pd.Timedelta(days=tolerance_days))
+                    & (trends['date'] < start + pd.offsets.MonthBegin(1))]
+    return hashlib.sha1(pd.util.hash_pandas_object(window[['date', 'product_id'] + TREND_COLUMNS], index=False)
+                        .to_numpy().tobytes()).hexdigest()
+
+
+def month_keys(cube_dir, trends, calendar=CALENDAR_COLUMNS, lags=LAGS, windows=WINDOWS,
+               promo_window=PROMO_WINDOW, tolerance_days=TREND_TOLERANCE_DAYS):
+    """{month: cache key} for every cube month. A month's key covers the
+    cube files its lookback reads, the market trends it can join to and the
+    feature parameters, so only months whose inputs changed are rebuilt."""
+    files = {os.path.basename(f)[:7]: f for f in sorted(glob.glob(os.path.join(cube_dir, '*.parquet')))}
+    lookback = max(lags + windows + (promo_window,))
+    params = [FEATURES_VERSION, list(calendar), list(lags), list(windows), promo_window, tolerance_days]
+    keys = {}
+    signatures = {m: [os.stat(f).st_size, os.stat(f).st_mtime_ns] for m, f in files.items()}
+    for month in files:
+        first = _months_back(month, lookback)
+        inputs = {m: signature for m, signature in signatures.items() if first <= m <= month}
+        blob = json.dumps([params, inputs, _trend_digest(trends, month, tolerance_days)], sort_keys=True)
+        keys[month] = hashlib.sha1(blob.encode()).hexdigest()
+    return keys
+
+
+def _batches(months):
+    """Runs of consecutive months, at most BATCH_MONTHS long."""
+    batch = []
+    for month in months:
+        if batch and (len(batch) == BATCH_MONTHS or
+                      pd.Period(month, 'M') != pd.Period(batch[-1], 'M') + 1):
+            yield batch
+            batch = []
+        batch.append(month)
+    if batch:
+        yield batch
+
+
+def _month_path(features_dir, month):
+    return os.path.join(features_dir, f"{month}.parquet")
+
+
+def update_features(trends, cube_dir=CUBE_DIR, features_dir=FEATURES_DIR, calendar=CALENDAR_COLUMNS,
+                    force=False):
+    """Bring the monthly feature files in ``features_dir`` up to date with
+    the cube and ``trends`` (the market_trends table).
+
+    Only months whose cache key changed are recomputed; consecutive months
+    share one read of the cube covering their lookback. Returns a run
+    summary.
+    """
+    started = time.perf_counter()
+    os.makedirs(features_dir, exist_ok=True)
+    trends = apply_dtypes(trends.copy(deep=False), 'market_trends')
+    state_path = os.path.join(features_dir, STATE_FILE)
+    state = {'months': {}}
+    if not force and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    keys = month_keys(cube_dir, trends, calendar)
+    changed = [m for m in keys if state['months'].get(m) != keys[m] or not os.path.exists(_month_path(features_dir, m))]
+    removed = [m for m in state['months'] if m not in keys]
+    lookback = max(LAGS + WINDOWS + (PROMO_WINDOW,))
+    history_start = None
+    if keys:
+        first_month = pd.Timestamp(f"{min(keys)}-01")
+        history_start = read_cube(cube_dir, first_month, first_month + pd.offsets.MonthEnd(0), ['date'])['date'].min()
+
+    with stage('build_features', 'features') as metrics:
+        for batch in _batches(changed):
+            start = pd.Timestamp(f"{batch[0]}-01")
+            cube = read_cube(cube_dir, start - pd.Timedelta(days=lookback), start + pd.offsets.MonthEnd(len(batch)))
+            features = build_features(cube, trends, calendar, history_start=history_start)
+            month = features['date'].dt.strftime('%Y-%m').to_numpy()
+            for m in batch:
+                part = features[month == m]
+                part.to_parquet(_month_path(features_dir, m) + '.tmp', index=False, compression='zstd')
+                os.replace(_month_path(features_dir, m) + '.tmp', _month_path(features_dir, m))
+                metrics.add(rows=len(part))
+            logger.info("features %s..%s: %d cube rows read", batch[0], batch[-1], len(cube))
+        for m in removed:
+            if os.path.exists(_month_path(features_dir, m)):
+                os.remove(_month_path(features_dir, m))
+
+    state = {'cube': os.path.abspath(cube_dir), 'months': keys,
+             'updated_at': datetime.now().isoformat(timespec='seconds')}
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + '.tmp', state_path)
+    logger.info("Features %s: %d of %d months rebuilt, %d removed in %.1fs", features_dir, len(changed),
+                len(keys), len(removed), time.perf_counter() - started)
+    return {'months': len(keys), 'rebuilt': changed, 'removed': removed}
+
+
+def read_features(features_dir=FEATURES_DIR, start=None, end=None, columns=None):
+    """Read the monthly feature files overlapping [start, end]; the cube
+    columns get the demand_cube dtypes."""
+    files = sorted(glob.glob(os.path.join(features_dir, '*.parquet')))
+    first = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+    last = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+    files = [f for f in files
+             if (first is None or os.path.basename(f)[:7] >= first) and (last is None or os.path.basename(f)[:7] <= last)]
+    if not files:
+        return pd.DataFrame(columns=columns)
+    df = concat_frames(apply_dtypes(pd.read_parquet(f, columns=columns), CUBE_TABLE) for f in files)
+    if start is not None or end is not None:
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= (df['date'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (df['date'] <= pd.Timestamp(end)).to_numpy()
+        df = df[mask].reset_index(drop=True)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build lag, rolling and market trend features from the demand cube")
+    parser.add_argument('--cube', default=CUBE_DIR, help="cube directory (pipeline/cube.py)")
+    parser.add_argument('--output', default=FEATURES_DIR, help="feature directory (one Parquet file per month)")
+    parser.add_argument('--trends', default=None, help="market_trends csv/parquet instead of the database table")
+    parser.add_argument('--db-url', default=None, help="database with the market_trends table "
+                                                      "(default: the retail_data profile)")
+    parser.add_argument('--calendar', nargs='*', default=list(CALENDAR_COLUMNS), metavar='COLUMN',
+                        help="date dimension columns to add")
+    parser.add_argument('--full', action='store_true', help="rebuild every month")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.trends:
+        trends = pd.read_csv(args.trends) if args.trends.endswith('.csv') else pd.read_parquet(args.trends)
+    else:
+        from config.db_config import get_engine
+        trends = pd.read_sql_table('market_trends', get_engine('retail_data', url=args.db_url))
+    print(update_features(trends, args.cube, args.output, args.calendar, args.full))
@@ -1,17 +1,134 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import logging
+import time
 import pandas as pd
 import sqlalchemy
-from config.db_config import DB_CONFIG
+from config.db_config import get_engine
+from config.schema import apply_dtypes
+from pipeline.cache import CACHE_DIR, QueryCache, query_chunks
+from pipeline.incremental import incremental_ingest
+from pipeline.metrics import export, stage
+from pipeline.partitioned import iter_partitioned
+from pipeline.writers import FORMATS, ChunkWriter
 
-def fetch_table():
-    engine = sqlalchemy.create_engine(DB_CONFIG)
-    query = "SELECT * FROM retail_data.demand_forecasting_base"
-    df = pd.read_sql(query, engine)
-    df.to_csv(r"D:\Supply_chain_project\data\raw\table.csv", index=False)
+logger = logging.getLogger(__name__)
+
+TABLE = "retail_data.demand_forecasting_base"
+QUERY = f"SELECT * FROM {TABLE}"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'table.csv')
+EXTRACT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'demand_forecasting_base')
+CHUNK_SIZE = 50_000
+
+
+def _query_chunks(engine, query, chunksize):
+    with engine.connect() as conn:
+        yield from query_chunks(conn, query, chunksize)
+
+
+def stream_table(engine, output, fmt=None, chunksize=CHUNK_SIZE, query=QUERY, cache=None):
+    """Copy a query result to ``output`` chunk by chunk over a server-side cursor.
+
+    Only one chunk is held in memory at a time. With ``cache`` (a
+    pipeline.cache.QueryCache) an unchanged source is read from the local
+    cache instead. Returns the number of rows written.
+    """
+    started = time.perf_counter()
+    with stage('fetch_table', TABLE) as metrics:
+        chunks = (cache.read_chunks(engine, query, chunksize, dtypes_table=TABLE) if cache is not None
+                  else _query_chunks(engine, query, chunksize))
+        with ChunkWriter(output, fmt) as writer:
+            for chunk in chunks:
+                writer.write(apply_dtypes(chunk, TABLE))
+                metrics.add(rows=len(chunk))
+                elapsed = time.perf_counter() - started
+                logger.info("%s: %d rows written (%.0f rows/s)", output, writer.rows, writer.rows / elapsed)
+        metrics.add(nbytes=writer.bytes_written)
+    elapsed = time.perf_counter() - started
+    logger.info("Fetched %d rows into %s in %.1fs (%.0f rows/s, %.1f MB)", writer.rows, output, elapsed,
+                writer.rows / elapsed if elapsed else 0, writer.bytes_written / 1e6)
+    return writer.rows
+
+
+def stream_partitioned(engine, output, fmt=None, partitions=4):
+    """Copy the table to ``output`` with ``partitions`` concurrent sale_id-range
+    queries, written in sale_id order. Returns the number of rows written."""
+    started = time.perf_counter()
+    with stage('fetch_table', TABLE) as metrics:
+        with ChunkWriter(output, fmt) as writer:
+            for part in iter_partitioned(engine, TABLE, partitions):
+                if not part.empty:
+                    writer.write(apply_dtypes(part, TABLE))
+                    metrics.add(rows=len(part))
+        metrics.add(nbytes=writer.bytes_written)
+    elapsed = time.perf_counter() - started
+    logger.info("Fetched %d rows into %s in %.1fs over %d partitions (%.0f rows/s)", writer.rows, output,
+                elapsed, partitions, writer.rows / elapsed if elapsed else 0)
+    return writer.rows
+
+
+def fetch_table(output=DEFAULT_OUTPUT, fmt=None, chunksize=None, query=QUERY, engine=None, partitions=None,
+                cache=None):
+    """Extract demand_forecasting_base to ``output``.
+
+    With ``partitions`` the table is read by that many parallel range
+    queries; with ``chunksize`` the extract is streamed; either way the row
+    count is returned. Otherwise the whole result is loaded and returned as a
+    DataFrame. ``cache`` serves repeat reads of an unchanged source from
+    disk (not with ``partitions``).
+    """
+    engine = engine or get_engine()
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    if partitions:
+        return stream_partitioned(engine, output, fmt, partitions)
+    if chunksize:
+        return stream_table(engine, output, fmt, chunksize, query, cache)
+
+    with stage('fetch_table', TABLE) as metrics:
+        if cache is not None:
+            df = cache.read_sql(engine, query, dtypes_table=TABLE)
+        else:
+            df = apply_dtypes(pd.read_sql(sqlalchemy.text(query), engine), TABLE)
+        with ChunkWriter(output, fmt) as writer:
+            writer.write(df)
+        metrics.add(rows=len(df), nbytes=writer.bytes_written)
     print("Data fetched from MySQL and saved")
     return df
 
+
 if __name__ == "__main__":
-    fetch_table()
+    parser = argparse.ArgumentParser(description="Extract demand_forecasting_base from MySQL")
+    parser.add_argument('--output', default=None,
+                        help="output file, or extract directory with --incremental")
+    parser.add_argument('--format', choices=FORMATS, default=None, help="default: from the file extension")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE,
+                        help="rows per streamed chunk / keyset page (0 loads everything in one query)")
+    parser.add_argument('--partitions', type=int, default=0,
+                        help="read with this many parallel sale_id-range queries (0 = one streamed query)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fetch only rows past the stored high-water mark into a partitioned extract")
+    parser.add_argument('--full-refresh', action='store_true', help="rebuild the incremental extract")
+    parser.add_argument('--lookback-days', type=int, default=0,
+                        help="re-read this many days below the high-water mark for corrected rows")
+    parser.add_argument('--cube', nargs='?', const=True, default=None,
+                        help="after --incremental, update the daily demand cube (optionally in this directory)")
+    parser.add_argument('--cache', nargs='?', const=CACHE_DIR, default=None,
+                        help="serve repeat extracts of an unchanged source from the local query cache "
+                             "(optionally in this directory)")
+    parser.add_argument('--metrics-port', type=int, default=None, help="serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-textfile', default=None, help="write Prometheus metrics to this .prom file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    export(args.metrics_port, args.metrics_textfile)
+    if args.incremental or args.full_refresh:
+        incremental_ingest(get_engine(), TABLE, args.output or EXTRACT_DIR,
+                           page_size=args.chunksize or CHUNK_SIZE, lookback_days=args.lookback_days,
+                           force_full=args.full_refresh)
+        if args.cube:
+            from pipeline.cube import CUBE_DIR, update_cube
+            update_cube(args.output or EXTRACT_DIR, CUBE_DIR if args.cube is True else args.cube)
+    else:
+        fetch_table(args.output or DEFAULT_OUTPUT, args.format, args.chunksize or None, partitions=args.partitions,
+                    cache=QueryCache(args.cache) if args.cache else None)
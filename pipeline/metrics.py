@@ -0,0 +1,176 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+
+# Pipeline metrics live in their own registry, so a textfile written for the
+# node_exporter collector holds only these series.
+#
+#   PIPELINE_METRICS_PORT      serve /metrics over HTTP on this port
+#   PIPELINE_METRICS_TEXTFILE  write the metrics to this .prom file at exit
+REGISTRY = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    'pipeline_stage_duration_seconds', "Wall time of one run of a pipeline stage",
+    ['stage', 'table'], registry=REGISTRY,
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, float('inf')))
+STAGE_FAILURES = Counter(
+    'pipeline_stage_failures_total', "Stage runs that raised", ['stage', 'table'], registry=REGISTRY)
+STAGE_LAST_SUCCESS = Gauge(
+    'pipeline_stage_last_success_timestamp_seconds', "Unix time the stage last finished without error",
+    ['stage', 'table'], registry=REGISTRY)
+ROWS = Counter(
+    'pipeline_rows_total', "Rows processed by a stage", ['stage', 'table'], registry=REGISTRY)
+BYTES = Counter(
+    'pipeline_bytes_total', "Bytes sent to or read from the database or disk by a stage",
+    ['stage', 'table'], registry=REGISTRY)
+DB_SECONDS = Histogram(
+    'pipeline_db_query_duration_seconds', "Database round trip per cursor execute",
+    ['operation'], registry=REGISTRY,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf')))
+CACHE_REQUESTS = Counter(
+    'pipeline_cache_requests_total', "Cache lookups by result (hit or miss)", ['cache', 'result'],
+    registry=REGISTRY)
+CACHE_EVICTIONS = Counter(
+    'pipeline_cache_evictions_total', "Entries evicted to stay under the cache size cap", ['cache'],
+    registry=REGISTRY)
+CACHE_BYTES = Gauge(
+    'pipeline_cache_bytes', "Size of the cached entries on disk", ['cache'], registry=REGISTRY)
+
+_lock = threading.Lock()
+_exporting = {}
+_DONE = object()
+
+
+class stage(ContextDecorator):
+    """Time a pipeline stage and count what it processed.
+
+    Usable as ``with stage('upload', table) as s: s.add(rows, nbytes)`` or as
+    a ``@stage('clean')`` decorator. Label children are resolved once on
+    entry, so ``add`` in a chunk loop is two counter increments. Input
+    iterated through ``exclude`` does not count towards the duration.
+    """
+
+    def __init__(self, name, table=''):
+        self.name = name
+        self.table = table
+        self.rows = 0
+        self.nbytes = 0
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own counts
+        return type(self)(self.name, self.table)
+
+    def __enter__(self):
+        labels = (self.name, self.table)
+        self._rows, self._bytes = ROWS.labels(*labels), BYTES.labels(*labels)
+        self._excluded = 0.0
+        self._started = time.perf_counter()
+        return self
+
+    def exclude(self, iterable):
+        """Iterate ``iterable`` without counting the time spent producing
+        items, e.g. an upstream generator feeding this stage."""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            item = next(iterator, _DONE)
+            self._excluded += time.perf_counter() - started
+            if item is _DONE:
+                return
+            yield item
+
+    def add(self, rows=0, nbytes=0):
+        self.rows += rows
+        self.nbytes += nbytes
+        if rows:
+            self._rows.inc(rows)
+        if nbytes:
+            self._bytes.inc(nbytes)
+
+    def __exit__(self, exc_type, *exc):
+        self.seconds = time.perf_counter() - self._started - self._excluded
+        labels = (self.name, self.table)
+        STAGE_SECONDS.labels(*labels).observe(self.seconds)
+        if exc_type is None:
+            STAGE_LAST_SUCCESS.labels(*labels).set_to_current_time()
+        else:
+            STAGE_FAILURES.labels(*labels).inc()
+        return False
+
+
+def observe_chunks(pairs, name):
+    """Pass (table, chunk) pairs through, timing the producer per table.
+
+    Only the time spent producing each chunk counts, not the consumer's time
+    between chunks, so wrapping a generator feeding a loader times the
+    generation alone.
+    """
+    pairs = iter(pairs)
+    current, seconds, rows = None, 0.0, 0
+    while True:
+        started = time.perf_counter()
+        item = next(pairs, None)
+        elapsed = time.perf_counter() - started
+        table = item[0] if item is not None else None
+        if current is not None and table != current:
+            STAGE_SECONDS.labels(name, current).observe(seconds)
+            STAGE_LAST_SUCCESS.labels(name, current).set_to_current_time()
+            ROWS.labels(name, current).inc(rows)
+            seconds, rows = 0.0, 0
+        if item is None:
+            return
+        current = table
+        seconds += elapsed
+        rows += len(item[1])
+        yield item
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_metrics_started'].pop()
+    words = statement.split(None, 1)
+    DB_SECONDS.labels(words[0].upper() if words else 'OTHER').observe(time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # A failed execute never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('_metrics_started'):
+        context.connection.info['_metrics_started'].pop()
+
+
+def instrument_engine(engine):
+    """Record every cursor execute of ``engine`` in DB_SECONDS; idempotent."""
+    from sqlalchemy import event
+    if not event.contains(engine, 'before_cursor_execute', _before_execute):
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+    return engine
+
+
+def write_textfile(path):
+    """Write the registry to ``path`` atomically (node_exporter textfile collector)."""
+    write_to_textfile(path, REGISTRY)
+
+
+def export(port=None, textfile=None):
+    """Start exporting: an HTTP endpoint on ``port`` and/or a textfile written
+    at interpreter exit. Defaults come from PIPELINE_METRICS_PORT and
+    PIPELINE_METRICS_TEXTFILE; with neither set this does nothing."""
+    port = port or os.environ.get('PIPELINE_METRICS_PORT')
+    textfile = textfile or os.environ.get('PIPELINE_METRICS_TEXTFILE')
+    with _lock:
+        if port and 'port' not in _exporting:
+            start_http_server(int(port), registry=REGISTRY)
+            _exporting['port'] = int(port)
+        if textfile and 'textfile' not in _exporting:
+            atexit.register(write_textfile, textfile)
+            _exporting['textfile'] = textfile
+    return dict(_exporting)
@@ -0,0 +1,142 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pandas as pd
+import sqlalchemy
+from config.db_config import get_engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = "retail_data.demand_forecasting_base"
+KEY = 'sale_id'
+DATE_COLUMN = 'date'
+PARTITIONS = 4
+
+
+def key_ranges(low, high, partitions):
+    """Split the closed key range [low, high] into up to ``partitions``
+    half-open ranges of (almost) equal width."""
+    span = high - low + 1
+    partitions = max(1, min(partitions, span))
+    bounds = [low + span * i // partitions for i in range(partitions + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def date_ranges(first, last, partitions):
+    """Split the days from ``first`` to ``last`` into up to ``partitions``
+    half-open [start, stop) date ranges."""
+    return [(date.fromordinal(start), date.fromordinal(stop))
+            for start, stop in key_ranges(first.toordinal(), last.toordinal(), partitions)]
+
+
+def plan_partitions(engine, table=TABLE, partitions=PARTITIONS, by='key'):
+    """Range predicates covering ``table``: a list of (where, params) pairs,
+    one per partition, in result order."""
+    column = KEY if by == 'key' else DATE_COLUMN
+    with engine.connect() as conn:
+        low, high = conn.execute(sqlalchemy.text(f"SELECT MIN({column}), MAX({column}) FROM {table}")).one()
+    if low is None:
+        return []
+    if by == 'key':
+        ranges = key_ranges(int(low), int(high), partitions)
+    else:
+        ranges = [(str(start), str(stop)) for start, stop in
+                  date_ranges(pd.Timestamp(low).date(), pd.Timestamp(high).date(), partitions)]
+    where = f"{column} >= :start AND {column} < :stop"
+    return [(where, {'start': start, 'stop': stop}) for start, stop in ranges]
+
+
+def read_partition(engine, table, where, params, by='key'):
+    # Each partition checks out its own pooled connection, so the ranges are
+    # scanned by separate server threads
+    order = KEY if by == 'key' else f"{DATE_COLUMN}, {KEY}"
+    query = sqlalchemy.text(f"SELECT * FROM {table} WHERE {where} ORDER BY {order}")
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn, params=params)
+
+
+def iter_partitioned(engine, table=TABLE, partitions=PARTITIONS, by='key', workers=None, prefetch=None):
+    """Yield the partitions of ``table`` in order, fetching them concurrently.
+
+    ``by='key'`` splits on sale_id ranges and yields rows in sale_id order,
+    ``by='date'`` splits on date ranges and yields them in (date, sale_id)
+    order. At most ``prefetch`` partitions (default: ``workers``) are held
+    ahead of the consumer, so memory stays bounded when streaming.
+    """
+    plan = plan_partitions(engine, table, partitions, by)
+    workers = workers or min(len(plan), PARTITIONS * 2) or 1
+    prefetch = prefetch or workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for where, params in plan:
+            pending.append(pool.submit(read_partition, engine, table, where, params, by))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_partitioned(engine, table=TABLE, partitions=PARTITIONS, by='key', workers=None):
+    """Read the whole table with ``partitions`` concurrent range queries.
+
+    The result equals ``SELECT * FROM table ORDER BY sale_id`` (or ``ORDER BY
+    date, sale_id`` with ``by='date'``) with a fresh RangeIndex.
+    """
+    parts = [part for part in iter_partitioned(engine, table, partitions, by, workers) if not part.empty]
+    if not parts:
+        return read_partition(engine, table, '1 = 0', {}, by)
+    return pd.concat(parts, ignore_index=True)
+
+
+def benchmark(engine, table=TABLE, counts=(1, 2, 4, 8), by='key', repeat=3):
+    """Time the single ordered query against partitioned reads and check
+    that every partitioned result matches it exactly."""
+    order = KEY if by == 'key' else f"{DATE_COLUMN}, {KEY}"
+
+    def best(read):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            df = read()
+            timings.append(time.perf_counter() - started)
+        return df, min(timings)
+
+    def single():
+        with engine.connect() as conn:
+            return pd.read_sql(sqlalchemy.text(f"SELECT * FROM {table} ORDER BY {order}"), conn)
+
+    expected, baseline = best(single)
+    results = [{'partitions': 'single query', 'seconds': baseline, 'rows_per_s': len(expected) / baseline}]
+    for count in counts:
+        df, seconds = best(lambda: read_partitioned(engine, table, count, by))
+        pd.testing.assert_frame_equal(df, expected)
+        results.append({'partitions': count, 'seconds': seconds, 'rows_per_s': len(df) / seconds,
+                        'speedup': baseline / seconds})
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitioned parallel read of demand_forecasting_base")
+    parser.add_argument('--db-url', default=None, help="SQLAlchemy URL (default: config.db_config)")
+    parser.add_argument('--table', default=TABLE)
+    parser.add_argument('--by', choices=['key', 'date'], default='key', help="partition on sale_id or date ranges")
+    parser.add_argument('--partitions', type=int, default=PARTITIONS)
+    parser.add_argument('--benchmark', action='store_true',
+                        help="compare 1..2x--partitions against the single query")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = get_engine(url=args.db_url)
+    if args.benchmark:
+        counts = [1] + [n for n in (2, 4, 8, 16) if n <= max(args.partitions, 2) * 2]
+        print(benchmark(engine, args.table, counts, args.by).to_string(index=False))
+    else:
+        started = time.perf_counter()
+        df = read_partitioned(engine, args.table, args.partitions, args.by)
+        elapsed = time.perf_counter() - started
+        print(f"Read {len(df)} rows in {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s, {args.partitions} partitions)")
@@ -0,0 +1,196 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+import pandas as pd
+from config.schema import apply_dtypes, concat_frames
+from pipeline.metrics import stage
+from pipeline.writers import arrow_schema
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'demand_forecasting_base'
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'snapshots')
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, f'{TABLE}.arrow')
+# Rows per record batch. pandas can only use a mapped column without copying
+# when it is one batch, so chunks are coalesced up to this size
+BATCH_ROWS = 1_000_000
+
+
+class SnapshotWriter:
+    """Writes DataFrame chunks to an uncompressed Arrow IPC file that
+    readers can memory-map.
+
+    Categoricals stay dictionary encoded with one dictionary per column for
+    the whole file: each chunk is recoded onto the categories seen so far,
+    new values are appended, and the additions are written as dictionary
+    deltas. A categorical with no categories in the first chunk is stored
+    as plain values. Chunks are buffered into record batches of
+    ``batch_rows`` rows. The file appears at ``path`` only on close,
+    replacing any earlier snapshot; processes that mapped the old one keep
+    reading it.
+    """
+
+    def __init__(self, path, source='', batch_rows=BATCH_ROWS):
+        self.path = path
+        self.source = source
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._writer = None
+        self._sink = None
+        self._schema = None
+        self._categories = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(publish=exc_type is None)
+
+    def _recode(self, df):
+        df = df.copy(deep=False)
+        for col, categories in self._categories.items():
+            values = df[col]
+            seen = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else pd.Index(values.dropna().unique())
+            new = seen[~seen.isin(categories)]
+            if len(new):
+                categories = self._categories[col] = categories.append(new)
+            df[col] = pd.Categorical(values, categories=categories)
+        return df
+
+    def write(self, df):
+        if self._writer is None:
+            self._open(df)
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        self.rows += len(df)
+        if self._pending_rows >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        if not self._pending:
+            return
+        df = concat_frames(self._pending) if len(self._pending) > 1 else self._pending[0]
+        self._pending, self._pending_rows = [], 0
+        table = pa.Table.from_pandas(self._recode(df), schema=self._schema, preserve_index=False)
+        self._writer.write_table(table, max_chunksize=self.batch_rows)
+
+    def _open(self, df):
+        import pyarrow as pa
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        schema = arrow_schema(df)
+        # A dictionary that starts out empty cannot take deltas, so columns
+        # without categories in the first chunk are stored as plain values
+        schema = pa.schema([field.with_type(field.type.value_type)
+                            if pa.types.is_dictionary(field.type) and not len(df[field.name].cat.categories)
+                            else field for field in schema], metadata=schema.metadata)
+        info = {'table': TABLE, 'source': self.source, 'created_at': datetime.now().isoformat(timespec='seconds')}
+        self._schema = schema.with_metadata({**(schema.metadata or {}), b'snapshot': json.dumps(info).encode()})
+        self._categories = {field.name: pd.Index([], dtype=object) for field in self._schema
+                            if pa.types.is_dictionary(field.type)}
+        self._sink = pa.OSFile(self._tmp, 'wb')
+        # No compression: mapped buffers are only zero-copy when stored as is
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        self._writer = pa.ipc.new_file(self._sink, self._schema, options=options)
+
+    def close(self, publish=True):
+        if self._writer is not None:
+            if publish:
+                self._flush()
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            if publish:
+                os.replace(self._tmp, self.path)
+            else:
+                os.remove(self._tmp)
+
+    @property
+    def bytes_written(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+def publish_snapshot(chunks, path=SNAPSHOT_PATH, source=''):
+    """Write cleaned DataFrame chunks as the snapshot at ``path``; returns
+    run statistics."""
+    started = time.perf_counter()
+    with stage('publish_snapshot', TABLE) as metrics:
+        with SnapshotWriter(path, source) as writer:
+            for chunk in metrics.exclude(chunks):
+                writer.write(chunk)
+                metrics.add(rows=len(chunk))
+        metrics.add(nbytes=writer.bytes_written)
+    stats = {'rows': writer.rows, 'mb': writer.bytes_written / 1e6, 'seconds': time.perf_counter() - started}
+    logger.info("Published %d rows to %s (%.1f MB) in %.1fs", writer.rows, path, stats['mb'], stats['seconds'])
+    return stats
+
+
+def open_snapshot(path=SNAPSHOT_PATH, columns=None):
+    """The snapshot as a pyarrow Table backed by a memory map of the file.
+
+    Nothing is read up front: pages are loaded by the OS as columns are
+    touched, and processes mapping the same snapshot share them.
+    """
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def load_snapshot(path=SNAPSHOT_PATH, columns=None, writable=False):
+    """The snapshot as a DataFrame with the config.schema dtypes.
+
+    In a snapshot of one record batch, numeric and datetime columns without
+    missing values are read-only views of the mapped file; larger snapshots
+    are concatenated once per column. Categoricals come from their
+    dictionary codes, so no strings are parsed. Pass ``writable`` to get a
+    frame that can be modified in place.
+    """
+    with stage('load_snapshot', TABLE) as metrics:
+        table = open_snapshot(path, columns)
+        df = apply_dtypes(table.to_pandas(split_blocks=True), TABLE)
+        if writable:
+            df = df.copy()
+        metrics.add(rows=len(df))
+    return df
+
+
+def snapshot_info(path=SNAPSHOT_PATH):
+    """Rows, columns, size and publishing details of a snapshot, from its
+    footer and schema only."""
+    import pyarrow as pa
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    info = json.loads((reader.schema.metadata or {}).get(b'snapshot', b'{}'))
+    rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return {**info, 'rows': rows, 'columns': reader.schema.names, 'batches': reader.num_record_batches,
+            'mb': os.path.getsize(path) / 1e6}
+
+
+if __name__ == "__main__":
+    from data_cleaning.stream import CHUNK_SIZE, clean_stream, iter_chunks
+    parser = argparse.ArgumentParser(description="Publish a cleaned extract as a memory-mappable Arrow snapshot")
+    parser.add_argument('source', nargs='?', default=None,
+                        help="cleaned csv/parquet file or incremental extract directory (omit with --info)")
+    parser.add_argument('--output', default=SNAPSHOT_PATH)
+    parser.add_argument('--clean', action='store_true', help="clean and deduplicate the source on the way")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--info', action='store_true', help="print the details of the snapshot at --output")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.info:
+        print(snapshot_info(args.output))
+        sys.exit()
+    if not args.source:
+        parser.error("source is required unless --info is given")
+    chunks = iter_chunks(args.source, args.chunksize)
+    if args.clean:
+        chunks = clean_stream(chunks)
+    chunks = (apply_dtypes(chunk, TABLE) for chunk in chunks)
+    print(publish_snapshot(chunks, args.output, os.path.abspath(args.source)))
@@ -0,0 +1,94 @@
+import os
+
+FORMATS = ('csv', 'parquet', 'feather')
+_EXTENSIONS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def infer_format(path, fmt=None):
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _EXTENSIONS:
+        raise ValueError(f"cannot infer output format from {path!r}; pass fmt")
+    return _EXTENSIONS[ext]
+
+
+def arrow_schema(df, dictionary_columns=()):
+    """Arrow schema for a chunk that later chunks can be cast to.
+
+    Columns that are entirely null in the first chunk have no type yet and
+    are taken to be strings, which is what an empty object column holds.
+    Categoricals get int32 dictionary indices, since pandas sizes the codes
+    to the categories of each chunk.
+    """
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        if pa.types.is_dictionary(field.type):
+            value_type = pa.string() if pa.types.is_null(field.type.value_type) else field.type.value_type
+            field = field.with_type(pa.dictionary(pa.int32(), value_type))
+        elif field.name in dictionary_columns and pa.types.is_string(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        schema = schema.set(i, field)
+    return schema
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to one CSV, Parquet or Feather (Arrow IPC) file.
+
+    The schema is fixed by the first chunk, so memory use is bounded by the
+    chunk size no matter how many chunks are written.
+    """
+
+    def __init__(self, path, fmt=None, compression=None, dictionary_columns=()):
+        self.path = path
+        self.fmt = infer_format(path, fmt)
+        self.compression = compression if compression is not None else ('zstd' if self.fmt == 'parquet' else None)
+        self.dictionary_columns = dictionary_columns
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            if self._writer is None:
+                self._open(df)
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def _open(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._schema = arrow_schema(df, self.dictionary_columns)
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=self.compression)
+        else:
+            # IPC files allow one dictionary per field, but each chunk's
+            # categoricals bring their own, so store the values instead
+            self._schema = pa.schema([field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type)
+                                      else field for field in self._schema], metadata=self._schema.metadata)
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(self.path, self._schema, options=options)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    @property
+    def bytes_written(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
@@ -0,0 +1,209 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import logging
+import time
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from config.schema import apply_dtypes
+from pipeline.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('periodic', 'reorder_point')
+# Annual holding cost as a share of unit cost
+HOLDING_RATE = 0.25
+# Safety stock of the reorder-point policy, in days of average demand
+SAFETY_DAYS = 7
+
+SimulationResult = namedtuple('SimulationResult', ['summary', 'daily'])
+
+
+def lead_times(inventory, products, suppliers, shipments=None):
+    """Replenishment lead time in days per inventory row.
+
+    The supplier's lead_time_days plus the product's median shipment transit
+    time (arrival - departure); products without shipments use the median
+    over all shipments.
+    """
+    supplier_lead = suppliers.set_index(suppliers['supplier_id'].astype(object))['lead_time_days']
+    product_supplier = products.set_index(products['product_id'].astype(object))['supplier_id'].astype(object)
+    product_ids = inventory['product_id'].astype(object)
+    lead = product_ids.map(product_supplier).map(supplier_lead).fillna(supplier_lead.median()).to_numpy()
+    if shipments is not None and len(shipments):
+        transit = (pd.to_datetime(shipments['shipment_arrival_time'])
+                   - pd.to_datetime(shipments['shipment_departure_time'])) / pd.Timedelta(days=1)
+        per_product = transit.groupby(shipments['product_id'].astype(object).to_numpy()).median()
+        lead = lead + np.ceil(product_ids.map(per_product).fillna(transit.median()).to_numpy())
+    return np.maximum(lead, 1).astype(np.int64)
+
+
+def demand_matrix(sales, inventory, start=None, end=None):
+    """Daily demand per inventory row as an (inventory rows x days) array.
+
+    A product's daily sales_quantity is split evenly over the warehouses
+    stocking it. Returns (dates, demand).
+    """
+    from forecasting.baseline import series_matrix
+    keys, dates, values = series_matrix(sales, ['product_id'])
+    keep = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        keep &= dates >= pd.Timestamp(start)
+    if end is not None:
+        keep &= dates <= pd.Timestamp(end)
+    dates, values = dates[keep], values[:, keep]
+    row = pd.Series(np.arange(len(keys)), index=keys['product_id'].astype(object))
+    product_ids = inventory['product_id'].astype(object)
+    rows = product_ids.map(row).to_numpy()
+    warehouses = product_ids.map(product_ids.value_counts()).to_numpy()
+    demand = np.zeros((len(inventory), len(dates)))
+    stocked = ~np.isnan(rows)
+    demand[stocked] = values[rows[stocked].astype(np.int64)] / warehouses[stocked, None]
+    return dates, demand
+
+
+def simulate(inventory, demand, lead_time, unit_cost, unit_price=None, dates=None, policy='periodic',
+             holding_rate=HOLDING_RATE, safety_days=SAFETY_DAYS):
+    """Day-stepped simulation of every inventory row at once.
+
+    Each day: orders due arrive, demand is served from stock (unmet demand
+    is lost), then orders are placed. ``periodic`` orders the row's
+    order_quantity every restock_frequency_days, phased by its restock_date;
+    ``reorder_point`` orders it whenever stock on hand plus on order falls
+    to lead-time demand plus ``safety_days`` of demand. Orders arrive
+    ``lead_time`` days later.
+
+    Every step is a handful of array operations over all rows, and pending
+    orders live in a ring buffer indexed by arrival day. Returns a
+    SimulationResult with per-row totals and per-day totals.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy!r}, expected one of {', '.join(POLICIES)}")
+    n, days = demand.shape
+    rows = np.arange(n)
+    lead_time = np.asarray(lead_time, dtype=np.int64)
+    order_qty = inventory['order_quantity'].to_numpy(dtype=np.float64)
+    period = inventory['restock_frequency_days'].to_numpy(dtype=np.int64)
+    if dates is not None and 'restock_date' in inventory.columns:
+        since = (pd.Timestamp(dates[0]) - pd.to_datetime(inventory['restock_date'])) // pd.Timedelta(days=1)
+        phase = since.fillna(0).to_numpy(dtype=np.int64) % period
+    else:
+        phase = np.zeros(n, dtype=np.int64)
+    reorder_point = demand.mean(axis=1) * (lead_time + safety_days)
+
+    on_hand = inventory['stock_level'].to_numpy(dtype=np.float64).copy()
+    on_order = np.zeros(n)
+    arrivals = np.zeros((int(lead_time.max()) + 1, n))
+    totals = {name: np.zeros(n) for name in ('sold', 'lost', 'ordered', 'holding', 'on_hand')}
+    orders, stockout_days = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    daily = {name: np.zeros(days) for name in ('demand', 'sold', 'lost', 'on_hand', 'on_order', 'ordered')}
+    daily_holding_rate = unit_cost * holding_rate / 365
+
+    for t in range(days):
+        slot = t % len(arrivals)
+        received = arrivals[slot]
+        on_hand += received
+        on_order -= received
+        arrivals[slot] = 0
+
+        sold = np.minimum(on_hand, demand[:, t])
+        lost = demand[:, t] - sold
+        on_hand -= sold
+
+        if policy == 'periodic':
+            place = (t - phase) % period == 0
+        else:
+            place = on_hand + on_order <= reorder_point
+        quantity = np.where(place, order_qty, 0.0)
+        arrivals[(t + lead_time) % len(arrivals), rows] += quantity
+        on_order += quantity
+
+        totals['sold'] += sold
+        totals['lost'] += lost
+        totals['ordered'] += quantity
+        totals['on_hand'] += on_hand
+        totals['holding'] += on_hand * daily_holding_rate
+        orders += place
+        stockout_days += lost > 0
+        daily['demand'][t] = demand[:, t].sum()
+        daily['sold'][t] = sold.sum()
+        daily['lost'][t] = lost.sum()
+        daily['on_hand'][t] = on_hand.sum()
+        daily['on_order'][t] = on_order.sum()
+        daily['ordered'][t] = quantity.sum()
+
+    total_demand = demand.sum(axis=1)
+    summary = pd.DataFrame({
+        'product_id': inventory['product_id'].to_numpy(),
+        'warehouse': inventory['warehouse'].to_numpy(),
+        'demand': total_demand,
+        'sold': totals['sold'],
+        'lost_sales': totals['lost'],
+        'fill_rate': np.divide(totals['sold'], total_demand, out=np.ones(n), where=total_demand > 0),
+        'stockout_days': stockout_days,
+        'orders': orders,
+        'units_ordered': totals['ordered'],
+        'avg_on_hand': totals['on_hand'] / max(days, 1),
+        'ending_on_hand': on_hand,
+        'holding_cost': totals['holding'],
+        'lost_revenue': totals['lost'] * (unit_price if unit_price is not None else 0),
+    })
+    daily = pd.DataFrame(daily, index=pd.DatetimeIndex(dates, name='date') if dates is not None else None)
+    return SimulationResult(summary, daily)
+
+
+def run(inventory, products, suppliers, sales, shipments=None, start=None, end=None, **kwargs):
+    """Simulate the inventory table against historical (or forecast) sales."""
+    with stage('simulate_inventory', 'inventory') as metrics:
+        dates, demand = demand_matrix(sales, inventory, start, end)
+        prices = products.set_index(products['product_id'].astype(object))
+        product_ids = inventory['product_id'].astype(object)
+        unit_cost = product_ids.map(prices['cost']).fillna(0).to_numpy(dtype=np.float64)
+        unit_price = product_ids.map(prices['price']).fillna(0).to_numpy(dtype=np.float64)
+        result = simulate(inventory, demand, lead_times(inventory, products, suppliers, shipments), unit_cost,
+                          unit_price, dates, **kwargs)
+        metrics.add(rows=demand.size)
+    return result
+
+
+def load_tables(engine):
+    """inventory, products, suppliers and shipments with the config.schema dtypes."""
+    tables = {}
+    for table in ('inventory', 'products', 'suppliers', 'shipments'):
+        tables[table] = apply_dtypes(pd.read_sql_table(table, engine), table)
+    return tables
+
+
+if __name__ == "__main__":
+    from config.db_config import get_engine
+    from forecasting.engine import load_sales
+    from pipeline.cube import CUBE_DIR
+    parser = argparse.ArgumentParser(description="Simulate inventory replenishment against daily demand")
+    parser.add_argument('demand', nargs='?', default=CUBE_DIR,
+                        help="cube directory, cleaned extract or forecast file with date/product_id/sales_quantity")
+    parser.add_argument('--db-url', default=None, help="database with the inventory, products, suppliers and "
+                                                      "shipments tables (default: the retail_data profile)")
+    parser.add_argument('--policy', choices=POLICIES, default='periodic')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--holding-rate', type=float, default=HOLDING_RATE, help="annual share of unit cost")
+    parser.add_argument('--output', default=None, help="write the per product x warehouse summary to this csv")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    tables = load_tables(get_engine('retail_data', url=args.db_url))
+    sales = load_sales(args.demand)
+    if 'sales_quantity' not in sales.columns and 'forecast' in sales.columns:
+        sales = sales.rename(columns={'forecast': 'sales_quantity'})
+    started = time.perf_counter()
+    result = run(tables['inventory'], tables['products'], tables['suppliers'], sales, tables['shipments'],
+                 args.start, args.end, policy=args.policy, holding_rate=args.holding_rate)
+    summary = result.summary
+    print(f"{len(summary)} product x warehouse rows over {len(result.daily)} days in "
+          f"{time.perf_counter() - started:.2f}s")
+    print(f"fill rate {summary['sold'].sum() / max(summary['demand'].sum(), 1):.1%}, "
+          f"stockout days {int(summary['stockout_days'].sum())}, "
+          f"holding cost {summary['holding_cost'].sum():,.0f}, lost revenue {summary['lost_revenue'].sum():,.0f}")
+    if args.output:
+        summary.to_csv(args.output, index=False)
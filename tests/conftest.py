@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from sqlalchemy import create_engine, event
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """A SQLite file database with foreign keys enforced, standing in for MySQL."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine, 'connect')
+    def _foreign_keys(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+
+    yield engine
+    engine.dispose()
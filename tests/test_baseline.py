@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_generate.catalog import CATEGORIES
+from forecasting.baseline import INTERVAL_Z, forecast_baseline, forecast_matrix, multipliers, series_matrix, to_frame
+from forecasting.engine import load_sales
+from pipeline.cube import update_cube
+
+
+def _ses(series, alpha):
+    level = series[0]
+    for value in series[1:]:
+        level = alpha * value + (1 - alpha) * level
+    return level
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 40, size=(4, 60)).astype(np.float64)
+
+
+def test_seasonal_naive_repeats_the_last_season(values):
+    ones = np.ones((4, 10))
+    forecast, _ = forecast_matrix(values, np.ones_like(values), ones, 'seasonal_naive', season=7)
+    np.testing.assert_array_equal(forecast[:, :7], values[:, -7:])
+    np.testing.assert_array_equal(forecast[:, 7:], values[:, -7:-4])
+
+
+def test_moving_average_is_flat_at_the_window_mean(values):
+    forecast, _ = forecast_matrix(values, np.ones_like(values), np.ones((4, 5)), 'moving_average', window=14)
+    np.testing.assert_allclose(forecast, np.repeat(values[:, -14:].mean(axis=1, keepdims=True), 5, axis=1))
+
+
+@pytest.mark.parametrize('alpha', [0.2, 0.5, 0.9])
+def test_ewma_matches_recursive_smoothing(values, alpha):
+    forecast, _ = forecast_matrix(values, np.ones_like(values), np.ones((4, 3)), 'ewma', alpha=alpha)
+    np.testing.assert_allclose(forecast[:, 0], [_ses(row, alpha) for row in values])
+    np.testing.assert_allclose(forecast, np.repeat(forecast[:, :1], 3, axis=1))
+
+
+def test_multipliers_are_removed_and_reapplied(values):
+    history = np.where(np.arange(60) % 7 == 5, 2.0, 1.0) * np.ones((4, 1))
+    future = np.array([[1.0, 2.0, 1.5]] * 4)
+    base, _ = forecast_matrix(values / history, np.ones_like(values), np.ones((4, 3)), 'moving_average')
+    forecast, spread = forecast_matrix(values, history, future, 'moving_average')
+    np.testing.assert_allclose(forecast, base * future)
+    np.testing.assert_allclose(spread, INTERVAL_Z * (values / history)[:, -28:].std(axis=1, keepdims=True) * future)
+
+
+def test_unknown_method(values):
+    with pytest.raises(ValueError, match='unknown method'):
+        forecast_matrix(values, np.ones_like(values), np.ones((4, 3)), 'arima')
+
+
+def test_series_matrix_fills_missing_days():
+    df = pd.DataFrame({'date': pd.to_datetime(['2024-01-01', '2024-01-03', '2024-01-03', '2024-01-02']),
+                       'product_id': ['B', 'B', 'B', 'A'], 'sales_quantity': [1, 2, 3, 4],
+                       'category': ['Toys', 'Toys', 'Toys', 'Books']})
+    keys, days, values = series_matrix(df)
+    assert keys['product_id'].tolist() == ['A', 'B'] and keys['category'].tolist() == ['Books', 'Toys']
+    assert list(days) == list(pd.date_range('2024-01-01', '2024-01-03'))
+    np.testing.assert_array_equal(values, [[0, 4, 0], [1, 0, 5]])
+
+
+def test_to_frame_clips_negative_forecasts():
+    keys = pd.DataFrame({'product_id': ['A', 'B']})
+    dates = pd.date_range('2024-02-01', periods=2)
+    frame = to_frame(keys, dates, np.array([[1.0, -1.0], [2.0, 3.0]]), np.full((2, 2), 1.5), 'ewma')
+    assert frame['product_id'].astype(str).tolist() == ['A', 'A', 'B', 'B']
+    assert frame['forecast'].tolist() == [1.0, 0.0, 2.0, 3.0]
+    assert frame['forecast_lower'].tolist() == [0.0, 0.0, 0.5, 1.5]
+    assert (frame['model'] == 'ewma').all()
+
+
+def _seasonal_category():
+    # In season only between May and October, so March-April history is off season
+    return next(name for name, info in CATEGORIES.items()
+                if info['seasonality'] and all(5 <= m <= 10 for m in info['seasonality']))
+
+
+def test_multipliers_apply_category_seasonality():
+    category = _seasonal_category()
+    info = CATEGORIES[category]
+    month = info['seasonality'][0]
+    dates = pd.DatetimeIndex([pd.Timestamp(2024, 3, 12), pd.Timestamp(2024, month, 3)])
+    factors = multipliers(np.array([category, 'Unknown']), dates)
+    np.testing.assert_allclose(factors, [[1.0, info['multiplier']], [1.0, 1.0]])
+
+
+def _flat_sales(category=None):
+    dates = pd.date_range('2024-03-01', '2024-04-30')
+    df = pd.DataFrame({'date': dates, 'product_id': 'P1', 'store_id': 'S1', 'sales_quantity': 10})
+    if category is not None:
+        df['category'] = category
+    return df
+
+
+def test_forecast_baseline_applies_category_seasonality():
+    category = _seasonal_category()
+    info = CATEGORIES[category]
+    horizon = 183  # May through October
+    plain = forecast_baseline(_flat_sales(), horizon=horizon, method='moving_average')
+    seasonal = forecast_baseline(_flat_sales(category), horizon=horizon, method='moving_average')
+    ratio = seasonal['forecast'].to_numpy() / plain['forecast'].to_numpy()
+    in_season = plain['date'].dt.month.isin(info['seasonality']).to_numpy()
+    assert in_season.any()
+    np.testing.assert_allclose(ratio[in_season], info['multiplier'])
+    np.testing.assert_allclose(ratio[~in_season], 1.0)
+
+
+def test_load_sales_joins_categories_onto_the_cube(tmp_path):
+    extract = tmp_path / 'extract'
+    extract.mkdir()
+    df = pd.DataFrame({'date': pd.to_datetime(['2024-01-02', '2024-01-02', '2024-01-03']),
+                       'product_id': ['P1', 'P2', 'P1'], 'store_id': 'S1', 'sales_quantity': [1, 2, 3],
+                       'sales_revenue': [1.0, 2.0, 3.0], 'promo_flag': False, 'holiday_flag': None,
+                       'category': ['Toys', 'Books', 'Toys']})
+    df.to_parquet(extract / '2024-01.parquet')
+    update_cube(str(extract), str(tmp_path / 'cube'))
+    sales = load_sales(str(tmp_path / 'cube')).sort_values(['date', 'product_id'])
+    assert sales['category'].astype(str).tolist() == ['Toys', 'Books', 'Toys']
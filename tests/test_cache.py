@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from pipeline.cache import QueryCache, normalize_query, query_tables, source_fingerprint
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    # Created by to_sql, like data_generate.py's SqlSink: no sale_id column
+    pd.DataFrame({'product_id': ['P1', 'P2', 'P3'], 'sales_quantity': [1, 2, 3]}).to_sql(
+        'sales', sqlite_engine, index=False)
+    pd.DataFrame({'product_id': ['P1', 'P2'], 'price': [1.5, 2.5]}).to_sql('products', sqlite_engine, index=False)
+    return sqlite_engine
+
+
+def test_normalize_and_tables():
+    assert normalize_query(" SELECT *\n  FROM sales ;") == "SELECT * FROM sales"
+    assert query_tables("select * from retail.sales s join `products` p on 1") == ['retail.sales', 'products']
+    assert query_tables("SELECT * FROM demand_forecasting_base") == [
+        'demand_forecasting_base', 'sales', 'products', 'promotions']
+
+
+def test_fingerprint_without_schema_primary_key(engine):
+    with engine.connect() as conn:
+        assert source_fingerprint(conn, ['sales']) == [['sales', '3', None, None]]
+
+
+def test_fingerprint_uses_the_primary_key(sqlite_engine):
+    pd.DataFrame({'sale_id': [1, 2, 7], 'sales_quantity': [1, 2, 3]}).to_sql('sales', sqlite_engine, index=False)
+    with sqlite_engine.connect() as conn:
+        assert source_fingerprint(conn, ['sales']) == [['sales', '3', '7', None]]
+
+
+def _base_tables(engine):
+    pd.DataFrame({'promotion_id': [1], 'discount_percentage': [10.0]}).to_sql('promotions', engine, index=False)
+    return "SELECT * FROM demand_forecasting_base ORDER BY product_id"
+
+
+def test_materialised_view_is_fingerprinted_itself(engine, tmp_path):
+    query = _base_tables(engine)
+    pd.DataFrame({'product_id': ['P1', 'P2'], 'price': [1.5, 2.5]}).to_sql(
+        'demand_forecasting_base', engine, index=False)
+    cache = QueryCache(str(tmp_path / 'cache'))
+    assert len(cache.read_sql(engine, query)) == 2
+    # Refreshed without touching the base tables
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO demand_forecasting_base VALUES ('P3', 3.5)"))
+    assert len(cache.read_sql(engine, query)) == 3
+    assert cache.stats()['misses'] == 2
+
+
+def test_view_is_fingerprinted_by_its_base_tables(engine, tmp_path):
+    query = _base_tables(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE VIEW demand_forecasting_base AS "
+                          "SELECT s.product_id, p.price FROM sales s JOIN products p ON p.product_id = s.product_id"))
+        fingerprint = source_fingerprint(conn, ['demand_forecasting_base'])
+        assert fingerprint[0] == ['demand_forecasting_base', 'view', None, None]
+    cache = QueryCache(str(tmp_path / 'cache'))
+    assert len(cache.read_sql(engine, query)) == 2
+    assert len(cache.read_sql(engine, query)) == 2
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO products VALUES ('P3', 3.5)"))
+    assert len(cache.read_sql(engine, query)) == 3
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_read_sql_hits_until_the_source_changes(engine, tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache'))
+    first = cache.read_sql(engine, "SELECT * FROM sales ORDER BY product_id")
+    again = cache.read_sql(engine, "SELECT *\n  FROM sales ORDER BY product_id;")
+    pd.testing.assert_frame_equal(first, again)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO sales VALUES ('P4', 4)"))
+    assert len(cache.read_sql(engine, "SELECT * FROM sales ORDER BY product_id")) == 4
+    assert cache.stats()['misses'] == 2 and cache.stats()['entries'] == 1
+
+
+def test_read_chunks_caches_complete_results_only(engine, tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache'))
+    query = "SELECT * FROM sales ORDER BY product_id"
+    chunks = cache.read_chunks(engine, query, chunksize=2)
+    next(chunks)
+    chunks.close()
+    assert cache.stats()['entries'] == 0
+
+    assert [len(c) for c in cache.read_chunks(engine, query, chunksize=2)] == [2, 1]
+    cached = list(cache.read_chunks(engine, query, chunksize=2))
+    assert pd.concat(cached)['product_id'].tolist() == ['P1', 'P2', 'P3']
+    assert cache.stats()['hits'] == 1
+
+
+def test_evicts_least_recently_used(engine, tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache'))
+    cache.read_sql(engine, "SELECT * FROM sales")
+    cache.read_sql(engine, "SELECT * FROM products")
+    cache.read_sql(engine, "SELECT * FROM sales")
+    size = cache.stats()['bytes']
+    assert cache.evict(size - 1) == 1
+    cache.read_sql(engine, "SELECT * FROM sales")
+    assert cache.stats()['hits'] == 2 and cache.stats()['evictions'] == 1
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0, 'hit_rate': 0.0}
+    assert [f for f in (tmp_path / 'cache').iterdir() if f.suffix == '.parquet'] == []
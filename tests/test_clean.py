@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from data_cleaning.clean import clean, clean_reference, comparable, normalize_category
+
+
+def test_normalize_category_merges_normalized_values():
+    values = pd.Series([' sony', 'Sony ', 'SONY', None, 'bose'], dtype='category')
+    result = normalize_category(values, 'Unknown', 'title')
+    assert result.tolist() == ['Sony', 'Sony', 'Sony', 'Unknown', 'Bose']
+    assert sorted(result.cat.categories) == ['Bose', 'Sony', 'Unknown']
+
+
+def test_normalize_category_leaves_non_string_categories():
+    # An all-missing column read as float, and numeric codes from a CSV
+    assert normalize_category(pd.Series([np.nan, np.nan]), 'Unknown', 'title').tolist() == ['Unknown', 'Unknown']
+    assert normalize_category(pd.Series([3, 1, 3]), None, 'upper').tolist() == [3, 1, 3]
+    assert normalize_category(pd.Series([' ab', 7], dtype=object), None, 'upper').tolist() == ['AB', '7']
+
+
+def test_clean_matches_the_notebook():
+    rng = np.random.default_rng(12)
+    n = 300
+    df = pd.DataFrame({'date': rng.choice(['2024-01-01', '2024-02-30'], size=n),
+                       'sales_quantity': rng.choice([1.0, 4.0, np.nan], size=n),
+                       'category': rng.choice([' grocery', 'GROCERY', 'toys', None], size=n),
+                       'channel': [np.nan] * n,
+                       'sku': rng.choice(['ab-1 ', 'Cd-2'], size=n),
+                       'promo_flag': rng.choice([True, False, None], size=n)})
+    df = pd.concat([df, df.head(50)], ignore_index=True)
+    # The notebook fills the all-missing channel column with 'Unknown' before .str works on it
+    expected = comparable(clean_reference(df.copy()))
+    pd.testing.assert_frame_equal(comparable(clean(df.copy())), expected, check_dtype=False)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cleaning.clean import clean, comparable
+from data_cleaning.stream import BloomSeenSet, clean_stream, fingerprints, first_seen, make_seen_set
+
+
+@pytest.fixture
+def dirty():
+    rng = np.random.default_rng(6)
+    n = 600
+    df = pd.DataFrame({
+        'date': rng.choice(['2024-01-01', '2024-01-02', 'not a date'], size=n),
+        'product_id': rng.choice(['P1', 'P2', 'P3', 'P4'], size=n),
+        'sales_quantity': rng.choice([1.0, 2.0, 5.0, np.nan], size=n),
+        'sales_revenue': rng.choice([9.5, 12.0, np.nan], size=n),
+        'category': rng.choice([' electronics', 'Electronics ', 'GROCERY', None], size=n),
+        'brand': rng.choice(['sony', 'Sony', None], size=n),
+        'sku': rng.choice([' ab-1', 'AB-1', 'cd-2 '], size=n),
+        'promo_flag': rng.choice([True, False, None], size=n),
+    })
+    # Exact copies of earlier rows, most of them in later chunks
+    return pd.concat([df, df.sample(200, random_state=7)], ignore_index=True)
+
+
+def _chunks(df, size):
+    return (df.iloc[start:start + size].copy() for start in range(0, len(df), size))
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite', 'bloom'])
+def test_clean_stream_equals_clean(dirty, tmp_path, kind):
+    expected = comparable(clean(dirty.copy())).reset_index(drop=True)
+    seen = make_seen_set(kind, str(tmp_path / 'seen.db'), capacity=len(dirty))
+    try:
+        streamed = pd.concat(clean_stream(_chunks(dirty, 97), seen), ignore_index=True)
+    finally:
+        seen.close()
+    assert len(expected) < len(dirty)
+    pd.testing.assert_frame_equal(comparable(streamed), expected)
+
+
+def test_fingerprints_agree_across_chunk_dtypes():
+    ints = pd.DataFrame({'qty': [1, 2], 'product_id': pd.Categorical(['P1', 'P2'])})
+    floats = pd.DataFrame({'qty': [1.0, np.nan], 'product_id': pd.Categorical(['P1', 'P9'], ['P9', 'P1'])})
+    assert fingerprints(ints)[0] == fingerprints(floats)[0]
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite', 'bloom'])
+def test_seen_sets_have_no_false_negatives(tmp_path, kind):
+    rng = np.random.default_rng(8)
+    seen = make_seen_set(kind, str(tmp_path / 'seen.db'), capacity=20_000)
+    added = np.empty(0, dtype=np.uint64)
+    try:
+        for _ in range(10):
+            fresh = rng.integers(0, 2 ** 64, size=1000, dtype=np.uint64)
+            repeats = rng.choice(added, size=min(len(added), 500), replace=False) if len(added) else added
+            hashes = np.concatenate([fresh, repeats])
+            keep = first_seen(seen, hashes)
+            assert not keep[len(fresh):].any()
+            if kind != 'bloom':
+                assert keep[:len(fresh)].all()
+            added = np.concatenate([added, fresh])
+        if kind != 'bloom':
+            assert len(seen) == len(added)
+    finally:
+        seen.close()
+
+
+def test_bloom_false_positive_rate():
+    rng = np.random.default_rng(9)
+    seen = BloomSeenSet(capacity=20_000, error_rate=1e-3)
+    seen.add(rng.integers(0, 2 ** 64, size=20_000, dtype=np.uint64))
+    false_positives = ~seen.add(rng.integers(0, 2 ** 64, size=20_000, dtype=np.uint64))
+    assert false_positives.mean() < 5e-3
+
+
+def test_first_seen_drops_repeats_within_a_chunk():
+    keep = first_seen(make_seen_set(), np.array([5, 3, 5, 7, 3], dtype=np.uint64))
+    assert keep.tolist() == [True, True, False, True, False]
@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table, create_engine, exc, text
+from sqlalchemy.pool import NullPool
+
+from data_generate.loader import dependency_levels, load_concurrent, table_parents
+
+
+def _metadata():
+    metadata = MetaData()
+    Table('regions', metadata, Column('region_id', String(10), primary_key=True))
+    Table('stores', metadata, Column('store_id', Integer, primary_key=True),
+          Column('region_id', String(10), ForeignKey('regions.region_id')))
+    Table('sales', metadata, Column('sale_id', Integer, primary_key=True),
+          Column('store_id', Integer, ForeignKey('stores.store_id')), Column('qty', Integer),
+          Index('ix_sales_qty', 'qty'))
+    Table('trends', metadata, Column('trend_id', Integer, primary_key=True), Column('score', Integer))
+    return metadata
+
+
+def _frames(sales=250):
+    regions = pd.DataFrame({'region_id': ['N', 'S', 'E']})
+    stores = pd.DataFrame({'store_id': np.arange(9), 'region_id': ['N', 'S', 'E'] * 3})
+    sales = pd.DataFrame({'sale_id': np.arange(sales), 'store_id': np.arange(sales) % 9,
+                          'qty': np.arange(sales) % 50})
+    trends = pd.DataFrame({'trend_id': np.arange(20), 'score': np.arange(20)})
+    return {'regions': regions, 'stores': stores, 'sales': sales, 'trends': trends}
+
+
+def _stream(frames, order, chunk_rows=60):
+    for table in order:
+        df = frames[table]
+        for start in range(0, len(df), chunk_rows):
+            yield table, df.iloc[start:start + chunk_rows]
+
+
+def _run(func, *args, **kwargs):
+    # A coordination bug shows up as a hang; fail the test instead of blocking it
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(func, *args, **kwargs).result(timeout=60)
+
+
+def _count(engine, table):
+    return int(pd.read_sql(f'SELECT COUNT(*) AS n FROM {table}', engine)['n'][0])
+
+
+def test_dependency_levels():
+    metadata = _metadata()
+    assert dependency_levels(metadata) == [['regions', 'trends'], ['stores'], ['sales']]
+    assert dependency_levels(metadata, ['sales', 'regions']) == [['sales', 'regions']]
+    assert table_parents(metadata, ['regions', 'stores', 'sales'])['sales'] == {'stores'}
+
+
+def test_dependency_levels_rejects_cycles():
+    metadata = MetaData()
+    Table('a', metadata, Column('id', Integer, primary_key=True), Column('b_id', Integer, ForeignKey('b.id')))
+    Table('b', metadata, Column('id', Integer, primary_key=True), Column('a_id', Integer, ForeignKey('a.id')))
+    with pytest.raises(ValueError, match='cycle'):
+        dependency_levels(metadata)
+
+
+def _indexes(engine, table):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"),
+            {'t': table})}
+
+
+@pytest.mark.parametrize('order', [['regions', 'stores', 'sales', 'trends'],
+                                   ['trends', 'regions', 'stores', 'sales']])
+def test_load_concurrent_respects_foreign_keys(sqlite_engine, order):
+    metadata = _metadata()
+    metadata.create_all(sqlite_engine)
+    frames = _frames()
+    stats = _run(load_concurrent, sqlite_engine, _stream(frames, order), workers=3, split_rows=25,
+                 metadata=metadata)
+
+    assert {name: s.rows for name, s in stats.items()} == {name: len(df) for name, df in frames.items()}
+    for name, df in frames.items():
+        loaded = pd.read_sql(f'SELECT * FROM {name}', sqlite_engine)
+        key = df.columns[0]
+        pd.testing.assert_frame_equal(loaded.sort_values(key).reset_index(drop=True),
+                                      df.sort_values(key).reset_index(drop=True), check_dtype=False)
+    assert _indexes(sqlite_engine, 'sales') == {'ix_sales_qty'}
+
+
+def test_load_concurrent_rejects_parents_after_children(sqlite_engine):
+    metadata = _metadata()
+    metadata.create_all(sqlite_engine)
+    stream = _stream(_frames(), ['sales', 'trends', 'stores', 'regions'])
+    with pytest.raises(ValueError, match='foreign key order'):
+        _run(load_concurrent, sqlite_engine, stream, workers=2, split_rows=25, metadata=metadata)
+    assert _indexes(sqlite_engine, 'sales') == {'ix_sales_qty'}
+
+
+def test_load_concurrent_without_pool_size(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nullpool.db'}", poolclass=NullPool)
+    metadata = _metadata()
+    metadata.create_all(engine)
+    stats = _run(load_concurrent, engine, _stream(_frames(), ['regions', 'stores']), metadata=metadata)
+    assert stats['stores'].rows == 9
+
+
+def test_load_concurrent_parent_failure_propagates(sqlite_engine):
+    metadata = _metadata()
+    metadata.create_all(sqlite_engine)
+    frames = _frames()
+    # A duplicate primary key fails the stores load
+    frames['stores'] = pd.concat([frames['stores'], frames['stores'].head(1)], ignore_index=True)
+    stream = _stream(frames, ['regions', 'trends', 'stores', 'sales'], chunk_rows=100)
+
+    with pytest.raises(exc.IntegrityError):
+        _run(load_concurrent, sqlite_engine, stream, workers=2, split_rows=25, metadata=metadata)
+    # sales waited on stores and never inserted a row; indexes are back
+    assert _count(sqlite_engine, 'sales') == 0
+    assert _indexes(sqlite_engine, 'sales') == {'ix_sales_qty'}
+
+
+def test_load_concurrent_failure_stops_the_stream(sqlite_engine):
+    metadata = _metadata()
+    metadata.create_all(sqlite_engine)
+    frames = _frames()
+    frames['regions'] = pd.DataFrame({'region_id': ['N', 'N']})
+    consumed = []
+
+    def stream():
+        for table, df in _stream(frames, ['regions', 'stores', 'sales'], chunk_rows=10):
+            consumed.append(table)
+            yield table, df
+
+    with pytest.raises(exc.IntegrityError):
+        _run(load_concurrent, sqlite_engine, stream(), workers=1, split_rows=10, metadata=metadata)
+    assert len(consumed) < len(list(_stream(frames, ['regions', 'stores', 'sales'], chunk_rows=10)))
+    assert _count(sqlite_engine, 'stores') == 0 and _count(sqlite_engine, 'sales') == 0
+
+
+def test_load_concurrent_rejects_non_contiguous_tables(sqlite_engine):
+    metadata = _metadata()
+    metadata.create_all(sqlite_engine)
+    frames = _frames()
+    stream = [('regions', frames['regions']), ('trends', frames['trends'].head(10)),
+              ('stores', frames['stores']), ('trends', frames['trends'].tail(10))]
+    with pytest.raises(ValueError, match='not contiguous'):
+        _run(load_concurrent, sqlite_engine, iter(stream), workers=2, metadata=metadata)
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.schema import apply_dtypes
+from pipeline.cube import KEYS, TABLE, aggregate, read_cube, update_cube
+from pipeline.incremental import merge_partition, read_extract
+
+
+def _sales(first_id, n, month, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(f"{month}-01") + pd.to_timedelta(rng.integers(0, 28, size=n), unit='D')
+    return pd.DataFrame({'sale_id': np.arange(first_id, first_id + n),
+                         'date': dates,
+                         'product_id': rng.choice(['P1', 'P2', 'P3'], size=n),
+                         'store_id': rng.choice(['S1', 'S2'], size=n),
+                         'sales_quantity': rng.integers(1, 20, size=n),
+                         'sales_revenue': np.round(rng.uniform(1, 100, size=n), 2),
+                         'promo_flag': rng.random(n) < 0.2,
+                         'holiday_flag': np.where(dates.day == 1, 'New Year', None)})
+
+
+@pytest.fixture
+def extract(tmp_path):
+    path = tmp_path / 'extract'
+    path.mkdir()
+    for i, month in enumerate(['2024-01', '2024-02', '2024-03']):
+        merge_partition(str(path / f"{month}.parquet"), _sales(1000 * i, 300, month, seed=i), 'sales')
+    return str(path)
+
+
+def _mtimes(cube_dir):
+    return {name: os.stat(os.path.join(cube_dir, name)).st_mtime_ns
+            for name in os.listdir(cube_dir) if name.endswith('.parquet')}
+
+
+def _expected(extract_dir):
+    return aggregate(read_extract(extract_dir)).sort_values(KEYS).reset_index(drop=True)
+
+
+def _compare(cube, expected):
+    cube = cube.sort_values(KEYS).reset_index(drop=True)
+    pd.testing.assert_frame_equal(cube.astype(object), expected.astype(object), check_dtype=False)
+
+
+def test_aggregate_sums_per_day_product_and_store():
+    sales = _sales(0, 500, '2024-05')
+    cube = aggregate(sales)
+    groups = sales.groupby(KEYS)
+    assert len(cube) == groups.ngroups
+    expected = groups.agg(sales_quantity=('sales_quantity', 'sum'), transactions=('sale_id', 'size'),
+                          promo_transactions=('promo_flag', 'sum')).reset_index()
+    merged = cube.astype({'product_id': object, 'store_id': object}).merge(
+        expected, on=KEYS, suffixes=('', '_expected'))
+    for col in ['sales_quantity', 'transactions', 'promo_transactions']:
+        assert (merged[col] == merged[f"{col}_expected"]).all()
+    assert (merged['promo_flag'] == (merged['promo_transactions'] > 0)).all()
+
+
+def test_update_cube_rebuilds_only_changed_months(extract, tmp_path, sqlite_engine):
+    cube_dir = str(tmp_path / 'cube')
+    first = update_cube(extract, cube_dir, sqlite_engine)
+    assert first['rebuilt'] == ['2024-01', '2024-02', '2024-03'] and first['removed'] == []
+    _compare(read_cube(cube_dir), _expected(extract))
+
+    assert update_cube(extract, cube_dir, sqlite_engine)['rebuilt'] == []
+    before = _mtimes(cube_dir)
+
+    # Late sales for February only
+    merge_partition(os.path.join(extract, '2024-02.parquet'), _sales(5000, 50, '2024-02', seed=9), 'sales')
+    second = update_cube(extract, cube_dir, sqlite_engine)
+    assert second['rebuilt'] == ['2024-02']
+    after = _mtimes(cube_dir)
+    assert after['2024-01.parquet'] == before['2024-01.parquet']
+    assert after['2024-03.parquet'] == before['2024-03.parquet']
+    assert after['2024-02.parquet'] != before['2024-02.parquet']
+    _compare(read_cube(cube_dir), _expected(extract))
+    _compare(apply_dtypes(pd.read_sql(f"SELECT * FROM {TABLE}", sqlite_engine), TABLE), _expected(extract))
+
+    os.remove(os.path.join(extract, '2024-01.parquet'))
+    third = update_cube(extract, cube_dir, sqlite_engine)
+    assert third['rebuilt'] == [] and third['removed'] == ['2024-01']
+    assert sorted(_mtimes(cube_dir)) == ['2024-02.parquet', '2024-03.parquet']
+    _compare(read_cube(cube_dir), _expected(extract))
+    _compare(apply_dtypes(pd.read_sql(f"SELECT * FROM {TABLE}", sqlite_engine), TABLE), _expected(extract))
+
+
+def test_read_cube_filters_by_date(extract, tmp_path):
+    cube_dir = str(tmp_path / 'cube')
+    update_cube(extract, cube_dir)
+    cube = read_cube(cube_dir, start='2024-02-10', end='2024-03-05', columns=['product_id', 'sales_quantity'])
+    expected = _expected(extract)
+    expected = expected[(expected['date'] >= '2024-02-10') & (expected['date'] <= '2024-03-05')]
+    assert list(cube.columns) == ['product_id', 'sales_quantity']
+    assert cube['sales_quantity'].sum() == expected['sales_quantity'].sum()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.features import TREND_COLUMNS, join_trends, lag_features
+
+LAGS, WINDOWS, PROMO_WINDOW = (1, 7), (3, 14), 5
+
+
+@pytest.fixture
+def demand():
+    rng = np.random.default_rng(1)
+    days = pd.date_range('2024-01-01', '2024-02-29')
+    rows = [(d, p, s) for p in ('P1', 'P2') for s in ('S1', 'S2') for d in days if rng.random() < 0.6]
+    df = pd.DataFrame(rows, columns=['date', 'product_id', 'store_id'])
+    df['sales_quantity'] = rng.integers(1, 20, size=len(df))
+    df['promo_flag'] = rng.random(len(df)) < 0.15
+    # Shuffled: features must not depend on row order
+    return df.sample(frac=1, random_state=2).reset_index(drop=True)
+
+
+def _naive(df, history_start):
+    first = pd.Timestamp(history_start)
+    out = {}
+    for i, row in df.iterrows():
+        series = df[(df['product_id'] == row['product_id']) & (df['store_id'] == row['store_id'])]
+        quantity = series.set_index('date')['sales_quantity']
+        promo_days = set(series.loc[series['promo_flag'], 'date'])
+        age = (row['date'] - first).days
+        values = {}
+        for n in LAGS:
+            values[f'demand_lag_{n}'] = quantity.get(row['date'] - pd.Timedelta(days=n), 0) if age >= n else np.nan
+        for n in WINDOWS:
+            window = quantity[(quantity.index < row['date']) & (quantity.index >= row['date'] - pd.Timedelta(days=n))]
+            values[f'demand_{n}d'] = window.sum() if age >= n else np.nan
+        recent = [d for d in promo_days if row['date'] - pd.Timedelta(days=PROMO_WINDOW) <= d < row['date']]
+        values[f'promo_days_{PROMO_WINDOW}d'] = len(recent) if age >= PROMO_WINDOW else np.nan
+        earlier = [d for d in promo_days if first <= d < row['date']]
+        since = (row['date'] - max(earlier)).days if earlier else np.nan
+        values['days_since_promo'] = since if since <= max(WINDOWS) else np.nan
+        out[i] = values
+    return pd.DataFrame.from_dict(out, orient='index')
+
+
+@pytest.mark.parametrize('history_start', [None, '2023-12-20'])
+def test_lag_features_match_naive(demand, history_start):
+    result = lag_features(demand.copy(), lags=LAGS, windows=WINDOWS, promo_window=PROMO_WINDOW,
+                          history_start=history_start)
+    expected = _naive(demand, history_start or demand['date'].min())
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+
+
+def test_lag_features_empty_frame():
+    df = pd.DataFrame({'date': pd.to_datetime([]), 'product_id': [], 'store_id': [],
+                       'sales_quantity': [], 'promo_flag': []})
+    result = lag_features(df, lags=LAGS, windows=WINDOWS, promo_window=PROMO_WINDOW)
+    assert len(result) == 0 and 'demand_lag_1' in result.columns
+
+
+def test_join_trends_takes_latest_within_tolerance():
+    df = pd.DataFrame({'date': pd.to_datetime(['2024-01-10', '2024-01-03', '2024-03-01', '2024-01-10']),
+                       'product_id': ['P1', 'P1', 'P1', 'P2']})
+    trends = pd.DataFrame({'date': pd.to_datetime(['2024-01-01', '2024-01-08', '2024-01-05']),
+                           'product_id': ['P1', 'P1', 'P3']})
+    for i, col in enumerate(TREND_COLUMNS):
+        trends[col] = [10 * i + 1, 10 * i + 2, 10 * i + 3]
+    result = join_trends(df.copy(), trends, tolerance_days=28)
+    assert result['temperature'].tolist()[:2] == [2, 1]
+    assert result['temperature'].isna().tolist() == [False, False, True, True]
+    assert result['trend_age_days'].tolist()[:2] == [2.0, 2.0]
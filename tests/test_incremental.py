@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+import pipeline.incremental as incremental
+from pipeline.incremental import incremental_ingest, keyset_pages, load_state, read_extract
+
+TABLE = 'sales'
+
+
+def _rows(first_id, n, start, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size=n), unit='D')
+    return pd.DataFrame({'sale_id': np.arange(first_id, first_id + n),
+                         'date': dates.strftime('%Y-%m-%d'),
+                         'product_id': rng.choice(['P1', 'P2', 'P3'], size=n),
+                         'store_id': rng.choice(['S1', 'S2'], size=n),
+                         'sales_quantity': rng.integers(1, 20, size=n)})
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    _rows(1, 120, '2024-01-01', 60).to_sql(TABLE, sqlite_engine, index=False)
+    return sqlite_engine
+
+
+def _append(engine, df):
+    df.to_sql(TABLE, engine, index=False, if_exists='append')
+
+
+def _extract(extract_dir):
+    df = read_extract(extract_dir).sort_values('sale_id').reset_index(drop=True)
+    return df[['sale_id', 'date', 'sales_quantity']].astype({'sale_id': 'int64', 'sales_quantity': 'int64'})
+
+
+def _source(engine):
+    df = pd.read_sql(f"SELECT sale_id, date, sales_quantity FROM {TABLE} ORDER BY sale_id", engine)
+    return df.assign(date=pd.to_datetime(df['date'])).astype({'sale_id': 'int64', 'sales_quantity': 'int64'})
+
+
+@pytest.mark.parametrize('by_date', [False, True])
+def test_keyset_pages_cover_the_table_once_in_order(engine, by_date):
+    with engine.connect() as conn:
+        pages = list(keyset_pages(conn, TABLE, page_size=7, by_date=by_date))
+    assert all(len(page) == 7 for page in pages[:-1])
+    got = pd.concat(pages, ignore_index=True)
+    expected = _source(engine).assign(date=lambda df: df['date'].dt.strftime('%Y-%m-%d'))
+    order = ['date', 'sale_id'] if by_date else ['sale_id']
+    expected = expected.sort_values(order).reset_index(drop=True)
+    assert got['sale_id'].tolist() == expected['sale_id'].tolist()
+
+
+def test_incremental_fetches_only_rows_past_the_high_water_mark(engine, tmp_path):
+    extract_dir = str(tmp_path / 'extract')
+    first = incremental_ingest(engine, TABLE, extract_dir, page_size=25)
+    assert first['mode'] == 'full' and first['rows'] == 120
+    assert load_state(extract_dir)['high_water'] == {'sale_id': 120, 'date': _source(engine)['date'].max().strftime('%Y-%m-%d')}
+
+    # New sales plus late arrivals dated inside months already extracted
+    _append(engine, _rows(121, 30, '2024-03-01', 20, seed=1))
+    _append(engine, _rows(151, 5, '2024-01-01', 10, seed=2))
+    second = incremental_ingest(engine, TABLE, extract_dir, page_size=25)
+    assert second['mode'] == 'incremental' and second['fetched'] == 35
+    assert second['partitions'] == ['2024-01', '2024-03']
+    assert second['rows'] == 155 and second['high_water']['sale_id'] == 155
+    pd.testing.assert_frame_equal(_extract(extract_dir), _source(engine))
+
+    assert incremental_ingest(engine, TABLE, extract_dir)['fetched'] == 0
+
+
+def test_interrupted_run_resumes_from_the_last_saved_page(engine, tmp_path, monkeypatch):
+    extract_dir = str(tmp_path / 'extract')
+    incremental_ingest(engine, TABLE, extract_dir)
+    _append(engine, _rows(121, 40, '2024-03-01', 1, seed=3))
+
+    merge_partition, calls = incremental.merge_partition, []
+
+    def failing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        return merge_partition(*args, **kwargs)
+
+    monkeypatch.setattr(incremental, 'merge_partition', failing)
+    with pytest.raises(OSError):
+        incremental_ingest(engine, TABLE, extract_dir, page_size=10)
+    assert load_state(extract_dir)['high_water']['sale_id'] == 140
+
+    monkeypatch.setattr(incremental, 'merge_partition', merge_partition)
+    resumed = incremental_ingest(engine, TABLE, extract_dir, page_size=10)
+    assert resumed['fetched'] == 20 and resumed['rows'] == 160
+    pd.testing.assert_frame_equal(_extract(extract_dir), _source(engine))
+
+
+def test_lookback_replaces_rows_corrected_in_place(engine, tmp_path):
+    extract_dir = str(tmp_path / 'extract')
+    incremental_ingest(engine, TABLE, extract_dir)
+    high_date = load_state(extract_dir)['high_water']['date']
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE {TABLE} SET sales_quantity = 99 WHERE date >= :since"),
+                     {'since': str((pd.Timestamp(high_date) - pd.Timedelta(days=2)).date())})
+
+    assert incremental_ingest(engine, TABLE, extract_dir)['fetched'] == 0
+    assert (_extract(extract_dir)['sales_quantity'] != _source(engine)['sales_quantity']).any()
+
+    summary = incremental_ingest(engine, TABLE, extract_dir, lookback_days=3, page_size=4)
+    assert summary['fetched'] > 0 and summary['rows'] == 120
+    pd.testing.assert_frame_equal(_extract(extract_dir), _source(engine))
+
+
+def test_missing_state_without_fallback_raises(engine, tmp_path):
+    with pytest.raises(RuntimeError):
+        incremental_ingest(engine, TABLE, str(tmp_path / 'extract'), full_refresh_fallback=False)
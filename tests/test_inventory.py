@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation.inventory import SAFETY_DAYS, demand_matrix, lead_times, simulate
+
+
+def _inventory(n, rng):
+    return pd.DataFrame({'product_id': [f"P{i % 4}" for i in range(n)],
+                         'warehouse': [f"W{i}" for i in range(n)],
+                         'stock_level': rng.integers(0, 60, size=n),
+                         'order_quantity': rng.integers(10, 80, size=n),
+                         'restock_frequency_days': rng.integers(3, 15, size=n),
+                         'restock_date': pd.Timestamp('2024-01-01')
+                                         - pd.to_timedelta(rng.integers(0, 20, size=n), unit='D')})
+
+
+def _scan(inventory, demand, lead_time, dates, policy):
+    """Row by row, day by day, with pending orders keyed by arrival day."""
+    rows = []
+    for i, item in inventory.reset_index(drop=True).iterrows():
+        on_hand, on_order, pending = float(item['stock_level']), 0.0, {}
+        sold_total = lost_total = ordered = orders = 0
+        period = int(item['restock_frequency_days'])
+        phase = (pd.Timestamp(dates[0]) - item['restock_date']).days % period
+        reorder_point = demand[i].mean() * (lead_time[i] + SAFETY_DAYS)
+        for t in range(demand.shape[1]):
+            received = pending.pop(t, 0.0)
+            on_hand += received
+            on_order -= received
+            sold = min(on_hand, demand[i, t])
+            on_hand -= sold
+            sold_total += sold
+            lost_total += demand[i, t] - sold
+            place = (t - phase) % period == 0 if policy == 'periodic' else on_hand + on_order <= reorder_point
+            if place:
+                pending[t + lead_time[i]] = pending.get(t + lead_time[i], 0.0) + item['order_quantity']
+                on_order += item['order_quantity']
+                ordered += item['order_quantity']
+                orders += 1
+        rows.append((sold_total, lost_total, ordered, orders, on_hand))
+    return pd.DataFrame(rows, columns=['sold', 'lost_sales', 'units_ordered', 'orders', 'ending_on_hand'])
+
+
+@pytest.mark.parametrize('policy', ['periodic', 'reorder_point'])
+def test_simulate_matches_a_row_by_row_scan(policy):
+    rng = np.random.default_rng(11)
+    inventory = _inventory(12, rng)
+    dates = pd.date_range('2024-01-01', periods=90)
+    demand = rng.poisson(4, size=(12, 90)).astype(float)
+    lead_time = rng.integers(1, 20, size=12)
+    result = simulate(inventory, demand, lead_time, unit_cost=np.full(12, 2.0), dates=dates, policy=policy)
+    expected = _scan(inventory, demand, lead_time, dates, policy)
+    summary = result.summary[expected.columns].astype(float)
+    pd.testing.assert_frame_equal(summary, expected.astype(float))
+    assert result.daily['sold'].sum() == pytest.approx(expected['sold'].sum())
+
+
+def test_orders_arrive_on_day_t_plus_lead():
+    inventory = pd.DataFrame({'product_id': ['P1', 'P2'], 'warehouse': ['W1', 'W1'], 'stock_level': [0, 0],
+                              'order_quantity': [10, 7], 'restock_frequency_days': [1000, 1000]})
+    demand = np.zeros((2, 12))
+    result = simulate(inventory, demand, [3, 9], unit_cost=np.ones(2))
+    # Both rows order on day 0; the longest lead sets the ring size, so slots wrap
+    assert result.daily['on_hand'].tolist() == [0, 0, 0, 10, 10, 10, 10, 10, 10, 17, 17, 17]
+    assert result.daily['on_order'].tolist() == [17, 17, 17, 7, 7, 7, 7, 7, 7, 0, 0, 0]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        simulate(_inventory(1, np.random.default_rng(0)), np.zeros((1, 3)), [1], np.ones(1), policy='kanban')
+
+
+def test_demand_is_split_over_warehouses_and_lead_times_add_transit():
+    inventory = pd.DataFrame({'product_id': ['P1', 'P1', 'P2', 'P9'], 'warehouse': ['W1', 'W2', 'W1', 'W1']})
+    sales = pd.DataFrame({'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-03']),
+                          'product_id': ['P1', 'P2', 'P1'], 'sales_quantity': [8, 5, 4]})
+    dates, demand = demand_matrix(sales, inventory)
+    assert list(dates) == list(pd.date_range('2024-01-01', '2024-01-03'))
+    np.testing.assert_array_equal(demand, [[4, 0, 2], [4, 0, 2], [5, 0, 0], [0, 0, 0]])
+
+    products = pd.DataFrame({'product_id': ['P1', 'P2', 'P9'], 'supplier_id': ['S1', 'S2', 'S1']})
+    suppliers = pd.DataFrame({'supplier_id': ['S1', 'S2'], 'lead_time_days': [5, 10]})
+    shipments = pd.DataFrame({'product_id': ['P1', 'P1', 'P2'],
+                              'shipment_departure_time': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-01']),
+                              'shipment_arrival_time': pd.to_datetime(['2024-01-02 00:00', '2024-01-04 12:00',
+                                                                       '2024-01-05 00:00'])})
+    # P1 median transit 2.25 days -> 3; P9 has no shipments and takes the overall median 3.5 -> 4
+    assert lead_times(inventory, products, suppliers, shipments).tolist() == [8, 8, 14, 9]
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, text
+
+from data_generate.loader import _escape_backslashes, load_dataset, load_table
+
+
+def _metadata():
+    metadata = MetaData()
+    Table('parents', metadata, Column('parent_id', String(10), primary_key=True), Column('name', String(20)))
+    Table('children', metadata, Column('child_id', Integer, primary_key=True),
+          Column('parent_id', String(10), ForeignKey('parents.parent_id')), Column('qty', Integer),
+          Column('price', Float), Column('flag', Integer), Column('label', String(20)),
+          Index('ix_children_label', 'label'))
+    return metadata
+
+
+def _children(start, n, parents=('P1', 'P2')):
+    ids = np.arange(start, start + n)
+    return pd.DataFrame({'child_id': ids, 'parent_id': [parents[i % len(parents)] for i in ids],
+                         'qty': ids.astype(np.int16), 'price': np.where(ids % 3 == 0, np.nan, ids / 4),
+                         'flag': ids % 2 == 0, 'label': pd.Categorical([f'L{i % 4}' for i in ids])})
+
+
+def test_load_table_appends_chunks(sqlite_engine):
+    _metadata().create_all(sqlite_engine)
+    load_table(sqlite_engine, 'parents', [pd.DataFrame({'parent_id': ['P1', 'P2'], 'name': ['a', 'NULL']})])
+    chunks = [_children(0, 7), _children(7, 5)]
+    stats = load_table(sqlite_engine, 'children', iter(chunks), batch_size=3)
+
+    assert (stats.table, stats.rows, stats.method) == ('children', 12, 'executemany')
+    loaded = pd.read_sql('SELECT * FROM children ORDER BY child_id', sqlite_engine)
+    expected = pd.concat(chunks, ignore_index=True)
+    assert loaded['child_id'].tolist() == expected['child_id'].tolist()
+    assert loaded['flag'].tolist() == expected['flag'].astype(int).tolist()
+    assert loaded['label'].tolist() == expected['label'].astype(str).tolist()
+    np.testing.assert_array_equal(loaded['price'].isna(), expected['price'].isna())
+    # The string 'NULL' stays a string
+    assert pd.read_sql("SELECT name FROM parents WHERE parent_id = 'P2'", sqlite_engine)['name'][0] == 'NULL'
+
+
+def test_load_table_rebuilds_secondary_indexes(sqlite_engine):
+    _metadata().create_all(sqlite_engine)
+    load_table(sqlite_engine, 'parents', [pd.DataFrame({'parent_id': ['P1', 'P2'], 'name': ['a', 'b']})])
+    load_table(sqlite_engine, 'children', [_children(0, 10)])
+    with sqlite_engine.connect() as conn:
+        indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'children'"))
+        assert 'ix_children_label' in {row[0] for row in indexes}
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_load_table_creates_missing_table(sqlite_engine):
+    stats = load_table(sqlite_engine, 'loose', [pd.DataFrame({'a': [1, 2], 'b': ['x', None]})])
+    assert stats.rows == 2
+    assert pd.read_sql('SELECT * FROM loose', sqlite_engine)['b'].isna().tolist() == [False, True]
+
+
+def test_load_table_on_connection_joins_the_transaction(sqlite_engine):
+    _metadata().create_all(sqlite_engine)
+    load_table(sqlite_engine, 'parents', [pd.DataFrame({'parent_id': ['P1', 'P2'], 'name': ['a', 'b']})])
+    with pytest.raises(RuntimeError):
+        with sqlite_engine.begin() as conn:
+            conn.execute(text("DELETE FROM parents WHERE parent_id = 'P2'"))
+            load_table(conn, 'parents', [pd.DataFrame({'parent_id': ['P3'], 'name': ['c']})])
+            raise RuntimeError('load failed')
+    assert pd.read_sql('SELECT parent_id FROM parents ORDER BY 1', sqlite_engine)['parent_id'].tolist() == ['P1', 'P2']
+
+
+def test_load_dataset_reports_every_table(sqlite_engine):
+    _metadata().create_all(sqlite_engine)
+    chunks = [('parents', pd.DataFrame({'parent_id': ['P1', 'P2'], 'name': ['a', 'b']})),
+              ('children', _children(0, 4)), ('children', _children(4, 4))]
+    stats = load_dataset(sqlite_engine, iter(chunks))
+    assert {name: s.rows for name, s in stats.items()} == {'parents': 2, 'children': 8}
+
+
+def test_escape_backslashes_for_load_data():
+    df = pd.DataFrame({'text': ['NULL', 'a\\b', None], 'code': pd.Categorical(['c\\d', 'e', 'e']),
+                       'mixed': [1, 'x\\y', None], 'n': [1, 2, 3]})
+    escaped = _escape_backslashes(df)
+    assert escaped['text'].tolist()[:2] == ['NULL', 'a\\\\b'] and escaped['text'].isna().tolist()[2]
+    assert escaped['code'].astype(str).tolist() == ['c\\\\d', 'e', 'e']
+    # Columns that are not all strings are left alone
+    assert escaped['mixed'].tolist()[:2] == [1, 'x\\y']
+    assert df['text'][1] == 'a\\b'
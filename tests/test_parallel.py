@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from data_generate.catalog import ScaleConfig
+from data_generate.parallel import partition_seed
+from data_generate.tables import generate_dataset
+
+CONFIG = dict(start_date='2024-01-01', end_date='2024-03-31', reference_date='2025-01-01')
+
+
+def _generate(workers, seed=3):
+    tables = {}
+    for table, df in generate_dataset(ScaleConfig(0.05, **CONFIG), seed=seed, chunk_size=40, workers=workers):
+        tables.setdefault(table, []).append(df.reset_index(drop=True))
+    return tables
+
+
+@pytest.fixture(scope='module')
+def serial():
+    return _generate(workers=1)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_output_is_identical_for_any_worker_count(serial, workers):
+    parallel = _generate(workers)
+    assert list(parallel) == list(serial)
+    for table, chunks in serial.items():
+        assert len(parallel[table]) == len(chunks), table
+        for ours, theirs in zip(parallel[table], chunks):
+            pd.testing.assert_frame_equal(ours, theirs)
+    # Partitioned tables are really split, so the pool had work to share
+    assert len(serial['sales']) > 1 and len(serial['customers']) > 1
+
+
+def test_seed_changes_the_output(serial):
+    other = _generate(workers=1, seed=4)
+    assert not serial['sales'][0].equals(other['sales'][0])
+
+
+def test_partition_seeds_are_independent():
+    seeds = {tuple(partition_seed(3, table, index).generate_state(2))
+             for table in ('sales', 'customers') for index in range(5)}
+    assert len(seeds) == 10
+    assert partition_seed(3, 'sales', 1).generate_state(2).tolist() == \
+        partition_seed(3, 'sales', 1).generate_state(2).tolist()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_generate.promotions import PromotionIndex
+
+COLUMNS = ['promotion_id', 'product_id', 'campaign_start_date', 'campaign_end_date', 'discount_percentage']
+
+
+@pytest.fixture
+def promotions():
+    rng = np.random.default_rng(3)
+    rows = []
+    for i in range(60):
+        start = pd.Timestamp('2024-01-01') + pd.Timedelta(days=int(rng.integers(0, 150)))
+        end = start + pd.Timedelta(days=int(rng.integers(0, 30)))
+        rows.append((100 + i, f"P{rng.integers(1, 6)}", start, end, float(rng.integers(5, 50))))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def _scan(promotions, product_id, date):
+    """The linear scan the index replaced: first campaign covering the day."""
+    for row, promo in promotions.iterrows():
+        if (promo['product_id'] == product_id
+                and promo['campaign_start_date'] <= date <= promo['campaign_end_date']):
+            return row
+    return -1
+
+
+def _queries(n=2000):
+    rng = np.random.default_rng(4)
+    products = np.array([f"P{i}" for i in rng.integers(0, 7, size=n)], dtype=object)
+    dates = pd.Timestamp('2023-12-20') + pd.to_timedelta(rng.integers(0, 200, size=n), unit='D')
+    return products, dates
+
+
+def test_lookup_matches_linear_scan(promotions):
+    index = PromotionIndex(promotions)
+    products, dates = _queries()
+    expected = [_scan(promotions, p, d) for p, d in zip(products, dates)]
+    assert index.lookup(products, dates).tolist() == expected
+
+
+def test_match_and_active_follow_lookup(promotions):
+    index = PromotionIndex(promotions)
+    products, dates = _queries(500)
+    rows = index.lookup(products, dates)
+    found, promotion_id, discount = index.match(products, dates)
+    hit = rows >= 0
+    assert hit.any() and (~hit).any()
+    assert (found == hit).all()
+    assert promotion_id[hit].tolist() == promotions['promotion_id'].to_numpy()[rows[hit]].tolist()
+    assert promotion_id[~hit].isna().all()
+    assert (discount[hit] == promotions['discount_percentage'].to_numpy()[rows[hit]]).all()
+    assert np.isnan(discount[~hit]).all()
+    for product_id, date, row in zip(products[:50], dates[:50], rows[:50]):
+        active = index.active(product_id, date)
+        if row < 0:
+            assert active is None
+        else:
+            assert active['promotion_id'] == promotions.at[row, 'promotion_id']
+            assert active['discount_percentage'] == promotions.at[row, 'discount_percentage']
+
+
+def test_overlapping_campaigns_take_the_earliest_row():
+    promotions = pd.DataFrame([(1, 'P1', '2024-01-10', '2024-01-20', 10.0),
+                               (2, 'P1', '2024-01-01', '2024-01-31', 20.0),
+                               (3, 'P1', '2024-01-15', '2024-02-05', 30.0)], columns=COLUMNS)
+    index = PromotionIndex(promotions)
+    dates = ['2024-01-01', '2024-01-10', '2024-01-20', '2024-01-21', '2024-02-01', '2024-02-05', '2024-02-06']
+    assert index.lookup(['P1'] * len(dates), dates).tolist() == [1, 0, 0, 1, 2, 2, -1]
+
+
+def test_empty_promotions_match_nothing():
+    index = PromotionIndex(pd.DataFrame(columns=COLUMNS))
+    products, dates = _queries(10)
+    assert (index.lookup(products, dates) == -1).all()
+    found, promotion_id, discount = index.match(products, dates)
+    assert not found.any()
+    assert promotion_id.isna().all()
+    assert np.isnan(discount).all()
+    assert index.active('P1', '2024-01-01') is None
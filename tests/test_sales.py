@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from data_generate.catalog import CATEGORIES
+from data_generate.promotions import PromotionIndex
+from data_generate.sales import generate_sales, sample_daily_products
+
+
+def test_sample_daily_products_is_a_sample_per_day():
+    day_idx, prod_idx = sample_daily_products(np.random.default_rng(0), 200, 30, (5, 12))
+    assert (np.diff(day_idx) >= 0).all()
+    counts = np.bincount(day_idx, minlength=200)
+    assert counts.min() >= 5 and counts.max() <= 12
+    assert ((0 <= prod_idx) & (prod_idx < 30)).all()
+    for day in range(200):
+        products = prod_idx[day_idx == day]
+        assert len(np.unique(products)) == len(products)
+    # Every product is about equally likely on any day
+    frequency = np.bincount(prod_idx, minlength=30) / len(prod_idx)
+    assert np.abs(frequency - 1 / 30).max() < 0.01
+
+
+def test_sample_daily_products_does_not_depend_on_block_size():
+    whole = sample_daily_products(np.random.default_rng(5), 50, 20, (3, 8))
+    blocked = sample_daily_products(np.random.default_rng(5), 50, 20, (3, 8), max_keys=45)
+    assert all((a == b).all() for a, b in zip(whole, blocked))
+
+
+def test_sample_daily_products_caps_at_the_catalogue():
+    day_idx, prod_idx = sample_daily_products(np.random.default_rng(1), 10, 4, (6, 9))
+    assert (np.bincount(day_idx) == 4).all()
+
+
+def _products(n=25):
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({'product_id': [f"P{i:03d}" for i in range(n)],
+                         'category': rng.choice(list(CATEGORIES), size=n),
+                         'price': np.round(rng.uniform(1, 100, size=n), 2)})
+
+
+def test_generate_sales_rows_and_determinism():
+    products = _products()
+    promotions = pd.DataFrame({'promotion_id': [7, 8], 'product_id': ['P001', 'P002'],
+                               'campaign_start_date': ['2024-03-01', '2024-03-10'],
+                               'campaign_end_date': ['2024-03-31', '2024-03-12'],
+                               'discount_percentage': [10.0, 25.0]})
+    kwargs = dict(customers=40, stores=['S1', 'S2'], start_date='2024-02-15', end_date='2024-04-15',
+                  categories=CATEGORIES, promotions=promotions, daily_products=(4, 10))
+    df = generate_sales(products, rng=np.random.default_rng(9), **kwargs)
+    pd.testing.assert_frame_equal(df, generate_sales(products, rng=np.random.default_rng(9), **kwargs))
+
+    assert set(df['date']) == set(pd.date_range('2024-02-15', '2024-04-15').strftime('%Y-%m-%d'))
+    assert not df.duplicated(['date', 'product_id']).any()
+    assert (df['sales_quantity'] >= 1).all()
+    prices = products.set_index('product_id')['price']
+    np.testing.assert_allclose(df['sales_revenue'], df['sales_quantity'] * df['product_id'].map(prices))
+    assert df['customer_id'].str.fullmatch(r'CUST-\d{5}').all()
+    assert set(df['store_id']) <= {'S1', 'S2'}
+
+    found, promotion_id, discount = PromotionIndex(promotions).match(df['product_id'], df['date'])
+    assert (df['promo_flag'].to_numpy() == found).all()
+    assert df['promotion_id'].equals(pd.Series(promotion_id, name='promotion_id'))
+    np.testing.assert_array_equal(df['promo_discount'], discount)
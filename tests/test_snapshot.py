@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.schema import apply_dtypes, concat_frames
+from pipeline.snapshot import TABLE, SnapshotWriter, load_snapshot, open_snapshot, publish_snapshot, snapshot_info
+
+
+def _chunk(first_id, n, products, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'sale_id': np.arange(first_id, first_id + n),
+                       'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, size=n), unit='D'),
+                       'product_id': rng.choice(products, size=n),
+                       'sales_quantity': rng.integers(1, 30, size=n),
+                       'sales_revenue': np.round(rng.uniform(1, 500, size=n), 2),
+                       'promo_flag': rng.random(n) < 0.3,
+                       'promotion_id': pd.array(np.where(rng.random(n) < 0.3, rng.integers(1, 9, size=n), -1)),
+                       # No values in the first chunk: stored as plain values
+                       'holiday_flag': [None] * n if first_id == 0 else rng.choice(['New Year', None], size=n)})
+    df['promotion_id'] = df['promotion_id'].mask(df['promotion_id'] < 0)
+    return apply_dtypes(df, TABLE)
+
+
+@pytest.fixture
+def chunks():
+    # Later chunks bring new categories, which are written as dictionary deltas
+    return [_chunk(0, 40, ['P1', 'P2'], 0), _chunk(40, 35, ['P2', 'P3', 'P4'], 1), _chunk(75, 50, ['P5', 'P1'], 2)]
+
+
+def _values(df):
+    return df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+
+@pytest.mark.parametrize('batch_rows', [1000, 30])
+def test_snapshot_round_trip(chunks, tmp_path, batch_rows):
+    path = str(tmp_path / 'snapshot.arrow')
+    with SnapshotWriter(path, source='test', batch_rows=batch_rows) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    loaded = load_snapshot(path)
+    expected = concat_frames(chunks)
+    for col in expected.columns:
+        if isinstance(expected[col].dtype, pd.CategoricalDtype):
+            assert isinstance(loaded[col].dtype, pd.CategoricalDtype), col
+        else:
+            assert loaded[col].dtype == expected[col].dtype, col
+    pd.testing.assert_frame_equal(_values(loaded), _values(expected))
+
+    info = snapshot_info(path)
+    assert info['rows'] == 125 and info['table'] == TABLE and info['source'] == 'test'
+    assert (info['batches'] == 1) == (batch_rows >= 125)
+    assert open_snapshot(path, columns=['sale_id']).column_names == ['sale_id']
+
+
+def test_single_batch_columns_are_read_only_views(chunks, tmp_path):
+    path = str(tmp_path / 'snapshot.arrow')
+    publish_snapshot(iter(chunks), path)
+    df = load_snapshot(path, columns=['sale_id', 'sales_revenue'])
+    assert not df['sales_revenue'].to_numpy().flags.writeable
+    writable = load_snapshot(path, columns=['sale_id', 'sales_revenue'], writable=True)
+    writable.loc[0, 'sales_revenue'] = -1.0
+    assert load_snapshot(path)['sales_revenue'].iloc[0] != -1.0
+
+
+def test_failed_write_keeps_the_previous_snapshot(chunks, tmp_path):
+    path = str(tmp_path / 'snapshot.arrow')
+    publish_snapshot(iter(chunks[:1]), path)
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(path) as writer:
+            writer.write(chunks[1])
+            raise RuntimeError("interrupted")
+    assert snapshot_info(path)['rows'] == 40
+    assert list(tmp_path.iterdir()) == [tmp_path / 'snapshot.arrow']